@@ -0,0 +1,345 @@
+import collections
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import typing
+import urllib.parse
+
+from MDCBR.corpus.corpus_files import open_corpus
+from MDCBR.elf.elf_analysis import ELFAnalysis
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class QueryError(Exception):
+    """
+    Invalid query (unknown endpoint or defect, bad parameter); reported to the client with the HTTP status.
+    """
+    def __init__(self, status: int, message: str) -> typing.NoReturn:
+        super().__init__(message)
+        self.status = status
+
+
+class CorpusIndex:
+    """
+    In-memory query indexes of a stored corpus (JSONL corpus, SQLite store or binary snapshot). The corpus is read
+    once; the report aggregate, the call stack groups (ELFAnalysis) and a per-defect lookup are built at load time, so
+    each query only walks precomputed structures.
+    """
+
+    def __init__(self, data_file: str) -> typing.NoReturn:
+        """
+        Args:
+            data_file: Corpus file (see corpus_files.open_corpus)
+
+        """
+        self.data_file = data_file
+        self.log = logging.getLogger(self.__class__.__name__)
+        self.mtime = None
+        self.load_seconds = 0.0
+        self.aggregate = ReportAggregate().finalize()
+        self.stack_groups = []
+        self.defects = {}
+        self.load()
+
+    def load(self) -> typing.NoReturn:
+        """
+        (Re-)read the corpus and rebuild the indexes.
+        """
+        start_time = time.perf_counter()
+        mtime = os.stat(self.data_file).st_mtime
+        corpus = open_corpus(self.data_file)
+        try:
+            aggregate = corpus.build_aggregate()
+            call_stacks = ELFAnalysis(data_struct=corpus.iter_analysis_items()).perform_stack_trace_assessment()
+        finally:
+            if hasattr(corpus, 'close'):
+                corpus.close()
+
+        # Defect ids in the aggregate may carry the user data marker; the lookup uses the plain id.
+        defects = {}
+        for exc_entry in aggregate.exceptions:
+            for msg_entry in exc_entry.messages:
+                for ver_entry in msg_entry.versions:
+                    for defect_id in ver_entry.defect_ids:
+                        defects[defect_id.rstrip(ReportAggregate.USER_DATA_MARKER)] = {
+                            'defect_id': defect_id, 'exception': exc_entry.exception_type,
+                            'message': msg_entry.message, 'version': ver_entry.version, 'call_stack': None}
+
+        stack_groups = sorted(call_stacks.items(), key=lambda x: len(x[1]), reverse=True)
+        for call_stack, defect_ids in stack_groups:
+            for defect_id in defect_ids:
+                defects.setdefault(defect_id, {'defect_id': defect_id})['call_stack'] = call_stack
+
+        self.aggregate, self.stack_groups, self.defects, self.mtime = aggregate, stack_groups, defects, mtime
+        self.load_seconds = time.perf_counter() - start_time
+        METRICS.histogram('api.load_seconds').observe(self.load_seconds)
+        self.log.info(f"Loaded '{self.data_file}': {len(defects)} defects, {len(stack_groups)} call stacks. "
+                      f"({self.load_seconds:0.3f} secs)")
+
+    def is_stale(self) -> bool:
+        """
+        Returns:
+            True if the corpus file was modified (e.g. - rewritten by 'cbr.py watch') since it was loaded.
+        """
+        try:
+            return os.stat(self.data_file).st_mtime != self.mtime
+        except OSError:
+            return False
+
+    # ------------------------------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------------------------------
+    def summary(self) -> dict:
+        return {
+            'corpus': self.data_file,
+            'defects': self.aggregate.total_count,
+            'exception_types': len(self.aggregate.exceptions),
+            'call_stacks': len(self.stack_groups),
+            'loaded': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.mtime)),
+            'load_seconds': round(self.load_seconds, 3),
+        }
+
+    def tally(self, exception: typing.Optional[str] = None, version: typing.Optional[str] = None) -> dict:
+        """
+        Defect counts by exception type and version.
+
+        Args:
+            exception: Only count this exception type.
+            version: Only count this SW version/build.
+
+        Returns:
+            Dictionary - <exception>: {'count': <count>, 'versions': {<version>: <count>}} (descending count)
+
+        """
+        results = {}
+        for exc_entry in self.aggregate.exceptions:
+            if exception is not None and exc_entry.exception_type != exception:
+                continue
+            versions = collections.Counter()
+            for msg_entry in exc_entry.messages:
+                for ver_entry in msg_entry.versions:
+                    if version is None or ver_entry.version == version:
+                        versions[ver_entry.version] += ver_entry.count
+            if versions:
+                results[exc_entry.exception_type] = {'count': sum(versions.values()), 'versions': dict(
+                    sorted(versions.items(), key=lambda x: ReportAggregate.version_sort_key(x[0]), reverse=True))}
+        return results
+
+    def messages(self, exception: typing.Optional[str] = None, version: typing.Optional[str] = None) -> dict:
+        """
+        Defects grouped by genericized error message (Defects.build_reporting_dict() format).
+
+        Args:
+            exception: Only include this exception type.
+            version: Only include this SW version/build.
+
+        Returns:
+            Dictionary - <exception>: <message>: <version>: [defect ids]
+
+        """
+        results = {}
+        for exc_name, msg_dict in self.aggregate.to_reporting_dict().items():
+            if exception is not None and exc_name != exception:
+                continue
+            for message, version_dict in msg_dict.items():
+                for ver, defect_ids in version_dict.items():
+                    if version is None or ver == version:
+                        results.setdefault(exc_name, {}).setdefault(message, {})[ver] = defect_ids
+        return results
+
+    def stacks(self, defect: typing.Optional[str] = None, min_count: int = 1,
+               limit: typing.Optional[int] = None) -> typing.List[dict]:
+        """
+        Defects grouped by identical call stack (ELFAnalysis), largest group first.
+
+        Args:
+            defect: Only return the group containing this defect ("which defects share this stack").
+            min_count: Only return groups with at least this many defects.
+            limit: Maximum number of groups to return.
+
+        Returns:
+            List of {'call_stack': <call stack string>, 'count': <count>, 'defect_ids': [defect ids]}
+
+        """
+        if defect is not None:
+            call_stack = self.defect(defect).get('call_stack')
+            groups = [(stack, ids) for stack, ids in self.stack_groups if stack == call_stack]
+        else:
+            groups = [(stack, ids) for stack, ids in self.stack_groups if len(ids) >= min_count]
+        return [{'call_stack': stack, 'count': len(ids), 'defect_ids': ids} for stack, ids in groups[:limit]]
+
+    def defect(self, defect_id: str) -> dict:
+        """
+        Args:
+            defect_id: Defect ID (e.g. - CBR-1234)
+
+        Returns:
+            Dictionary of the defect's exception, message, version and call stack.
+
+        Raises:
+            QueryError: The defect is not in the corpus.
+
+        """
+        try:
+            return self.defects[defect_id]
+        except KeyError:
+            raise QueryError(404, f"Defect not found: '{defect_id}'") from None
+
+
+class CorpusQueryServer(http.server.ThreadingHTTPServer):
+    """
+    Local HTTP (JSON) query API over a stored corpus. The corpus is loaded once; the encoded responses are cached
+    (LRU), and the corpus is reloaded (and the cache cleared) when the file changes.
+
+    A reload builds a new CorpusIndex and increments the index generation: each query runs against the index it
+    started with, and its response is only cached if no reload happened in the meantime.
+
+    Endpoints (GET; optional query parameters in brackets):
+        /                   Corpus summary
+        /tally              Counts by exception and version [exception, version]
+        /messages           Genericized message groups [exception, version]
+        /stacks             Call stack groups [defect, min_count, limit]
+        /defects/<id>       Single defect (exception, message, version, call stack)
+    """
+
+    DEFAULT_HOST = '127.0.0.1'
+    DEFAULT_PORT = 8765
+    DEFAULT_CACHE_SIZE = 256
+
+    def __init__(self, data_file: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 cache_size: int = DEFAULT_CACHE_SIZE) -> typing.NoReturn:
+        """
+        Args:
+            data_file: Corpus file (see corpus_files.open_corpus)
+            host: Interface to listen on.
+            port: Port to listen on (0 = any free port)
+            cache_size: Maximum number of cached responses.
+
+        """
+        self.index = CorpusIndex(data_file)
+        self.generation = 0
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__((host, port), CorpusRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def query(self, path: str, params: typing.Dict[str, str]) -> bytes:
+        """
+        Answer a query (from the cache, if possible).
+
+        Args:
+            path: Request path (endpoint)
+            params: Query parameters
+
+        Returns:
+            Encoded JSON response
+
+        Raises:
+            QueryError: Unknown endpoint or defect, or invalid parameter.
+
+        """
+        with self._lock:
+            if self.index.is_stale():
+                self.index = CorpusIndex(self.index.data_file)
+                self.generation += 1
+                self._cache.clear()
+                METRICS.counter('api.reloads').inc()
+
+            key = (path, tuple(sorted(params.items())))
+            response = self._cache.get(key)
+            if response is not None:
+                self._cache.move_to_end(key)
+                METRICS.counter('api.cache_hits').inc()
+                return response
+            index, generation = self.index, self.generation
+
+        response = json.dumps(self._run_query(index, path, params)).encode('utf8')
+        with self._lock:
+            # A reload while the query was running: the response is not cached (it reflects the previous corpus).
+            if generation == self.generation:
+                self._cache[key] = response
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    def _run_query(self, index: CorpusIndex, path: str, params: typing.Dict[str, str]) -> typing.Any:
+        if path == '/':
+            return index.summary()
+        if path == '/tally':
+            return index.tally(exception=params.get('exception'), version=params.get('version'))
+        if path == '/messages':
+            return index.messages(exception=params.get('exception'), version=params.get('version'))
+        if path == '/stacks':
+            return index.stacks(defect=params.get('defect'), min_count=self._int_param(params, 'min_count', 1),
+                                limit=self._int_param(params, 'limit', None))
+        if path.startswith('/defects/'):
+            return index.defect(urllib.parse.unquote(path[len('/defects/'):]))
+        raise QueryError(404, f"Unknown endpoint: '{path}'")
+
+    @staticmethod
+    def _int_param(params: typing.Dict[str, str], name: str,
+                   default: typing.Optional[int]) -> typing.Optional[int]:
+        value = params.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise QueryError(400, f"Invalid '{name}' (integer expected): '{value}'") from None
+
+
+class CorpusRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Routes GET requests to CorpusQueryServer.query(); responses are JSON.
+    """
+    server: CorpusQueryServer
+
+    def do_GET(self) -> typing.NoReturn:
+        start_time = time.perf_counter()
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path.rstrip('/') or '/'
+
+        try:
+            status, body = 200, self.server.query(path, params)
+        except QueryError as exc:
+            status, body = exc.status, json.dumps({'error': str(exc)}).encode('utf8')
+        except Exception as exc:
+            logging.getLogger(self.__class__.__name__).exception(f"{self.path}: {exc!r}")
+            status, body = 500, json.dumps({'error': repr(exc)}).encode('utf8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        METRICS.counter('api.requests').inc()
+        METRICS.histogram('api.request_seconds').observe(time.perf_counter() - start_time)
+
+    def log_message(self, format: str, *args: typing.Any) -> typing.NoReturn:
+        logging.getLogger(self.__class__.__name__).debug(f"{self.address_string()} - {format % args}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Corpus file to serve: JSONL corpus, SQLite corpus store or binary snapshot.
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "../../CBR.data.jsonl"
+
+    logging.basicConfig(level=logging.INFO)
+    with CorpusQueryServer(data_file) as server:
+        print(f"Serving '{data_file}' at {server.url} (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
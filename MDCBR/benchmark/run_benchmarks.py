@@ -0,0 +1,238 @@
+"""
+Benchmark suite for the parsing, classification, analysis and reporting stages.
+
+Usage:
+    python -m MDCBR.benchmark.run_benchmarks [-s SIZE [SIZE ...]] [-r REPEATS] [-o RESULTS.json] [-c BASELINE.json]
+
+Results are written as JSON (one entry per benchmark/size), so runs from different commits can be compared with
+the --compare option.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+from MDCBR.benchmark.synthetic_elf import SyntheticELFLogGenerator
+from MDCBR.elf.elf_analysis import ELFAnalysis
+from MDCBR.elf.elf_parser import ELFLogParser, ELFLogSections
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class BenchmarkSkipped(Exception):
+    pass
+
+
+class BenchmarkSuite:
+    """
+    Runs each benchmark at each size, using synthetic ELF logs and Jira issues.
+    """
+
+    DEFAULT_SIZES = [10, 100, 1000]
+    DEFAULT_REPEATS = 3
+    REGRESSION_THRESHOLD = 1.10
+
+    def __init__(self, sizes: typing.List[int], repeats: int, generator: SyntheticELFLogGenerator) -> typing.NoReturn:
+        self.sizes = sizes
+        self.repeats = repeats
+        self.generator = generator
+        self.work_dir = tempfile.mkdtemp(prefix='mdcbr_bench_')
+
+    # ------------------------------------------------------------------------------------------------
+    # Benchmarks: each returns a callable (the timed portion) after performing any untimed setup.
+    # ------------------------------------------------------------------------------------------------
+    def bench_parse_file(self, size: int) -> typing.Callable[[], typing.Any]:
+        files = [self.generator.write_log(os.path.join(self.work_dir, f'log_{index}.el'), index)
+                 for index in range(size)]
+        return lambda: [ELFLogParser(log_file=filename) for filename in files]
+
+    def bench_parse_stream(self, size: int) -> typing.Callable[[], typing.Any]:
+        streams = [self.generator.to_jira_stream(self.generator.generate_log(index)) for index in range(size)]
+        return lambda: [ELFLogParser(binary_content=stream) for stream in streams]
+
+    def bench_classify(self, size: int) -> typing.Callable[[], typing.Any]:
+        defect_info = self._import_defect_info()
+        issues = self.generator.generate_issues(size)
+        return lambda: [defect_info(issue, parse_elf_log=False) for issue in issues]
+
+    def bench_defect_info(self, size: int) -> typing.Callable[[], typing.Any]:
+        defect_info = self._import_defect_info()
+        issues = self.generator.generate_issues(size)
+        return lambda: [defect_info(issue) for issue in issues]
+
+    def bench_analysis(self, size: int) -> typing.Callable[[], typing.Any]:
+        section = ELFLogSections.CALL_STACK_INFORMATION
+        section_key = ELFLogParser.convert_section_type_to_key(section)
+        data_struct = {}
+        for index in range(size):
+            parser = ELFLogParser(binary_content=self.generator.to_jira_stream(self.generator.generate_log(index)))
+            data_struct[f'CBR-{index + 1}'] = {
+                section: parser.get_section(section_key)[ELFLogParser.STACK_SECTION]}
+        return lambda: ELFAnalysis(data_struct=data_struct).perform_stack_trace_assessment()
+
+    def bench_aggregate(self, size: int) -> typing.Callable[[], typing.Any]:
+        defect_info = self._import_defect_info()
+        defects = [defect_info(issue, parse_elf_log=False) for issue in self.generator.generate_issues(size)]
+        return lambda: ReportAggregate.from_defects(defects)
+
+    def bench_excel(self, size: int) -> typing.Callable[[], typing.Any]:
+        defect_info = self._import_defect_info()
+        try:
+            from MDCBR.reporting.excel_reports import ExcelWorkbook
+        except ImportError as exc:
+            raise BenchmarkSkipped(str(exc))
+
+        defects = [defect_info(issue, parse_elf_log=False) for issue in self.generator.generate_issues(size)]
+        aggregate = ReportAggregate.from_defects(defects)
+        filename = os.path.join(self.work_dir, f'bench_{size}.xlsx')
+
+        def write_workbook():
+            workbook = ExcelWorkbook(workbook_name=filename)
+            workbook.build_summary_sheet(aggregate)
+            workbook.build_detailed_table(aggregate)
+            workbook.workbook.close()
+
+        return write_workbook
+
+    @staticmethod
+    def _import_defect_info() -> typing.Any:
+        try:
+            from MDCBR.defects.defect_info import DefectInfo
+        except ImportError as exc:
+            raise BenchmarkSkipped(str(exc))
+        return DefectInfo
+
+    def cleanup(self) -> typing.NoReturn:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    # ------------------------------------------------------------------------------------------------
+    # Runner
+    # ------------------------------------------------------------------------------------------------
+    def list_benchmarks(self) -> typing.List[str]:
+        return [name[len('bench_'):] for name in dir(self) if name.startswith('bench_')]
+
+    def run(self, names: typing.Optional[typing.List[str]] = None) -> typing.List[dict]:
+        """
+        Run the benchmarks.
+
+        :param names: List of benchmark names to run (default: all)
+
+        :return: List of result dictionaries (one per benchmark and size)
+
+        """
+        results = []
+        for name in names or self.list_benchmarks():
+            for size in self.sizes:
+                result = {'name': name, 'size': size}
+                try:
+                    timed = getattr(self, f'bench_{name}')(size)
+                except BenchmarkSkipped as exc:
+                    result['skipped'] = exc.args[0]
+                    print(f"- {name:<14} n={size:<7} SKIPPED ({exc.args[0]})")
+                    results.append(result)
+                    continue
+
+                timings = []
+                for _ in range(self.repeats):
+                    start = time.perf_counter()
+                    timed()
+                    timings.append(time.perf_counter() - start)
+
+                result.update({
+                    'repeats': self.repeats,
+                    'min': min(timings),
+                    'median': statistics.median(timings),
+                    'mean': statistics.mean(timings),
+                    'per_item': min(timings) / size,
+                    'items_per_sec': size / min(timings) if min(timings) > 0 else None,
+                })
+                print(f"- {name:<14} n={size:<7} min: {result['min']:0.4f} secs  "
+                      f"median: {result['median']:0.4f} secs  ({result['per_item'] * 1000:0.3f} ms/item)")
+                results.append(result)
+        return results
+
+
+def get_metadata(args: argparse.Namespace) -> dict:
+    """
+    Describe the environment the benchmarks were run in (so results can be compared between commits).
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'stack_depth': args.stack_depth,
+        'modules': args.modules,
+        'processes': args.processes,
+        'payload_size': args.payload_size,
+        'repeats': args.repeats,
+    }
+
+
+def compare_results(current: typing.List[dict], baseline_file: str,
+                    threshold: float = BenchmarkSuite.REGRESSION_THRESHOLD) -> int:
+    """
+    Compare results against a previous results file. Prints the ratio (current/baseline) of the minimum times.
+
+    :return: Number of regressions (ratio above threshold)
+
+    """
+    with open(baseline_file, "r") as BASELINE:
+        baseline = dict(((x['name'], x['size']), x) for x in json.load(BASELINE)['results'] if 'min' in x)
+
+    regressions = 0
+    print(f"\nComparison to: {baseline_file}")
+    for result in current:
+        previous = baseline.get((result['name'], result['size']))
+        if previous is None or 'min' not in result:
+            continue
+        ratio = result['min'] / previous['min'] if previous['min'] > 0 else float('inf')
+        flag = ''
+        if ratio > threshold:
+            regressions += 1
+            flag = '  <-- REGRESSION'
+        print(f"- {result['name']:<14} n={result['size']:<7} {ratio:0.2f}x{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    cli = argparse.ArgumentParser(description="MDCBR parser/classifier/report benchmarks")
+    cli.add_argument('-s', '--sizes', type=int, nargs='+', default=BenchmarkSuite.DEFAULT_SIZES,
+                     help=f"Number of logs/issues per benchmark. Default: {BenchmarkSuite.DEFAULT_SIZES}")
+    cli.add_argument('-r', '--repeats', type=int, default=BenchmarkSuite.DEFAULT_REPEATS,
+                     help=f"Timed repetitions per benchmark. Default: {BenchmarkSuite.DEFAULT_REPEATS}")
+    cli.add_argument('-b', '--benchmarks', nargs='+', default=None, help="Benchmarks to run. Default: all")
+    cli.add_argument('--stack_depth', type=int, default=20, help="Call stack frames per log. Default: 20")
+    cli.add_argument('--modules', type=int, default=50, help="Modules per log. Default: 50")
+    cli.add_argument('--processes', type=int, default=30, help="Processes per log. Default: 30")
+    cli.add_argument('--payload_size', type=int, default=0, help="Filler bytes per log. Default: 0")
+    cli.add_argument('-o', '--output', default='bench_results.json', help="Results file. Default: bench_results.json")
+    cli.add_argument('-c', '--compare', default=None, help="Previous results file to compare against.")
+    args = cli.parse_args()
+
+    elf_generator = SyntheticELFLogGenerator(stack_depth=args.stack_depth, num_modules=args.modules,
+                                             num_processes=args.processes, payload_size=args.payload_size)
+    suite = BenchmarkSuite(sizes=args.sizes, repeats=args.repeats, generator=elf_generator)
+    try:
+        bench_results = suite.run(args.benchmarks)
+    finally:
+        suite.cleanup()
+
+    with open(args.output, "w") as RESULTS:
+        json.dump({'meta': get_metadata(args), 'results': bench_results}, RESULTS, indent=2)
+    print(f"\nWrote results to: {args.output}")
+
+    if args.compare is not None:
+        sys.exit(1 if compare_results(bench_results, args.compare) else 0)
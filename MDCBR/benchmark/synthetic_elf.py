@@ -0,0 +1,225 @@
+import random
+import typing
+
+from MDCBR.elf.elf_log_sections import ELFLogSections
+from MDCBR.md.md_records import AttachmentRecord, IssueFieldsRecord, IssueRecord
+
+
+class SyntheticELFLogGenerator:
+    """
+    Generates Eureka-format (ELF) logs and matching Jira issues for benchmarking and manual testing.
+
+    The generated logs contain every section defined in ELFLogSections, so they can be parsed by ELFLogParser, and the
+    issue summaries/descriptions match the MDExceptions patterns used by DefectInfo.
+
+    Size knobs:
+        stack_depth: Number of frames in the call stack
+        num_modules: Number of rows in the Modules table
+        num_processes: Number of rows in the Processes table
+        payload_size: Approximate number of filler bytes (Assembler/Registers sections) added to each log
+        stack_variants: Number of distinct call stacks generated (controls ELFAnalysis grouping)
+    """
+
+    NEWLINE = '\r\n'
+    TABLE_WIDTH = 120
+    VERSIONS = ['19.2.10.3', '19.2.9.14', '19.1.4.2', '20.1.0.7']
+
+    # Exception type -> message template (matching an MDExceptions <EXCEPTION>_PARSE pattern)
+    MESSAGES = {
+        'EAccessViolation': "Access violation at address {addr} in module 'MD.exe'. Read of address {addr2}.",
+        'ERangeError': "Range check error.",
+        'EListError': "List index out of bounds ({index}).",
+        'EDatabaseError': "'{value}' is not a valid integer value for field 'LoanID'.",
+        'EInvalidCast': "Invalid class typecast.",
+        'EOSError': "System Error.  Code: {index}.",
+    }
+
+    def __init__(self, stack_depth: int = 20, num_modules: int = 50, num_processes: int = 30,
+                 payload_size: int = 0, stack_variants: int = 10, seed: int = 0) -> typing.NoReturn:
+        self.stack_depth = stack_depth
+        self.num_modules = num_modules
+        self.num_processes = num_processes
+        self.payload_size = payload_size
+        self.stack_variants = max(1, stack_variants)
+        self.seed = seed
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(f'{self.seed}:{index}')
+
+    @staticmethod
+    def _hex(rng: random.Random) -> str:
+        return f'{rng.getrandbits(32):08X}'
+
+    def _table_row(self, values: typing.List[str]) -> str:
+        return f"|{'|'.join(values)}|"
+
+    def _general_section(self, number: int, name: str, attributes: typing.List[typing.Tuple[str, str]]) -> typing.List[str]:
+        lines = [f"{name}:", '-' * 30]
+        width = max([len(attr) for attr, _ in attributes] + [0])
+        lines.extend(f"  {number}.{index} {attr.ljust(width)}: {value}"
+                     for index, (attr, value) in enumerate(attributes, 1))
+        lines.append('')
+        return lines
+
+    def _call_stack_section(self, rng: random.Random, variant: int) -> typing.List[str]:
+        header = ['Methods', 'Details', 'Stack', 'Address', 'Module', 'Offset', 'Unit', 'Class', 'Procedure/Method',
+                  'Line']
+        lines = [f"{ELFLogSections.CALL_STACK_INFORMATION}:", '-' * self.TABLE_WIDTH, self._table_row(header),
+                 '-' * self.TABLE_WIDTH,
+                 f"|*Exception Thread: ID={rng.randint(1, 9999)}; Parent=0; Priority=0|",
+                 "|Class=; Name=MAIN|",
+                 f"|{'-' * self.TABLE_WIDTH}|"]
+        for frame in range(self.stack_depth):
+            lines.append(self._table_row([
+                '7FFFFFFE', '03', self._hex(rng), self._hex(rng), 'MD.exe', self._hex(rng),
+                f'uUnit{variant}_{frame}', f'TClass{variant}_{frame}', f'Procedure{frame}', f'{rng.randint(1, 5000)}[0]']))
+        lines += ['-' * self.TABLE_WIDTH, '']
+        return lines
+
+    def _modules_section(self, rng: random.Random) -> typing.List[str]:
+        header = ['Handle', 'Name', 'Description', 'Version', 'Size', 'Modified', 'Path']
+        lines = [f"{ELFLogSections.MODULES}:", '-' * self.TABLE_WIDTH, self._table_row(header), '-' * self.TABLE_WIDTH]
+        for module in range(self.num_modules):
+            lines.append(self._table_row([
+                self._hex(rng), f'module{module}.dll', f'Module {module}', f'1.0.{module}.0',
+                str(rng.randint(1000, 9999999)), '2020-05-11 14:22:18', f'C:\\Windows\\System32\\']))
+        lines += ['-' * self.TABLE_WIDTH, '']
+        return lines
+
+    def _processes_section(self, rng: random.Random) -> typing.List[str]:
+        header = ['ID', 'Name', 'Description', 'Version', 'Memory', 'Priority', 'Threads', 'Path']
+        lines = [f"{ELFLogSections.PROCESSES_INFORMATION}:", '-' * self.TABLE_WIDTH, self._table_row(header),
+                 '-' * self.TABLE_WIDTH]
+        for process in range(self.num_processes):
+            lines.append(self._table_row([
+                str(rng.randint(1, 65535)), f'process{process}.exe', f'Process {process}', f'10.0.{process}.1',
+                f'{rng.randint(1, 500000)} Kb', 'Normal', str(rng.randint(1, 64)), 'C:\\Program Files\\']))
+        lines += ['-' * self.TABLE_WIDTH, '']
+        return lines
+
+    def _filler_section(self, name: str, size: int) -> typing.List[str]:
+        lines = [f"{name}:", '-' * 30]
+        line = ' '.join(['00'] * 32)
+        lines.extend(line for _ in range(max(0, size) // (len(line) + 2)))
+        lines.append('')
+        return lines
+
+    def exception_type(self, index: int) -> str:
+        names = list(self.MESSAGES.keys())
+        return names[index % len(names)]
+
+    def message(self, index: int) -> str:
+        rng = self._rng(index)
+        return self.MESSAGES[self.exception_type(index)].format(
+            addr=self._hex(rng), addr2=self._hex(rng), index=rng.randint(0, 99), value=f'L{rng.randint(0, 9999)}')
+
+    def version(self, index: int) -> str:
+        return self.VERSIONS[index % len(self.VERSIONS)]
+
+    def generate_log(self, index: int = 0) -> str:
+        """
+        Generate a single ELF log.
+
+        :param index: Log number (the content is deterministic per seed + index)
+
+        :return: Log text (CRLF line endings)
+
+        """
+        rng = self._rng(index)
+        variant = index % self.stack_variants
+        date = f'Mon, {1 + index % 28:02d} Jun 2020 14:{index % 60:02d}:18 -0500'
+
+        lines = ['EurekaLog 7.8.2.0', '']
+        lines += self._general_section(1, ELFLogSections.APPLICATION, [
+            ('Start Date', date), ('Name/Description', 'MD.exe - (Mortgage Director)'),
+            ('Version Number', self.version(index)), ('Parameters', ''), ('Compilation Date', date),
+            ('Up Time', f'{rng.randint(1, 500)} seconds')])
+        lines += self._general_section(2, ELFLogSections.EXCEPTION, [
+            ('Date', date), ('Address', self._hex(rng)), ('Module Name', 'MD.exe'),
+            ('Module Version', self.version(index)), ('Type', self.exception_type(index)),
+            ('Message', self.message(index)), ('ID', self._hex(rng)), ('Sent', '0')])
+        lines += self._general_section(3, ELFLogSections.USER, [('ID', f'user{index}'), ('Name', f'User {index}')])
+        lines += self._general_section(4, ELFLogSections.ACTIVE_CONTROLS, [
+            ('Form Class', 'TLoanForm'), ('Form Text', 'Loan'), ('Control Class', 'TEdit'), ('Control Text', '')])
+        lines += self._general_section(5, ELFLogSections.COMPUTER, [
+            ('Name', f'WS{index:05d}'), ('Total Memory', '16 Gb'), ('Free Memory', '4 Gb'), ('Total Disk', '500 Gb'),
+            ('Free Disk', '100 Gb'), ('System Up Time', '1 day'), ('Processor', 'Intel'),
+            ('Display Mode', '1920 x 1080, 32 bit'), ('Display DPI', '96'), ('Video Card', 'Intel HD'),
+            ('Virtual Machine', 'No')])
+        lines += self._general_section(6, ELFLogSections.OPERATING_SYSTEM, [
+            ('Type', 'Microsoft Windows 10'), ('Build #', '18363'), ('Update', ''),
+            ('Non-Unicode Language', '0409'), ('Charset/ACP', '1252')])
+        lines += self._general_section(7, ELFLogSections.NETWORK, [
+            ('IP Address', '192.168.001.010'), ('Submask', '255.255.255.000'), ('Gateway', '192.168.001.001'),
+            ('DNS 1', '192.168.001.002'), ('DNS 2', '000.000.000.000'), ('DHCP', 'ON')])
+        lines += self._call_stack_section(rng, variant)
+        lines += self._modules_section(rng)
+        lines += self._processes_section(rng)
+        lines += self._filler_section(ELFLogSections.ASSEMBLER_INFORMATION, self.payload_size // 2)
+        lines += self._filler_section(ELFLogSections.REGISTERS, self.payload_size - self.payload_size // 2)
+        return self.NEWLINE.join(lines)
+
+    @staticmethod
+    def to_jira_stream(log_text: str) -> str:
+        """
+        Encode a log the way DefectInfo receives it from Jira: str() of the downloaded bytes.
+
+        :param log_text: Log text
+
+        :return: Jira-stream encoded log (as consumed by ELFLogParser(binary_content=...))
+
+        """
+        return str(log_text.encode('utf8'))
+
+    def write_log(self, filename: str, index: int = 0) -> str:
+        """
+        Write a generated log to a file (file encoding, as consumed by ELFLogParser(log_file=...)).
+
+        :return: Filename written.
+
+        """
+        with open(filename, "w", encoding='utf8', newline='') as ELF:
+            ELF.write(self.generate_log(index))
+        return filename
+
+    def generate_issue(self, index: int = 0, project: str = 'CBR', user_data: bool = False) -> IssueRecord:
+        """
+        Generate a Jira issue stand-in (summary, description and ELF attachment) for a generated log.
+
+        :param index: Log/issue number
+        :param project: Jira project used to build the issue key
+        :param user_data: Append user-provided text to the description
+
+        :return: IssueRecord (jira.Issue stand-in)
+
+        """
+        rng = self._rng(index)
+        exception_type = self.exception_type(index)
+        summary = f"{exception_type} (MD Bug Report {self._hex(rng)}; v{self.version(index)})"
+        description = f"Server Hostname: SRV{index % 7:02d}{self.NEWLINE}{self.message(index)}"
+        if user_data:
+            description += f"{self.NEWLINE}User was saving the loan."
+        attachment = AttachmentRecord(f'BugReport_{index:08d}.el', content=self.generate_log(index).encode('utf8'))
+        created = f'2020-06-{1 + index % 28:02d}T14:{index % 60:02d}:18.000-0500'
+        return IssueRecord(key=f'{project}-{index + 1}',
+                           fields=IssueFieldsRecord(summary, description, [attachment], created=created))
+
+    def generate_issues(self, count: int, project: str = 'CBR') -> typing.List[IssueRecord]:
+        return [self.generate_issue(index, project=project, user_data=(index % 5 == 0)) for index in range(count)]
+
+
+if __name__ == '__main__':
+    """
+    Write a directory of synthetic ELF logs: ./synthetic_elf.py <OUTPUT DIR> [<NUMBER OF LOGS>]
+    """
+    import os
+    import sys
+
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else 'synthetic_elf_logs'
+    number_of_logs = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    os.makedirs(output_dir, exist_ok=True)
+    elf_generator = SyntheticELFLogGenerator()
+    for log_index in range(number_of_logs):
+        elf_generator.write_log(os.path.join(output_dir, f'BugReport_{log_index:08d}.el'), log_index)
+    print(f"Wrote {number_of_logs} logs to: {output_dir}")
@@ -0,0 +1,431 @@
+import array
+import mmap
+import struct
+import sys
+import typing
+
+from MDCBR.corpus.jsonl_corpus import CorpusFields, build_aggregate_from_records
+from MDCBR.elf.elf_parser import ELFDataTuples, ELFLogParser, ELFLogSections, SectionNotFound
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class SnapshotFormatError(Exception):
+    pass
+
+
+class SnapshotVersionError(SnapshotFormatError):
+    pass
+
+
+class SnapshotLayout:
+    """
+    Binary layout of a parsed ELF corpus snapshot. All integers are little-endian; every table starts on an 8-byte
+    boundary so it can be viewed directly (memoryview.cast) from the memory-mapped file (on big-endian hosts, the
+    tables are copied and byte-swapped instead).
+
+        HEADER:           magic, format version, table sizes, column counts, table offsets (see HEADER)
+        STRING OFFSETS:   (num_strings + 1) x uint64 - start of each string in the blob (last entry = blob length)
+        STRING BLOB:      UTF-8 encoded strings, concatenated
+        DEFECTS:          num_defects x DEFECT_COLUMNS x uint32
+        FRAMES:           num_frames x <call stack columns> x uint32 (string table indices)
+        MODULES:          num_modules x <modules columns> x uint32 (string table indices)
+        PROCESSES:        num_processes x <processes columns> x uint32 (string table indices)
+
+    Strings are interned: each unique string is stored once; all tables reference strings by index.
+    """
+    MAGIC = b'MDCBRSNP'
+    FORMAT_VERSION = 2
+
+    # magic, version, reserved, num_strings, num_defects, num_frames, num_modules, num_processes,
+    # frame_cols, module_cols, process_cols, reserved, offsets: string offsets, blob, defects, frames, modules, processes
+    HEADER = struct.Struct('<8sHHIIIIIIIII6Q')
+
+    # Index used for a missing (None) string
+    NO_STRING = 0xFFFFFFFF
+
+    # Defect row columns (all uint32)
+    DEFECT_ID = 0
+    EXCEPTION = 1
+    VERSION = 2
+    ERR_MSG = 3
+    FRAME_START = 4
+    FRAME_COUNT = 5
+    MODULE_START = 6
+    MODULE_COUNT = 7
+    PROCESS_START = 8
+    PROCESS_COUNT = 9
+    USER_DATA = 10
+    DEFECT_COLUMNS = 11
+
+    # ELF sections stored as integer-encoded rows
+    FRAME_SECTION = ELFLogSections.CALL_STACK_INFORMATION
+    MODULE_SECTION = ELFLogSections.MODULES
+    PROCESS_SECTION = ELFLogSections.PROCESSES_INFORMATION
+
+    ALIGNMENT = 8
+
+    @classmethod
+    def padding(cls, offset: int) -> int:
+        return (-offset) % cls.ALIGNMENT
+
+
+class SnapshotWriter:
+    """
+    Builds a binary snapshot of parsed defects. Defects are added one at a time (the instance is callable, so it can be
+    registered as a Defects listener); the file is written when the writer is closed.
+    """
+
+    def __init__(self, snapshot_file: str) -> typing.NoReturn:
+        """
+        :param snapshot_file: Name of snapshot file to write.
+        """
+        self.snapshot_file = snapshot_file
+        self._string_index = {}
+        self._strings = []
+
+        # Tables are buffered as uint32 arrays (written as-is on close; byte-swapped on big-endian hosts).
+        self._defects = array.array('I')
+        self._frames = array.array('I')
+        self._modules = array.array('I')
+        self._processes = array.array('I')
+        self._closed = False
+
+        self._frame_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.FRAME_SECTION)
+        self._module_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.MODULE_SECTION)
+        self._process_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.PROCESS_SECTION)
+
+    @property
+    def count(self) -> int:
+        return len(self._defects) // SnapshotLayout.DEFECT_COLUMNS
+
+    def _intern(self, string: typing.Optional[str]) -> int:
+        """
+        Get the string table index for a string, adding it to the table if not seen before.
+
+        :param string: String to intern (None is stored as SnapshotLayout.NO_STRING)
+
+        :return: Index into the string table
+
+        """
+        if string is None:
+            return SnapshotLayout.NO_STRING
+        index = self._string_index.get(string)
+        if index is None:
+            index = self._string_index[string] = len(self._strings)
+            self._strings.append(string)
+        return index
+
+    def _add_rows(self, table: array.array, rows: typing.Iterable[tuple], columns: typing.List[str]) -> int:
+        """
+        Integer-encode a list of section namedtuples into a flat table.
+
+        :return: Number of rows added.
+
+        """
+        count = 0
+        for row in rows:
+            table.extend(self._intern(getattr(row, column, None)) for column in columns)
+            count += 1
+        return count
+
+    @staticmethod
+    def _get_section(elf_model: typing.Any, section: str) -> typing.Any:
+        if elf_model is None:
+            return []
+        try:
+            return elf_model.get_section(ELFLogParser.convert_section_type_to_key(section))
+        except SectionNotFound:
+            return []
+
+    def add_defect(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Add a single defect (and its parsed call stack, modules and processes) to the snapshot.
+
+        :param defect: DefectInfo (or equivalent) object.
+
+        :return: None
+
+        """
+        elf_model = defect.elf_log_model
+        call_stack = self._get_section(elf_model, SnapshotLayout.FRAME_SECTION)
+        frames = call_stack[ELFLogParser.STACK_SECTION] if isinstance(call_stack, dict) else []
+
+        row = [0] * SnapshotLayout.DEFECT_COLUMNS
+        row[SnapshotLayout.DEFECT_ID] = self._intern(defect.defect_id)
+        row[SnapshotLayout.EXCEPTION] = self._intern(defect.exception_type)
+        row[SnapshotLayout.VERSION] = self._intern(defect.version)
+        row[SnapshotLayout.ERR_MSG] = self._intern(
+            defect.error_msg if defect.general_error_msg is None else defect.general_error_msg)
+        row[SnapshotLayout.USER_DATA] = int(defect.user_added_data is not None)
+
+        row[SnapshotLayout.FRAME_START] = len(self._frames) // len(self._frame_cols)
+        row[SnapshotLayout.FRAME_COUNT] = self._add_rows(self._frames, frames, self._frame_cols)
+        row[SnapshotLayout.MODULE_START] = len(self._modules) // len(self._module_cols)
+        row[SnapshotLayout.MODULE_COUNT] = self._add_rows(
+            self._modules, self._get_section(elf_model, SnapshotLayout.MODULE_SECTION), self._module_cols)
+        row[SnapshotLayout.PROCESS_START] = len(self._processes) // len(self._process_cols)
+        row[SnapshotLayout.PROCESS_COUNT] = self._add_rows(
+            self._processes, self._get_section(elf_model, SnapshotLayout.PROCESS_SECTION), self._process_cols)
+
+        self._defects.extend(row)
+
+    __call__ = add_defect
+
+    def close(self) -> typing.NoReturn:
+        """
+        Write the snapshot file.
+
+        :return: None
+
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        encoded = [string.encode('utf8') for string in self._strings]
+        string_offsets = array.array('Q', [0])
+        for data in encoded:
+            string_offsets.append(string_offsets[-1] + len(data))
+
+        tables = [string_offsets, encoded, self._defects, self._frames, self._modules, self._processes]
+        sizes = [string_offsets[-1] if table is encoded else len(table) * table.itemsize for table in tables]
+
+        # Compute the aligned offset of each table
+        offsets = []
+        position = SnapshotLayout.HEADER.size + SnapshotLayout.padding(SnapshotLayout.HEADER.size)
+        for size in sizes:
+            offsets.append(position)
+            position += size + SnapshotLayout.padding(size)
+
+        header = SnapshotLayout.HEADER.pack(
+            SnapshotLayout.MAGIC, SnapshotLayout.FORMAT_VERSION, 0,
+            len(self._strings), self.count,
+            len(self._frames) // len(self._frame_cols),
+            len(self._modules) // len(self._module_cols),
+            len(self._processes) // len(self._process_cols),
+            len(self._frame_cols), len(self._module_cols), len(self._process_cols), 0,
+            *offsets)
+
+        with open(self.snapshot_file, "wb") as SNAPSHOT:
+            SNAPSHOT.write(header)
+            SNAPSHOT.write(b'\0' * SnapshotLayout.padding(len(header)))
+            for table, size in zip(tables, sizes):
+                if table is encoded:
+                    SNAPSHOT.writelines(encoded)
+                else:
+                    # The snapshot is little-endian (the tables are no longer needed, so they are swapped in place).
+                    if sys.byteorder == 'big':
+                        table.byteswap()
+                    table.tofile(SNAPSHOT)
+                SNAPSHOT.write(b'\0' * SnapshotLayout.padding(size))
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
+
+
+class BinarySnapshot:
+    """
+    Read-only, memory-mapped view of a binary corpus snapshot. Opening a snapshot only reads the header; strings and
+    rows are decoded on demand, so the open time is independent of the corpus size.
+    """
+
+    def __init__(self, snapshot_file: str) -> typing.NoReturn:
+        """
+        :param snapshot_file: Name of snapshot file to open.
+
+        :raises: SnapshotFormatError (not a snapshot), SnapshotVersionError (unsupported format version or
+            section definitions).
+        """
+        self.snapshot_file = snapshot_file
+        self._file = open(self.snapshot_file, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotFormatError(f"Empty snapshot file: {snapshot_file}")
+
+        if len(self._mmap) < SnapshotLayout.HEADER.size:
+            self.close()
+            raise SnapshotFormatError(f"Truncated snapshot file: {snapshot_file}")
+
+        (magic, self.format_version, _, self.num_strings, self.num_defects, self.num_frames, self.num_modules,
+         self.num_processes, self._frame_width, self._module_width, self._process_width, _,
+         *offsets) = SnapshotLayout.HEADER.unpack_from(self._mmap, 0)
+
+        if magic != SnapshotLayout.MAGIC:
+            self.close()
+            raise SnapshotFormatError(f"Not a corpus snapshot: {snapshot_file}")
+
+        if self.format_version != SnapshotLayout.FORMAT_VERSION:
+            self.close()
+            raise SnapshotVersionError(f"Unsupported snapshot format version {self.format_version} "
+                                       f"(expected {SnapshotLayout.FORMAT_VERSION}): {snapshot_file}")
+
+        self._frame_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.FRAME_SECTION)
+        self._module_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.MODULE_SECTION)
+        self._process_cols = ELFDataTuples.get_elf_section_attribute_list(SnapshotLayout.PROCESS_SECTION)
+        if ((self._frame_width, self._module_width, self._process_width) !=
+                (len(self._frame_cols), len(self._module_cols), len(self._process_cols))):
+            self.close()
+            raise SnapshotVersionError(f"Snapshot section definitions do not match ELFDataTuples: {snapshot_file}")
+
+        (str_offsets, self._blob_offset, defects_offset, frames_offset, modules_offset,
+         processes_offset) = offsets
+
+        view = memoryview(self._mmap)
+        self._str_offsets = self._table(view, str_offsets, self.num_strings + 1, 'Q')
+        self._defects = self._table(view, defects_offset, self.num_defects * SnapshotLayout.DEFECT_COLUMNS)
+        self._frames = self._table(view, frames_offset, self.num_frames * self._frame_width)
+        self._modules = self._table(view, modules_offset, self.num_modules * self._module_width)
+        self._processes = self._table(view, processes_offset, self.num_processes * self._process_width)
+
+        tuples = ELFDataTuples()
+        self._frame_tuple = tuples.get_tuple_definition(SnapshotLayout.FRAME_SECTION)
+        self._module_tuple = tuples.get_tuple_definition(SnapshotLayout.MODULE_SECTION)
+        self._process_tuple = tuples.get_tuple_definition(SnapshotLayout.PROCESS_SECTION)
+        self._string_cache = {}
+
+    @staticmethod
+    def _table(view: memoryview, offset: int, count: int,
+               type_code: str = 'I') -> typing.Union[memoryview, array.array]:
+        """
+        View a table of unsigned integers ('I' = uint32, 'Q' = uint64) in the snapshot.
+
+        :return: memoryview of the table; on a big-endian host, a byte-swapped copy of the table (array).
+        """
+        table = view[offset:offset + count * struct.calcsize(type_code)].cast(type_code)
+        if sys.byteorder == 'little':
+            return table
+
+        values = array.array(type_code, table)
+        table.release()
+        values.byteswap()
+        return values
+
+    def __len__(self) -> int:
+        return self.num_defects
+
+    def string(self, index: int) -> typing.Optional[str]:
+        """
+        Decode a string from the string table (decoded strings are cached).
+
+        :param index: String table index
+
+        :return: String (or None for SnapshotLayout.NO_STRING)
+
+        """
+        if index == SnapshotLayout.NO_STRING:
+            return None
+        string = self._string_cache.get(index)
+        if string is None:
+            start = self._blob_offset + self._str_offsets[index]
+            stop = self._blob_offset + self._str_offsets[index + 1]
+            string = self._string_cache[index] = self._mmap[start:stop].decode('utf8')
+        return string
+
+    def _defect_column(self, defect_index: int, column: int) -> int:
+        return self._defects[defect_index * SnapshotLayout.DEFECT_COLUMNS + column]
+
+    def _rows(self, table: memoryview, width: int, start: int, count: int,
+              data_tuple: typing.Any) -> typing.List[tuple]:
+        rows = []
+        for row in range(start, start + count):
+            base = row * width
+            rows.append(data_tuple(*[self.string(table[base + col]) for col in range(width)]))
+        return rows
+
+    def defect_id(self, defect_index: int) -> str:
+        return self.string(self._defect_column(defect_index, SnapshotLayout.DEFECT_ID))
+
+    def call_stack(self, defect_index: int) -> typing.List[tuple]:
+        """
+        :return: List of call stack namedtuples (same as ELFLogParser call stack 'stack' entries).
+        """
+        return self._rows(self._frames, self._frame_width,
+                          self._defect_column(defect_index, SnapshotLayout.FRAME_START),
+                          self._defect_column(defect_index, SnapshotLayout.FRAME_COUNT), self._frame_tuple)
+
+    def modules(self, defect_index: int) -> typing.List[tuple]:
+        """
+        :return: List of module namedtuples (same as ELFLogParser modules section).
+        """
+        return self._rows(self._modules, self._module_width,
+                          self._defect_column(defect_index, SnapshotLayout.MODULE_START),
+                          self._defect_column(defect_index, SnapshotLayout.MODULE_COUNT), self._module_tuple)
+
+    def processes(self, defect_index: int) -> typing.List[tuple]:
+        """
+        :return: List of process namedtuples (same as ELFLogParser processes section).
+        """
+        return self._rows(self._processes, self._process_width,
+                          self._defect_column(defect_index, SnapshotLayout.PROCESS_START),
+                          self._defect_column(defect_index, SnapshotLayout.PROCESS_COUNT), self._process_tuple)
+
+    def user_data(self, defect_index: int) -> bool:
+        return bool(self._defect_column(defect_index, SnapshotLayout.USER_DATA))
+
+    def record(self, defect_index: int) -> dict:
+        """
+        Decode a single defect into a corpus record (same fields as the JSONL corpus).
+
+        :param defect_index: Index of the defect in the snapshot.
+
+        :return: Dictionary of record fields.
+
+        """
+        return {
+            CorpusFields.DEFECT_ID: self.defect_id(defect_index),
+            CorpusFields.EXCEPTION: self.string(self._defect_column(defect_index, SnapshotLayout.EXCEPTION)),
+            CorpusFields.VERSION: self.string(self._defect_column(defect_index, SnapshotLayout.VERSION)),
+            CorpusFields.ERR_MSG: self.string(self._defect_column(defect_index, SnapshotLayout.ERR_MSG)),
+            CorpusFields.CALL_STACK: self.call_stack(defect_index),
+            CorpusFields.USER_DATA: self.user_data(defect_index),
+        }
+
+    def __iter__(self) -> typing.Iterator[dict]:
+        for defect_index in range(self.num_defects):
+            yield self.record(defect_index)
+
+    def iter_analysis_items(self) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """
+        Iterate through the snapshot in the (defect_id, {section: [call stack namedtuples]}) format consumed by
+        ELFAnalysis.
+
+        :return: Iterator of (defect_id, data) tuples.
+
+        """
+        for defect_index in range(self.num_defects):
+            yield self.defect_id(defect_index), {SnapshotLayout.FRAME_SECTION: self.call_stack(defect_index)}
+
+    def build_aggregate(self) -> ReportAggregate:
+        """
+        Build the reporting aggregate from the snapshot (the call stacks are not decoded).
+
+        :return: Finalized ReportAggregate
+
+        """
+        return build_aggregate_from_records({
+            CorpusFields.DEFECT_ID: self.defect_id(defect_index),
+            CorpusFields.EXCEPTION: self.string(self._defect_column(defect_index, SnapshotLayout.EXCEPTION)),
+            CorpusFields.VERSION: self.string(self._defect_column(defect_index, SnapshotLayout.VERSION)),
+            CorpusFields.ERR_MSG: self.string(self._defect_column(defect_index, SnapshotLayout.ERR_MSG)),
+            CorpusFields.USER_DATA: self.user_data(defect_index),
+        } for defect_index in range(self.num_defects))
+
+    def close(self) -> typing.NoReturn:
+        for attr in ('_str_offsets', '_defects', '_frames', '_modules', '_processes'):
+            view = getattr(self, attr, None)
+            if isinstance(view, memoryview):
+                view.release()
+        if getattr(self, '_mmap', None) is not None and not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "BinarySnapshot":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
@@ -0,0 +1,34 @@
+import typing
+
+from MDCBR.elf.elf_log_sections import ELFLogSections
+
+
+class CorpusFileTypes:
+    """
+    Corpus file extensions: JSON-lines corpus, SQLite corpus store; any other file is read as a binary snapshot.
+    """
+    JSONL = '.jsonl'
+    SQLITE = '.db'
+
+
+def open_corpus(data_file: str, section: str = ELFLogSections.CALL_STACK_INFORMATION) -> typing.Any:
+    """
+    Open a stored corpus, based on the file extension (see CorpusFileTypes). Every corpus type provides
+    iter_analysis_items() (ELFAnalysis input) and build_aggregate() (report input).
+
+    :param data_file: Corpus file (JSONL corpus, SQLite store or binary snapshot).
+    :param section: ELF log section containing the call stack (JSONL corpus only).
+
+    :return: JSONLCorpusReader, SQLiteCorpusStore or BinarySnapshot
+
+    """
+    if data_file.endswith(CorpusFileTypes.JSONL):
+        from MDCBR.corpus.jsonl_corpus import CorpusFields, JSONLCorpusReader
+        return JSONLCorpusReader(data_file, fields=[CorpusFields.CALL_STACK], section=section)
+
+    if data_file.endswith(CorpusFileTypes.SQLITE):
+        from MDCBR.corpus.sqlite_store import SQLiteCorpusStore
+        return SQLiteCorpusStore(data_file)
+
+    from MDCBR.corpus.binary_snapshot import BinarySnapshot
+    return BinarySnapshot(data_file)
@@ -0,0 +1,189 @@
+import json
+import typing
+
+from MDCBR.elf.elf_parser import ELFDataTuples, ELFLogParser, ELFLogSections
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class CorpusFields:
+    """
+    Field names used in each corpus record. (Matches the keys used by debug.issue_list_to_file.)
+    """
+    DEFECT_ID = 'defect_id'
+    EXCEPTION = 'exception'
+    VERSION = 'version'
+    ERR_MSG = 'err_msg'
+    CALL_STACK = 'call_stack'
+    USER_DATA = 'user_data'
+
+    @classmethod
+    def list_fields(cls) -> typing.List[str]:
+        return [cls.DEFECT_ID, cls.EXCEPTION, cls.VERSION, cls.ERR_MSG, cls.CALL_STACK, cls.USER_DATA]
+
+
+def build_corpus_record(defect: typing.Any, section: str = ELFLogSections.CALL_STACK_INFORMATION) -> dict:
+    """
+    Build the serializable corpus record for a single defect.
+
+    :param defect: DefectInfo (or equivalent) object.
+    :param section: ELF log section containing the call stack (ELFLogSections attribute).
+
+    :return: Dictionary of the record fields (see CorpusFields); the call stack is empty if the defect has no ELF log.
+
+    """
+    section_key = ELFLogParser.convert_section_type_to_key(section)
+    elf_model = defect.elf_log_model
+    return {
+        CorpusFields.DEFECT_ID: defect.defect_id,
+        CorpusFields.EXCEPTION: defect.exception_type,
+        CorpusFields.VERSION: defect.version,
+        CorpusFields.ERR_MSG: defect.error_msg if defect.general_error_msg is None else defect.general_error_msg,
+        CorpusFields.CALL_STACK: [] if elf_model is None else [
+            stack._asdict() for stack in elf_model.get_section(section_key)[ELFLogParser.STACK_SECTION]],
+        CorpusFields.USER_DATA: defect.user_added_data is not None,
+    }
+
+
+def build_aggregate_from_records(records: typing.Iterable[dict]) -> ReportAggregate:
+    """
+    Build the reporting aggregate from corpus records (JSONL corpus or binary snapshot).
+
+    Defect ids with user-added data are marked with ReportAggregate.USER_DATA_MARKER (records written before the
+    user data field was added are not marked).
+
+    :param records: Iterable of record dictionaries (see CorpusFields).
+
+    :return: Finalized ReportAggregate
+
+    """
+    aggregate = ReportAggregate()
+    for record in records:
+        extra_data = ReportAggregate.USER_DATA_MARKER if record.get(CorpusFields.USER_DATA) else ''
+        aggregate.add(exception_type=record[CorpusFields.EXCEPTION], message=record[CorpusFields.ERR_MSG],
+                      version=record[CorpusFields.VERSION], defect_id=f'{record[CorpusFields.DEFECT_ID]}{extra_data}')
+    return aggregate.finalize()
+
+
+class JSONLCorpusWriter:
+    """
+    Writes the defect corpus as JSON lines: one defect per line, written as each defect is processed.
+    Can be used as a context manager, and the instance is callable, so it can be registered directly as a
+    Defects listener.
+    """
+
+    def __init__(self, data_file: str, section: str = ELFLogSections.CALL_STACK_INFORMATION,
+                 flush_every: int = 100) -> typing.NoReturn:
+        """
+        :param data_file: Name of the JSONL file to write.
+        :param section: ELF log section containing the call stack (ELFLogSections attribute).
+        :param flush_every: Flush the file after this many records (0 = let the OS decide).
+        """
+        self.data_file = data_file
+        self.section = section
+        self.flush_every = flush_every
+        self.count = 0
+        self._file = open(self.data_file, "w", encoding='utf8')
+
+    def write(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Serialize and write a single defect.
+
+        :param defect: DefectInfo (or equivalent) object.
+
+        :return: None
+
+        """
+        self.write_record(build_corpus_record(defect, section=self.section))
+
+    def write_record(self, record: dict) -> typing.NoReturn:
+        """
+        Write a pre-built corpus record.
+
+        :param record: Dictionary of the record fields (see CorpusFields).
+
+        :return: None
+
+        """
+        self._file.write(json.dumps(record, separators=(',', ':')))
+        self._file.write('\n')
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self._file.flush()
+
+    __call__ = write
+
+    def close(self) -> typing.NoReturn:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> "JSONLCorpusWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
+
+
+class JSONLCorpusReader:
+    """
+    Lazily iterates a JSONL defect corpus, one record at a time, so memory use is independent of the corpus size.
+
+    fields: optional projection (list of CorpusFields). Only the requested fields are kept in each record, and the
+    call stack namedtuples are only built if the call stack is requested.
+    """
+
+    def __init__(self, data_file: str, fields: typing.Optional[typing.Iterable[str]] = None,
+                 section: str = ELFLogSections.CALL_STACK_INFORMATION) -> typing.NoReturn:
+        """
+        :param data_file: Name of the JSONL file to read.
+        :param fields: List of fields to return (default: all fields).
+        :param section: ELF log section the call stack frames belong to (ELFLogSections attribute).
+        """
+        self.data_file = data_file
+        self.fields = None if fields is None else set(fields) | {CorpusFields.DEFECT_ID}
+        self.section = section
+        self._stack_tuple = ELFDataTuples().get_tuple_definition(section)
+
+    def __iter__(self) -> typing.Iterator[dict]:
+        """
+        Iterate through the records in the corpus file.
+
+        :return: Iterator of record dictionaries (call stack frames as namedtuples).
+
+        """
+        with open(self.data_file, "r", encoding='utf8') as DATA_FILE:
+            for line in DATA_FILE:
+                if line.strip() == '':
+                    continue
+
+                record = json.loads(line)
+                if self.fields is not None:
+                    record = dict((k, v) for k, v in record.items() if k in self.fields)
+
+                if CorpusFields.CALL_STACK in record:
+                    record[CorpusFields.CALL_STACK] = [
+                        self._stack_tuple(**frame) for frame in record[CorpusFields.CALL_STACK]]
+
+                yield record
+
+    def iter_analysis_items(self) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """
+        Iterate through the corpus in the (defect_id, {section: [call stack namedtuples]}) format consumed by
+        ELFAnalysis.
+
+        :return: Iterator of (defect_id, data) tuples.
+
+        """
+        for record in self:
+            yield record[CorpusFields.DEFECT_ID], {self.section: record.get(CorpusFields.CALL_STACK, [])}
+
+    def build_aggregate(self) -> ReportAggregate:
+        """
+        Build the reporting aggregate from the corpus (the call stacks are not read).
+
+        :return: Finalized ReportAggregate
+
+        """
+        projected = JSONLCorpusReader(self.data_file, fields=[CorpusFields.EXCEPTION, CorpusFields.VERSION,
+                                                              CorpusFields.ERR_MSG, CorpusFields.USER_DATA],
+                                      section=self.section)
+        return build_aggregate_from_records(projected)
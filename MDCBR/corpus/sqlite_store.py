@@ -0,0 +1,310 @@
+import itertools
+import sqlite3
+import typing
+
+from MDCBR.elf.elf_parser import ELFDataTuples, ELFLogParser, ELFLogSections, SectionNotFound
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class StoredELFModel:
+    """
+    Read-only stand-in for ELFLogParser, backed by the corpus store. Sections are queried on first access.
+    Only the sections persisted by the store (call stack, modules, processes) are available.
+    """
+
+    def __init__(self, store: "SQLiteCorpusStore", defect_id: str) -> typing.NoReturn:
+        self._store = store
+        self._defect_id = defect_id
+        self._sections = {}
+
+    def get_section(self, section_name: str, raw: bool = False) -> typing.Any:
+        """
+        Get a specific ELF report section (same semantics as ELFLogParser.get_section, parsed data only).
+
+        :param section_name: Name of the desired section (use ELFLogSection class attributes)
+        :param raw: Not supported (raw text is not persisted); raises SectionNotFound if True.
+
+        :raises: SectionNotFound
+
+        :return: Parsed section data.
+
+        """
+        key = ELFLogParser.convert_section_type_to_key(section_name)
+        if raw or key not in SQLiteCorpusStore.SECTION_TABLES:
+            raise SectionNotFound(section_name)
+
+        if key not in self._sections:
+            rows = self._store.get_section_rows(self._defect_id, key)
+            if key == ELFLogParser.convert_section_type_to_key(ELFLogSections.CALL_STACK_INFORMATION):
+                rows = {ELFLogParser.SUMMARY_SECTION: '', ELFLogParser.STACK_SECTION: rows}
+            self._sections[key] = rows
+        return self._sections[key]
+
+
+class StoredDefect:
+    """
+    Defect record read back from the corpus store. Provides the same reporting attributes as DefectInfo.
+    """
+
+    FIELDS = ['defect_id', 'exception_type', 'bug_id', 'version', 'title', 'error_msg', 'general_error_msg',
+              'user_added_data']
+
+    def __init__(self, store: "SQLiteCorpusStore", row: typing.Sequence[typing.Any]) -> typing.NoReturn:
+        for field, value in zip(self.FIELDS, row):
+            setattr(self, field, value)
+        self.elf_log_model = StoredELFModel(store, self.defect_id)
+
+    def __str__(self) -> str:
+        output = f"{self.defect_id}:\n"
+        for attr in sorted(self.FIELDS):
+            output += f"\t{attr.upper()}: {getattr(self, attr)}\n"
+        return output
+
+
+class SQLiteCorpusStore:
+    """
+    Local SQLite corpus store: DefectInfo metadata, genericized messages, call stack frames, modules and processes.
+    Writes are buffered and inserted in batches (one transaction per batch). The instance is callable, so it can be
+    registered as a Defects listener.
+
+    Tables:
+        defects:    one row per defect (metadata, error messages)
+        frames:     one row per call stack frame (defect_id, row_index, <call stack columns>)
+        modules:    one row per module (defect_id, row_index, <modules columns>)
+        processes:  one row per process (defect_id, row_index, <processes columns>)
+    """
+
+    DEFECTS_TABLE = 'defects'
+
+    # section key -> (table name, ELF section)
+    SECTION_TABLES = {
+        ELFLogParser.convert_section_type_to_key(ELFLogSections.CALL_STACK_INFORMATION):
+            ('frames', ELFLogSections.CALL_STACK_INFORMATION),
+        ELFLogParser.convert_section_type_to_key(ELFLogSections.MODULES):
+            ('modules', ELFLogSections.MODULES),
+        ELFLogParser.convert_section_type_to_key(ELFLogSections.PROCESSES_INFORMATION):
+            ('processes', ELFLogSections.PROCESSES_INFORMATION),
+    }
+
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS idx_defects_exception ON defects (exception_type, version)',
+        'CREATE INDEX IF NOT EXISTS idx_defects_message ON defects (exception_type, general_error_msg)',
+        'CREATE INDEX IF NOT EXISTS idx_frames_defect ON frames (defect_id, row_index)',
+        'CREATE INDEX IF NOT EXISTS idx_frames_procedure ON frames (unit, classname, procedure)',
+        'CREATE INDEX IF NOT EXISTS idx_modules_defect ON modules (defect_id, row_index)',
+        'CREATE INDEX IF NOT EXISTS idx_modules_name ON modules (name, version)',
+        'CREATE INDEX IF NOT EXISTS idx_processes_defect ON processes (defect_id, row_index)',
+        'CREATE INDEX IF NOT EXISTS idx_processes_name ON processes (name)',
+    ]
+
+    DEFAULT_BATCH_SIZE = 500
+
+    def __init__(self, db_file: str, batch_size: int = DEFAULT_BATCH_SIZE) -> typing.NoReturn:
+        """
+        :param db_file: SQLite database filename (created if it does not exist).
+        :param batch_size: Number of defects buffered before the batch is written.
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        self._tuples = ELFDataTuples()
+        self._pending_defects = []
+        self._pending_ids = set()
+        self._pending_rows = dict((table, []) for table, _ in self.SECTION_TABLES.values())
+        self._create_schema()
+
+    def _create_schema(self) -> typing.NoReturn:
+        """
+        Create the tables and indexes (if they do not exist).
+
+        :return: None
+
+        """
+        columns = ', '.join(f'{field} TEXT' for field in StoredDefect.FIELDS[1:])
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.DEFECTS_TABLE} (defect_id TEXT PRIMARY KEY, {columns})')
+
+        for table, section in self.SECTION_TABLES.values():
+            columns = ', '.join(f'{col} TEXT' for col in ELFDataTuples.get_elf_section_attribute_list(section))
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} (defect_id TEXT NOT NULL, row_index INTEGER NOT NULL, {columns})')
+
+        for index in self.INDEXES:
+            self.connection.execute(index)
+        self.connection.commit()
+
+    # ------------------------------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------------------------------
+    def add_defect(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Buffer a single defect (metadata + parsed sections) for insertion. The buffer is written once it reaches the
+        batch size. Re-adding a defect id replaces the stored defect.
+
+        :param defect: DefectInfo (or equivalent) object.
+
+        :return: None
+
+        """
+        # A defect re-added within the same batch: write the pending batch first so its rows are replaced.
+        if defect.defect_id in self._pending_ids:
+            self.flush()
+
+        self._pending_ids.add(defect.defect_id)
+        self._pending_defects.append(tuple(getattr(defect, field, None) for field in StoredDefect.FIELDS))
+
+        elf_model = defect.elf_log_model
+        for key, (table, section) in self.SECTION_TABLES.items():
+            try:
+                rows = elf_model.get_section(key) if elf_model is not None else []
+            except SectionNotFound:
+                rows = []
+            if isinstance(rows, dict):
+                rows = rows[ELFLogParser.STACK_SECTION]
+
+            columns = ELFDataTuples.get_elf_section_attribute_list(section)
+            self._pending_rows[table].extend(
+                (defect.defect_id, row_index, *[getattr(row, col, None) for col in columns])
+                for row_index, row in enumerate(rows))
+
+        if len(self._pending_defects) >= self.batch_size:
+            self.flush()
+
+    __call__ = add_defect
+
+    def flush(self) -> typing.NoReturn:
+        """
+        Write all buffered defects in a single transaction.
+
+        :return: None
+
+        """
+        if not self._pending_defects:
+            return
+
+        defect_ids = [(row[0],) for row in self._pending_defects]
+        placeholders = ', '.join('?' for _ in StoredDefect.FIELDS)
+
+        with self.connection:
+            for table, _ in self.SECTION_TABLES.values():
+                self.connection.executemany(f'DELETE FROM {table} WHERE defect_id = ?', defect_ids)
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO {self.DEFECTS_TABLE} VALUES ({placeholders})', self._pending_defects)
+
+            for table, section in self.SECTION_TABLES.values():
+                rows = self._pending_rows[table]
+                if rows:
+                    width = len(ELFDataTuples.get_elf_section_attribute_list(section)) + 2
+                    self.connection.executemany(
+                        f'INSERT INTO {table} VALUES ({", ".join("?" for _ in range(width))})', rows)
+                    rows.clear()
+
+        self._pending_defects.clear()
+        self._pending_ids.clear()
+
+    def close(self) -> typing.NoReturn:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "SQLiteCorpusStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
+
+    # ------------------------------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------------------------------
+    def __len__(self) -> int:
+        self.flush()
+        return self.connection.execute(f'SELECT COUNT(*) FROM {self.DEFECTS_TABLE}').fetchone()[0]
+
+    def iter_defects(self, where: str = '', params: typing.Sequence[typing.Any] = ()) -> typing.Iterator[StoredDefect]:
+        """
+        Iterate through the stored defects (ELF sections are loaded on first access).
+
+        :param where: Optional SQL WHERE clause (without the 'WHERE' keyword), e.g. - 'exception_type = ?'
+        :param params: Parameters for the WHERE clause
+
+        :return: Iterator of StoredDefect objects, ordered by defect id.
+
+        """
+        self.flush()
+        clause = f' WHERE {where}' if where else ''
+        cursor = self.connection.execute(
+            f'SELECT {", ".join(StoredDefect.FIELDS)} FROM {self.DEFECTS_TABLE}{clause} ORDER BY defect_id', params)
+        for row in cursor:
+            yield StoredDefect(self, row)
+
+    def get_section_rows(self, defect_id: str, section_key: str) -> typing.List[tuple]:
+        """
+        Get the stored rows of a section for a single defect.
+
+        :param defect_id: Defect ID
+        :param section_key: Section key (ELFLogParser.convert_section_type_to_key)
+
+        :return: List of section specific namedtuples.
+
+        """
+        self.flush()
+        table, section = self.SECTION_TABLES[section_key]
+        columns = ELFDataTuples.get_elf_section_attribute_list(section)
+        data_tuple = self._tuples.get_tuple_definition(section)
+        cursor = self.connection.execute(
+            f'SELECT {", ".join(columns)} FROM {table} WHERE defect_id = ? ORDER BY row_index', (defect_id,))
+        return [data_tuple(*row) for row in cursor]
+
+    def tally_defect_types(self) -> typing.Dict[str, int]:
+        """
+        Build a dictionary of all exception types and their counts (same format as Defects.tally_defect_types()).
+
+        :return: A dictionary (k,v) => <exception_type>: <count of defects of the exception type>
+
+        """
+        self.flush()
+        return dict(self.connection.execute(
+            f'SELECT exception_type, COUNT(*) FROM {self.DEFECTS_TABLE} GROUP BY exception_type'))
+
+    def build_aggregate(self) -> ReportAggregate:
+        """
+        Build the reporting aggregate directly from the store (no defect objects are instantiated).
+
+        :return: Finalized ReportAggregate
+
+        """
+        self.flush()
+        aggregate = ReportAggregate()
+        cursor = self.connection.execute(
+            f'SELECT exception_type, COALESCE(general_error_msg, error_msg), version, defect_id, user_added_data '
+            f'FROM {self.DEFECTS_TABLE}')
+        for exception_type, message, version, defect_id, user_added_data in cursor:
+            marker = '' if user_added_data is None else ReportAggregate.USER_DATA_MARKER
+            aggregate.add(exception_type=exception_type, message=message, version=version,
+                          defect_id=f'{defect_id}{marker}')
+        return aggregate.finalize()
+
+    def iter_analysis_items(self) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """
+        Iterate through the stored call stacks in the (defect_id, {section: [call stack namedtuples]}) format consumed
+        by ELFAnalysis. A single ordered query is streamed; frames are grouped per defect.
+
+        :return: Iterator of (defect_id, data) tuples.
+
+        """
+        self.flush()
+        section = ELFLogSections.CALL_STACK_INFORMATION
+        table, _ = self.SECTION_TABLES[ELFLogParser.convert_section_type_to_key(section)]
+        columns = ELFDataTuples.get_elf_section_attribute_list(section)
+        data_tuple = self._tuples.get_tuple_definition(section)
+
+        cursor = self.connection.execute(
+            f'SELECT d.defect_id, {", ".join(f"f.{col}" for col in columns)} '
+            f'FROM {self.DEFECTS_TABLE} d LEFT JOIN {table} f ON f.defect_id = d.defect_id '
+            f'ORDER BY d.defect_id, f.row_index')
+
+        for defect_id, rows in itertools.groupby(cursor, key=lambda x: x[0]):
+            frames = [data_tuple(*row[1:]) for row in rows if any(value is not None for value in row[1:])]
+            yield defect_id, {section: frames}
@@ -1,4 +1,7 @@
 import json
+import typing
+
+from MDCBR.corpus.jsonl_corpus import JSONLCorpusWriter
 from MDCBR.elf.elf_parser import ELFLogSections, ELFLogParser, ELFDataTuples
 
 
@@ -16,18 +19,40 @@ def issue_list_to_file(issue_list, data_file, section, debug=False):
         print(f"ELEMENTS: {call_stack_tuple_elems}")
         print(f"SECTION: {section}")
 
-    defect_stacks = {}
-    for defect in issue_list:
-        bug = dict()
-        bug[exception_type_keyword] = defect.exception_type
-        bug[version_keyword] = defect.version
-        bug[call_stack_keyword] = []
-        bug[err_msg_keyword] = defect.error_msg if defect.general_error_msg is None else defect.general_error_msg
-        bug[call_stack_keyword] = [stack._asdict() for stack in
-                                   defect.elf_log_model.get_section(section)[stack_keyword]]
-        defect_stacks[defect.defect_id] = bug
-
+    # The JSON object is written one defect at a time (same output as json.dump of the complete dictionary), so
+    # spilled defects (see DefectSpillStore) are read back one at a time.
     with open(data_file, "w") as DATA_FILE:
-        json.dump(defect_stacks, DATA_FILE)
+        DATA_FILE.write("{")
+        for index, defect in enumerate(issue_list):
+            bug = dict()
+            bug[exception_type_keyword] = defect.exception_type
+            bug[version_keyword] = defect.version
+            bug[call_stack_keyword] = []
+            bug[err_msg_keyword] = defect.error_msg if defect.general_error_msg is None else defect.general_error_msg
+            elf_model = defect.elf_log_model
+            if elf_model is not None:
+                bug[call_stack_keyword] = [stack._asdict() for stack in elf_model.get_section(section)[stack_keyword]]
+            DATA_FILE.write(f"{', ' if index else ''}{json.dumps(defect.defect_id)}: {json.dumps(bug)}")
+        DATA_FILE.write("}")
 
     print(f"\nWrote to: {data_file}")
+
+
+def issue_list_to_jsonl(issue_list: typing.Iterable, data_file: str, section: str) -> int:
+    """
+    Write each defect's data and call stack to a JSON-lines file: one defect per line, written as the defects are
+    iterated (the full data set is never held in a single structure).
+
+    :param issue_list: Iterable of DefectInfo objects
+    :param data_file: Name of file to write
+    :param section: ELF log section containing the call stack (ELFLogSections attribute)
+
+    :return: Number of defects written
+
+    """
+    with JSONLCorpusWriter(data_file, section=section) as writer:
+        for defect in issue_list:
+            writer.write(defect)
+
+    print(f"\nWrote {writer.count} defects to: {data_file}")
+    return writer.count
@@ -0,0 +1,174 @@
+import contextlib
+import cProfile
+import gc
+import io
+import logging
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+import typing
+
+
+def deep_sizeof(obj: typing.Any, exclude: typing.Optional[typing.Set[int]] = None) -> int:
+    """
+    Approximate the number of bytes retained by an object: the object plus everything reachable from it (modules,
+    classes and functions are not counted, since they are shared).
+
+    :param obj: Object to measure.
+    :param exclude: Set of object ids not to count (e.g. - objects shared by many instances).
+
+    :return: Number of bytes.
+
+    """
+    shared_types = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                    logging.Logger)
+    seen = set() if exclude is None else set(exclude)
+    pending = [obj]
+    size = 0
+
+    while pending:
+        current = pending.pop()
+        if id(current) in seen or isinstance(current, shared_types):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        pending.extend(gc.get_referents(current))
+
+    return size
+
+
+class StageProfiler:
+    """
+    Wraps pipeline stages in individual cProfile sessions and tracemalloc snapshots, and writes one report per stage
+    (sorted hotspots + top allocations) to the reports directory. When disabled, stage() is a no-op, so the pipeline
+    code does not change between profiled and normal runs.
+    """
+
+    HOTSPOT_COUNT = 40
+    ALLOCATION_COUNT = 25
+    TRACEMALLOC_FRAMES = 5
+    SIZE_SAMPLE = 200
+
+    def __init__(self, report_dir: str, prefix: str, enabled: bool = False) -> typing.NoReturn:
+        """
+        :param report_dir: Directory to write the reports to.
+        :param prefix: Report filename prefix (e.g. - the run's base filename).
+        :param enabled: Profile the stages (otherwise, all methods are no-ops).
+        """
+        self.report_dir = report_dir
+        self.prefix = prefix
+        self.enabled = enabled
+        self.reports = []
+        self._summary = []
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(self.TRACEMALLOC_FRAMES)
+
+    def _report_name(self, name: str) -> str:
+        return os.path.sep.join([self.report_dir, f"{self.prefix}.profile_{name}.txt"])
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[typing.NoReturn]:
+        """
+        Profile the enclosed block as a named stage.
+
+        :param name: Stage name (fetch, download, parse, classify, aggregate, report)
+
+        """
+        if not self.enabled:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            self._write_stage_report(name, elapsed, profiler, before, after)
+
+    def _write_stage_report(self, name: str, elapsed: float, profiler: cProfile.Profile,
+                            before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> typing.NoReturn:
+        """
+        Write the stage report: cumulative and internal time hotspots, followed by the allocation growth
+        (by line) during the stage.
+
+        :return: None
+
+        """
+        stream = io.StringIO()
+        stream.write(f"STAGE: {name}\nELAPSED: {elapsed:0.3f} secs\n\n")
+
+        for sort_key in (pstats.SortKey.CUMULATIVE, pstats.SortKey.TIME):
+            stream.write(f"{'=' * 30} HOTSPOTS (sorted by: {sort_key.value}) {'=' * 30}\n")
+            pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats(sort_key).print_stats(self.HOTSPOT_COUNT)
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        growth = sum(diff.size_diff for diff in differences)
+
+        stream.write(f"{'=' * 30} TOP ALLOCATIONS (net growth: {growth / 1024:0.1f} KiB) {'=' * 30}\n")
+        for diff in differences[:self.ALLOCATION_COUNT]:
+            stream.write(f"{diff}\n")
+
+        filename = self._report_name(name)
+        with open(filename, "w") as REPORT:
+            REPORT.write(stream.getvalue())
+
+        self.reports.append(filename)
+        self._summary.append(f"{name:<12} {elapsed:10.3f} secs  {growth / 1024:12.1f} KiB net allocated")
+
+    def record_retained_sizes(self, label: str, objects: typing.Sequence[typing.Any],
+                              exclude: typing.Iterable[typing.Any] = ()) -> typing.Optional[dict]:
+        """
+        Measure the bytes retained per object (sampled) and add them to the memory report.
+
+        :param label: Name of the object type (e.g. - 'DefectInfo')
+        :param objects: Objects to measure (up to SIZE_SAMPLE, evenly spaced, are measured)
+        :param exclude: Objects reachable from each object that should not be counted (e.g. - shared objects)
+
+        :return: Dictionary of statistics (None if disabled or no objects)
+
+        """
+        if not self.enabled or not objects:
+            return None
+
+        step = max(1, len(objects) // self.SIZE_SAMPLE)
+        excluded_ids = set(id(obj) for obj in exclude)
+        sizes = [deep_sizeof(obj, exclude=excluded_ids) for obj in list(objects)[::step]]
+        stats = {'label': label, 'count': len(objects), 'sampled': len(sizes), 'mean': statistics.mean(sizes),
+                 'min': min(sizes), 'max': max(sizes), 'estimated_total': statistics.mean(sizes) * len(objects)}
+        self._summary.append(
+            f"{label:<12} {stats['mean'] / 1024:10.1f} KiB/object (min: {stats['min'] / 1024:0.1f}, "
+            f"max: {stats['max'] / 1024:0.1f}, est. total for {stats['count']}: "
+            f"{stats['estimated_total'] / 1024 / 1024:0.1f} MiB)")
+        return stats
+
+    def write_summary(self) -> typing.Optional[str]:
+        """
+        Write the summary report (elapsed time and net allocations per stage, bytes retained per object).
+
+        :return: Name of the summary file (None if disabled)
+
+        """
+        if not self.enabled:
+            return None
+
+        current, peak = tracemalloc.get_traced_memory()
+        filename = self._report_name('summary')
+        with open(filename, "w") as REPORT:
+            REPORT.write("\n".join(self._summary))
+            REPORT.write(f"\n\nTRACED MEMORY: current: {current / 1024 / 1024:0.1f} MiB  "
+                         f"peak: {peak / 1024 / 1024:0.1f} MiB\n")
+            REPORT.write("\nSTAGE REPORTS:\n")
+            REPORT.write("\n".join(f"- {report}" for report in self.reports))
+            REPORT.write("\n")
+        return filename
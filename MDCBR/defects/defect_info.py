@@ -4,9 +4,15 @@ import typing
 import unicodedata
 
 import MDCBR.elf.elf_parser as elf_parser
+from MDCBR.elf.elf_compact import CompactELFModel
+from MDCBR.elf.elf_compressed import CompressedELFContent, CompressedELFFormats, parse_elf_attachment
+from MDCBR.elf.elf_log_sections import ELFLogSections
 from MDCBR.md.md_exceptions_regexp import MDExceptions
+from MDCBR.metrics.run_metrics import METRICS
 
-import jira
+# The jira package (and its dependencies) is only needed for type checking; the issues are provided by the caller.
+if typing.TYPE_CHECKING:
+    import jira
 
 
 # Directive to avoid typing issues with Jira objects
@@ -16,7 +22,22 @@ class DefectInfo:
     This class defines:
        * the structure to store each defect (defect id, type of error, version/build number)
        * parses the summary (title) and description for relevant data.
+
+    The attributes are slotted (no per-instance __dict__). In compact mode, only the extracted fields and the
+    requested parsed ELF sections are kept: the Jira issue is released once its fields have been extracted, and the
+    ELF log contents and raw sections are released once the log has been parsed.
+
+    With defer_elf_log, the ELF attachment is only downloaded and parsed the first time elf_log_model is accessed:
+    the summary-level reports (tallies, reporting dictionary, aggregate) never need it. See also
+    Defects.iter_prefetched(), which loads the deferred logs of many defects concurrently.
+
+    A defect is always classified and reported from its summary and description: if its ELF attachment is missing,
+    cannot be downloaded or cannot be parsed, the failure is logged and counted (attachment.missing,
+    attachment.download_failures, attachment.parse_failures), and elf_log_model is None.
     """
+    __slots__ = ('jira', 'error_msg', 'general_error_msg', 'user_added_data', 'exception_type', 'bug_id', 'version',
+                 'attachment_digest', '_defect_id', '_title', '_created', '_debug', '_download_controller',
+                 '_parse_cache', '_elf_attachment', '_elf_contents_obj', '_elf_pending', '_sections')
 
     # Parses the summary (title) for the error number, bug_id, version
     SUMMARY_PARSE = re.compile(
@@ -27,56 +48,203 @@ class DefectInfo:
 
     ELF_LOG_EXTENSION = 'el'
 
-    def __init__(self, jira_issue: jira.Issue, debug: bool = False) -> typing.NoReturn:
+    # Run-time handles: not serialized (see __getstate__).
+    TRANSIENT_SLOTS = ('jira', '_elf_attachment', '_download_controller', '_parse_cache')
+
+    # Parsed ELF sections kept in compact mode (unless specified): used by the corpus, analysis and trend outputs.
+    COMPACT_SECTIONS = (ELFLogSections.CALL_STACK_INFORMATION, ELFLogSections.EXCEPTION)
+
+    # Shared by all instances.
+    log = logging.getLogger('DefectInfo')
+
+    def __init__(self, jira_issue: 'jira.Issue', debug: bool = False, parse_elf_log: bool = True,
+                 elf_log_model: typing.Optional[elf_parser.ELFLogParser] = None,
+                 download_controller: typing.Optional[typing.Any] = None,
+                 parse_cache: typing.Optional[typing.Any] = None, compact: bool = False,
+                 sections: typing.Optional[typing.Iterable[str]] = None,
+                 defer_elf_log: bool = False) -> typing.NoReturn:
         """
         Initialize the object and parse the relevant data/fields.
 
         Args:
             jira_issue: Single Jira Issue (as defined by the jira package)
             debug: Enable debug messages
+            parse_elf_log: Download and parse the ELF attachment. If False, only the summary and description are
+                processed, and elf_log_model is None.
+            elf_log_model: Previously parsed ELF log (e.g. - a local ELF file). If provided, the attachment is not
+                downloaded or parsed.
+            download_controller: AdaptiveDownloadController (md_download) used to download the attachment
+                (concurrency limit, timeouts, retries). If not provided, the attachment is downloaded directly.
+            parse_cache: ParsedELFCache (elf_cache) shared by the defects of a run: a defect whose attachment is
+                identical to an already parsed attachment shares its (immutable) model instead of parsing it again.
+            compact: Keep only the extracted fields and the requested parsed ELF sections; the Jira issue is not
+                retained (jira is None once the attachment has been downloaded).
+            sections: Parsed ELF sections kept in compact mode (ELFLogSections attributes).
+                Default: COMPACT_SECTIONS
+            defer_elf_log: Do not download and parse the ELF attachment until elf_log_model is first accessed
+                (only applies if parse_elf_log is True).
 
         """
         self.jira = jira_issue
         self._debug = debug
-        self.log = logging.getLogger(self.__class__.__name__)
         self.error_msg = None
         self.general_error_msg = None
         self.user_added_data = None
-
-        self.exception_type, self.bug_id, self.version = self._parse_summary()
-        self._parse_metadata()
-        self._elf_contents_obj = elf_parser.ELFLogParser(binary_content=self._get_elf_attachment())
+        self.attachment_digest = None
+        self._download_controller = download_controller
+        self._parse_cache = parse_cache
+        self._sections = (tuple(self.COMPACT_SECTIONS if sections is None else sections) if compact else None)
+
+        # Extract the issue fields used after initialization, so the issue itself does not need to be retained.
+        self._defect_id = jira_issue.key
+        self._title = jira_issue.fields.summary
+        self._created = getattr(jira_issue.fields, 'created', None)
+        self._elf_attachment = self._find_elf_attachment() if elf_log_model is None else None
+
+        with METRICS.timer('classify.seconds'):
+            self.exception_type, self.bug_id, self.version = self._parse_summary()
+            self._parse_metadata()
+        self._elf_contents_obj = None
+        self.elf_log_model = elf_log_model
+        if parse_elf_log and elf_log_model is None:
+            if defer_elf_log:
+                self._elf_pending = True
+            else:
+                self.load_elf_log()
+
+        if compact:
+            self.jira = None
 
     @property
     def defect_id(self) -> str:
         """
         Returns: (str) - Defect ID
         """
-        return self.jira.key
+        return self._defect_id
 
     @property
     def title(self) -> str:
         """
         Returns: (str) - Defect title
         """
-        return self.jira.fields.summary
+        return self._title
+
+    @property
+    def created(self) -> typing.Optional[str]:
+        """
+        Returns: (str) - Jira 'created' timestamp (None if it was not requested)
+        """
+        return self._created
+
+    @property
+    def compact(self) -> bool:
+        return self._sections is not None
+
+    @property
+    def elf_log_pending(self) -> bool:
+        """
+        Returns: (bool) - True if the ELF attachment is deferred, and has not been downloaded and parsed yet.
+        """
+        return self._elf_pending
 
     @property
     def elf_log_model(self) -> elf_parser.ELFLogParser:
+        """
+        Returns: (ELFLogParser) - Parsed ELF log model. A deferred ELF attachment is downloaded and parsed now.
+        """
+        if self._elf_pending:
+            METRICS.counter('attachment.deferred_loads').inc()
+            self.load_elf_log()
+        return self._elf_contents_obj
+
+    @elf_log_model.setter
+    def elf_log_model(self, model: elf_parser.ELFLogParser) -> typing.NoReturn:
+        """
+        Store an ELF log model parsed elsewhere (e.g. - in a worker process, from download_elf_attachment()).
+        In compact mode, only the requested sections are kept.
+        """
+        if model is not None and self._sections is not None:
+            model = CompactELFModel.from_model(model, self._sections)
+        self._elf_contents_obj = model
+        self._elf_pending = False
+
+    def download_elf_attachment(self, raise_errors: bool = True) -> str:
+        """
+        Download the ELF attachment (without parsing it).
+
+        Args:
+            raise_errors: If False, a failed download is logged and counted, and '' is returned (as if there was no
+                ELF attachment).
+
+        Returns: (str) - Attachment contents (as received from Jira), or '' if there is no ELF attachment.
+            Compressed attachments are returned as CompressedELFContent (decompressed when parsed).
+        """
+        try:
+            return self._get_elf_attachment()
+        except Exception as exc:
+            if raise_errors:
+                raise
+            METRICS.counter('attachment.download_failures').inc()
+            self.log.error(f"{self.defect_id}: Unable to download the ELF attachment: {exc!r}")
+            return ''
+
+    def load_elf_log(self, content: typing.Optional[str] = None) -> elf_parser.ELFLogParser:
+        """
+        Parse the ELF attachment and store the resulting model (see elf_log_model).
+
+        Args:
+            content: Previously downloaded attachment contents (see download_elf_attachment). If not provided, the
+                attachment is downloaded.
+
+        Returns: (ELFLogParser) - Parsed ELF log model (None if there is no attachment, or it could not be
+            downloaded or parsed)
+        """
+        if content is None:
+            content = self.download_elf_attachment(raise_errors=False)
+        if content == '':
+            self.elf_log_model = None
+            return None
+
+        try:
+            if self._parse_cache is not None:
+                self.attachment_digest, self.elf_log_model = self._parse_cache.get_or_parse(content, self.defect_id)
+            else:
+                self.elf_log_model = parse_elf_attachment(content)
+        except Exception as exc:
+            METRICS.counter('attachment.parse_failures').inc()
+            self.log.error(f"{self.defect_id}: Unable to parse the ELF attachment: {exc!r}")
+            self.elf_log_model = None
         return self._elf_contents_obj
 
+    def __getstate__(self) -> typing.Tuple[None, typing.Dict[str, typing.Any]]:
+        """
+        Serialized state (e.g. - run checkpoints). The run-time handles (Jira issue and attachment resources, download
+        controller, parse cache) are not serialized; a deferred ELF log is loaded first, since the attachment resource
+        is not kept.
+
+        Returns: Tuple of (None, slot values) - the default pickle state format for slotted objects.
+        """
+        if self._elf_pending:
+            self.load_elf_log()
+        state = dict((slot, getattr(self, slot, None)) for slot in self.__slots__)
+        state.update(dict.fromkeys(self.TRANSIENT_SLOTS))
+        return None, state
+
     def __str__(self) -> str:
         """
         Returns: string representation of the DefectInfo obj
         """
 
         # Find all properties that are not capitalized or prefixed with an underscore. These will be
-        # the class attributes that contain the defect data.
-        obj_attrs = [x for x in dir(self) if not x.startswith('_') and x[0].upper() != x[0]]
+        # the class attributes that contain the defect data (methods are skipped).
+        obj_attrs = [x for x in dir(self) if not x.startswith('_') and x[0].upper() != x[0] and
+                     not callable(getattr(type(self), x, None))]
 
         output = f"{self.defect_id}:\n"
         for attr in sorted(obj_attrs):
-            output += f"\t{attr.upper()}: {getattr(self, attr)}\n"
+            # Describing the defect does not trigger a deferred download.
+            value = '<deferred>' if attr == 'elf_log_model' and self._elf_pending else getattr(self, attr)
+            output += f"\t{attr.upper()}: {value}\n"
         return output
 
     def _parse_summary(self) -> typing.Tuple[str, str, str]:
@@ -213,14 +381,49 @@ class DefectInfo:
         """
         return "".join(character for character in string if unicodedata.category(character).lower() != "cf")
 
-    def _get_elf_attachment(self) -> str:
+    def _find_elf_attachment(self) -> typing.Any:
         """
-        Get elf file attachment name, download the attachment and return the stream as a string.
+        Find the ELF log attachment (by file extension). If there is no ELF log, a compressed ELF log (zip, gzip, bzip2
+        or xz; see CompressedELFFormats) is used.
 
-        :return: String of attachment contents.
+        :return: Jira attachment resource (or equivalent); None if the issue has no ELF attachment.
 
         """
-        for attachment in self.jira.fields.attachment:
+        attachments = getattr(self.jira.fields, 'attachment', None) or []
+        for attachment in attachments:
             if attachment.filename.endswith(self.ELF_LOG_EXTENSION):
-                return str(attachment.get())
-        return ''
+                return attachment
+        for attachment in attachments:
+            if CompressedELFFormats.is_compressed_elf_log(attachment.filename):
+                return attachment
+        return None
+
+    def _get_elf_attachment(self) -> typing.Union[str, CompressedELFContent]:
+        """
+        Download the ELF file attachment and return the stream as a string.
+
+        :return: String of attachment contents (compressed attachments: CompressedELFContent, as downloaded).
+
+        """
+        attachment = self._elf_attachment
+        if attachment is None:
+            METRICS.counter('attachment.missing').inc()
+            return ''
+
+        with METRICS.timer('attachment.download_seconds'):
+            if self._download_controller is not None:
+                content = self._download_controller.download(attachment)
+            else:
+                content = attachment.get()
+        METRICS.counter('attachment.downloads').inc()
+        METRICS.counter('attachment.download_bytes').inc(len(content))
+        METRICS.histogram('attachment.size_bytes').observe(len(content))
+
+        # In compact mode, the attachment resource (and its session) is not retained once downloaded.
+        if self.compact:
+            self._elf_attachment = None
+
+        if CompressedELFFormats.get_format(attachment.filename) is not None:
+            METRICS.counter('attachment.compressed_downloads').inc()
+            return CompressedELFContent(content, filename=attachment.filename)
+        return str(content)
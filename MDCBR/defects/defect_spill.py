@@ -0,0 +1,204 @@
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import typing
+
+from MDCBR.metrics.run_metrics import METRICS
+
+
+def current_rss() -> typing.Optional[int]:
+    """
+    Resident set size (RSS) of the current process.
+
+    Returns:
+        RSS in bytes (Linux: current RSS; other platforms: peak RSS), or None if it cannot be determined.
+
+    """
+    try:
+        with open('/proc/self/statm', 'r') as STATM:
+            return int(STATM.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class SpilledDefect:
+    """
+    Stand-in for a DefectInfo that has been spilled to disk (see DefectSpillStore). Only the reporting fields are kept
+    in memory, so aggregation and the reports never read the spill file. The ELF log model is read back from the
+    spill file each time elf_log_model is accessed (and is not retained).
+    """
+    __slots__ = ('defect_id', 'exception_type', 'bug_id', 'version', 'title', 'error_msg', 'general_error_msg',
+                 'user_added_data', 'created', 'attachment_digest', '_store', '_offset')
+
+    FIELDS = ['defect_id', 'exception_type', 'bug_id', 'version', 'title', 'error_msg', 'general_error_msg',
+              'user_added_data', 'created', 'attachment_digest']
+
+    def __init__(self, defect: typing.Any, store: "DefectSpillStore", offset: int) -> typing.NoReturn:
+        """
+        Args:
+            defect: DefectInfo that was spilled.
+            store: DefectSpillStore holding the serialized defect.
+            offset: Offset of the serialized defect in the spill file.
+
+        """
+        for field in self.FIELDS:
+            setattr(self, field, getattr(defect, field, None))
+        self._store = store
+        self._offset = offset
+
+    @property
+    def elf_log_pending(self) -> bool:
+        return False
+
+    @property
+    def elf_log_model(self) -> typing.Any:
+        """
+        Returns: (ELFLogParser) - Parsed ELF log model, read back from the spill file.
+        """
+        return self.load().elf_log_model
+
+    def load(self) -> typing.Any:
+        """
+        Returns: (DefectInfo) - The complete defect, read back from the spill file.
+        """
+        return self._store.load(self._offset)
+
+    def __str__(self) -> str:
+        output = f"{self.defect_id}:\n"
+        for attr in sorted(self.FIELDS):
+            output += f"\t{attr.upper()}: {getattr(self, attr)}\n"
+        return output
+
+
+class DefectSpillStore:
+    """
+    On-disk spill store for completed defects, used to keep a run within a memory budget. Once the process RSS
+    exceeds the budget, the completed defects held in memory are serialized (appended to the spill file) and replaced
+    by SpilledDefect stand-ins (see Defects); every defect completed after that is spilled as soon as it has been
+    passed to the listeners. The shared parsed models of the parse cache are released as well.
+
+    The spill file is a temporary file, removed when the store is closed.
+    """
+
+    def __init__(self, memory_budget: int, spill_dir: typing.Optional[str] = None,
+                 parse_cache: typing.Optional[typing.Any] = None,
+                 measure: typing.Callable[[], typing.Optional[int]] = current_rss) -> typing.NoReturn:
+        """
+        Args:
+            memory_budget: Memory budget (bytes of RSS).
+            spill_dir: Directory of the spill file. (Default: the system temporary directory)
+            parse_cache: ParsedELFCache whose shared models are released when defects are spilled.
+            measure: Callable returning the current memory use (bytes), or None if unknown.
+
+        """
+        self.memory_budget = memory_budget
+        self.parse_cache = parse_cache
+        self.count = 0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._measure = measure
+        fd, self.spill_file = tempfile.mkstemp(prefix='mdcbr_spill_', suffix='.pickle', dir=spill_dir)
+        self._writer = os.fdopen(fd, 'wb')
+        self._reader = None
+        self._lock = threading.Lock()
+        self._exceeded = False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def over_budget(self) -> bool:
+        """
+        Returns:
+            True if the memory use exceeds the budget (unknown memory use is never over budget).
+
+        """
+        used = self._measure()
+        over = used is not None and used > self.memory_budget
+        if over and not self._exceeded:
+            self._exceeded = True
+            self.log.info(f"Memory budget exceeded ({used / 1024 / 1024:0.1f} MiB > "
+                          f"{self.memory_budget / 1024 / 1024:0.1f} MiB): spilling completed defects to "
+                          f"'{self.spill_file}'.")
+        return over
+
+    def spill(self, defect: typing.Any) -> SpilledDefect:
+        """
+        Serialize a completed defect to the spill file.
+
+        Args:
+            defect: Completed DefectInfo
+
+        Returns:
+            SpilledDefect stand-in for the defect.
+
+        """
+        with self._lock:
+            offset = self._writer.tell()
+            pickle.dump(defect, self._writer, protocol=pickle.HIGHEST_PROTOCOL)
+            size = self._writer.tell() - offset
+            self.count += 1
+
+        METRICS.counter('spill.defects').inc()
+        METRICS.counter('spill.bytes').inc(size)
+        return SpilledDefect(defect, store=self, offset=offset)
+
+    def release_models(self) -> typing.NoReturn:
+        """
+        Release the parse cache's shared models (the spilled defects no longer reference them).
+
+        Returns:
+            None
+
+        """
+        if self.parse_cache is not None:
+            self.parse_cache.release_models()
+
+    def load(self, offset: int) -> typing.Any:
+        """
+        Read a spilled defect back from the spill file.
+
+        Args:
+            offset: Offset of the serialized defect (see SpilledDefect)
+
+        Returns:
+            DefectInfo
+
+        """
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.spill_file, 'rb')
+            self._writer.flush()
+            self._reader.seek(offset)
+            defect = pickle.load(self._reader)
+        METRICS.counter('spill.loads').inc()
+        return defect
+
+    def close(self) -> typing.NoReturn:
+        """
+        Close and remove the spill file.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            for handle in (self._writer, self._reader):
+                if handle is not None and not handle.closed:
+                    handle.close()
+        if os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+
+    def __enter__(self) -> "DefectSpillStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
@@ -1,27 +1,216 @@
+import concurrent.futures
 import logging
+import operator
 import typing
 
 from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.reporting.report_aggregate import ReportAggregate
 
-import jira
+# The jira package (and its dependencies) is only needed for type checking; the issues are provided by the caller.
+if typing.TYPE_CHECKING:
+    import jira
 
 
 class Defects(list):
     """
     Class creates a list of DefectInfo objects, provides methods for tallying and generating report structures.
     """
-    def __init__(self, issue_list: typing.List[jira.Issue], debug: bool = False) -> typing.NoReturn:
+
+    # Deferred ELF logs (see DefectInfo): concurrent downloads/parses, and defects loaded per batch.
+    DEFAULT_PREFETCH_WORKERS = 8
+    DEFAULT_PREFETCH_BATCH_SIZE = 50
+
+    def __init__(self, issue_list: typing.Iterable['jira.Issue'], debug: bool = False,
+                 listeners: typing.Iterable[typing.Callable[[DefectInfo], typing.Any]] = (),
+                 parse_elf_log: bool = True,
+                 download_controller: typing.Optional[typing.Any] = None,
+                 parse_cache: typing.Optional[typing.Any] = None, compact: bool = False,
+                 sections: typing.Optional[typing.Iterable[str]] = None,
+                 defer_elf_log: bool = False,
+                 spill_store: typing.Optional[typing.Any] = None) -> typing.NoReturn:
         """
         Instantiate the Defects List object
         Args:
             issue_list: List of Jira Issues (jira.issue from jira package).
             debug: Enable debug messaging output. (Default: False)
+            listeners: Callables invoked with each DefectInfo as soon as it has been processed
+                (e.g. - streaming corpus writers).
+            parse_elf_log: Download and parse each defect's ELF attachment. (Default: True)
+            download_controller: AdaptiveDownloadController used for the attachment downloads. (Default: None)
+            parse_cache: ParsedELFCache shared by the defects (identical attachments are parsed once). (Default: None)
+            compact: Compact defects: only the extracted fields and the requested ELF sections are kept.
+                (Default: False)
+            sections: Parsed ELF sections kept in compact mode. (Default: DefectInfo.COMPACT_SECTIONS)
+            defer_elf_log: Only download and parse each ELF attachment when the defect's elf_log_model is first
+                accessed (see iter_prefetched()). (Default: False)
+            spill_store: DefectSpillStore: once the memory budget is exceeded, completed defects are spilled to disk
+                and replaced in the list by SpilledDefect stand-ins (see spill()). (Default: None)
 
         """
         super().__init__()
         self.debug = debug
         self.log = logging.getLogger(self.__class__.__name__)
-        self.extend([DefectInfo(defect, debug=self.debug) for defect in issue_list])
+        self.listeners = list(listeners)
+        self.parse_elf_log = parse_elf_log
+        self.download_controller = download_controller
+        self.parse_cache = parse_cache
+        self.compact = compact
+        self.sections = sections
+        self.defer_elf_log = defer_elf_log
+        self.spill_store = spill_store
+
+        # Spilling: list index of each defect, and the completed defects still held in memory.
+        self._positions = {}
+        self._resident = []
+        for issue in issue_list:
+            self.add_issue(issue)
+
+    def add_issue(self, issue: 'jira.Issue') -> DefectInfo:
+        """
+        Process a single Jira issue, add the resulting DefectInfo to the list and notify the listeners.
+
+        Args:
+            issue: Jira Issue (jira.issue from jira package).
+
+        Returns:
+            The DefectInfo object that was added.
+
+        """
+        return self.add_defect(DefectInfo(issue, debug=self.debug, parse_elf_log=self.parse_elf_log,
+                                          download_controller=self.download_controller,
+                                          parse_cache=self.parse_cache, compact=self.compact,
+                                          sections=self.sections, defer_elf_log=self.defer_elf_log))
+
+    def add_defect(self, defect: DefectInfo) -> DefectInfo:
+        """
+        Add an already processed DefectInfo (e.g. - built by a worker process) and notify the listeners.
+
+        Args:
+            defect: Processed DefectInfo object.
+
+        Returns:
+            The DefectInfo object that was added.
+
+        """
+        self.append(defect)
+        if self.spill_store is not None:
+            self._positions[defect.defect_id] = len(self) - 1
+        self.notify_listeners(defect)
+        return defect
+
+    def notify_listeners(self, defect: DefectInfo) -> typing.NoReturn:
+        """
+        Call each registered listener with a processed defect.
+
+        Args:
+            defect: Processed DefectInfo object.
+
+        Returns:
+            None
+
+        """
+        for listener in self.listeners:
+            listener(defect)
+
+        # The defect is complete (the listeners have processed it): spill it, if the memory budget is exceeded.
+        if self.spill_store is not None and not self._is_pending(defect):
+            self._resident.append(defect.defect_id)
+            if self.spill_store.over_budget():
+                self.spill()
+
+    def spill(self) -> int:
+        """
+        Spill the completed defects held in memory to the spill store; each is replaced in the list by its
+        SpilledDefect stand-in.
+
+        Returns:
+            Number of defects spilled.
+
+        """
+        spilled = 0
+        for defect_id in self._resident:
+            position = self._positions.pop(defect_id, None)
+            if position is not None:
+                self[position] = self.spill_store.spill(self[position])
+                spilled += 1
+        self._resident.clear()
+        self.spill_store.release_models()
+        return spilled
+
+    def iter_prefetched(self, workers: int = DEFAULT_PREFETCH_WORKERS,
+                        batch_size: int = DEFAULT_PREFETCH_BATCH_SIZE) -> typing.Iterator[DefectInfo]:
+        """
+        Iterate the defects with their deferred ELF logs loaded: the logs are downloaded and parsed concurrently, one
+        batch at a time, and the next batch is loaded while the current batch is being consumed.
+
+        Args:
+            workers: Number of concurrent downloads/parses.
+            batch_size: Number of defects loaded per batch.
+
+        Returns:
+            Iterator of DefectInfo objects (in list order), each with its ELF log loaded.
+
+        """
+        # Each batch is taken from the list when it is submitted (defects spilled in the meantime are not retained).
+        batch_starts = range(0, len(self), batch_size)
+        load = operator.attrgetter('elf_log_model')
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                   thread_name_prefix='elf-prefetch') as executor:
+            def submit(batch: typing.List[DefectInfo]) -> typing.List[typing.Optional[concurrent.futures.Future]]:
+                return [executor.submit(load, defect) if self._is_pending(defect) else None
+                        for defect in batch]
+
+            batch = self[0:batch_size]
+            futures = submit(batch)
+            for start in batch_starts:
+                next_batch = self[start + batch_size:start + 2 * batch_size]
+                next_futures = submit(next_batch)
+                for defect, future in zip(batch, futures):
+                    if future is not None:
+                        future.result()
+                    yield defect
+                batch, futures = next_batch, next_futures
+
+    def prefetch_elf_logs(self, workers: int = DEFAULT_PREFETCH_WORKERS,
+                          batch_size: int = DEFAULT_PREFETCH_BATCH_SIZE) -> int:
+        """
+        Load all deferred ELF logs (see iter_prefetched()).
+
+        Args:
+            workers: Number of concurrent downloads/parses.
+            batch_size: Number of defects loaded per batch.
+
+        Returns:
+            Number of ELF logs loaded.
+
+        """
+        pending = sum(1 for defect in self if self._is_pending(defect))
+        for _ in self.iter_prefetched(workers=workers, batch_size=batch_size):
+            pass
+        return pending
+
+    @staticmethod
+    def _is_pending(defect: typing.Any) -> bool:
+        # Stored (see from_store()) and spilled defects are always loaded.
+        return getattr(defect, 'elf_log_pending', False)
+
+    @classmethod
+    def from_store(cls, store: typing.Any, debug: bool = False) -> "Defects":
+        """
+        Build the Defects list from a corpus store (e.g. - SQLiteCorpusStore) rather than from Jira issues.
+        The stored defects are used as-is; no Jira access or ELF parsing is performed.
+
+        Args:
+            store: Corpus store providing iter_defects()
+            debug: Enable debug messaging output. (Default: False)
+
+        Returns:
+            Defects list of stored defect records.
+
+        """
+        defects = cls([], debug=debug)
+        defects.extend(store.iter_defects())
+        return defects
 
     @property
     def exception_types(self) -> typing.List[str]:
@@ -107,3 +296,14 @@ class Defects(list):
                 defect_dict[defect.exception_type][error_msg][defect.version].append(f'{defect.defect_id}{extra_data}')
 
         return defect_dict
+
+    def build_aggregate(self) -> ReportAggregate:
+        """
+        Builds the precomputed reporting aggregate (counts per exception, message and version; sorted once).
+        All report outputs (XLSX, console) should be generated from this structure.
+
+        Returns:
+            Finalized ReportAggregate
+
+        """
+        return ReportAggregate.from_defects(self)
@@ -14,7 +14,13 @@ class ELFAnalysis:
     # Used in creating unique call stack id string
     STACK_ELEMENT_DELIMITER = ', '
 
-    def __init__(self, data_struct: typing.Dict[str, dict]) -> typing.NoReturn:
+    def __init__(self, data_struct: typing.Union[typing.Dict[str, dict],
+                                                 typing.Iterable[typing.Tuple[str, dict]]]) -> typing.NoReturn:
+        """
+        :param data_struct: Dictionary of defect_id -> {section: call stack}, or an iterable of
+            (defect_id, {section: call stack}) tuples (e.g. - JSONLCorpusReader.iter_analysis_items()), which is
+            consumed lazily.
+        """
         self.data_struct = data_struct
         self.call_stacks = {}
 
@@ -29,8 +35,10 @@ class ELFAnalysis:
         :return: Dictionary of callstack_strings -> List of defect_ids
 
         """
+        items = self.data_struct.items() if isinstance(self.data_struct, dict) else self.data_struct
+
         # For each JIRA defect object in the data set...
-        for defect_id, data in self.data_struct.items():
+        for defect_id, data in items:
 
             # Get the call stack info, convert to list of specific call stack elements, and create str
             stack_info = self._build_call_stack_proc_list(data.get(ELFLogSections.CALL_STACK_INFORMATION))
@@ -102,36 +110,24 @@ class ELFAnalysis:
 
 
 if __name__ == '__main__':
-    import json
+    import sys
+
+    from MDCBR.corpus.corpus_files import open_corpus
 
     # Variables and Constants
-    CALL_STACK = 'call_stack'
     section = ELFLogSections.CALL_STACK_INFORMATION
-    translate = {}
-    call_stacks = {}
 
-    # Data file to read (rather than poll Jira each time)
-    data_file = "../../CBR.data.json.txt"
+    # Data file to read (rather than poll Jira each time): JSONL corpus, SQLite corpus store or binary snapshot.
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "../../CBR.data.jsonl"
 
     # Defects to assess
     defect_review = [2419, 2418, 2417, 2424]
 
-    elf_tuple_defs = ELFDataTuples()
-    tuple_def = elf_tuple_defs.get_tuple_definition(section)
-
-    # Read data file
-    with open(data_file, "r") as JSON_DATA_FILE:
-        data_obj = json.load(JSON_DATA_FILE)
-
-    # Iterate through data and build list of namedtuples based on the specified section
-    for defect_id, data in data_obj.items():
-        translate[defect_id] = {}
-        translate[defect_id][section] = [tuple_def(**stack_dict) for stack_dict in data[CALL_STACK]]
-        # if int(defect_id.split('-')[-1]) in defect_review:
-        #     print(f"DEFECT: {defect_id}:\n{pprint.pformat(translate[defect_id])}")
+    # Lazily read the data file; only the defect id and call stack are needed for the analysis.
+    reader = open_corpus(data_file, section=section)
 
     # Do analysis (categorize/compare stack traces)
-    elf_analysis = ELFAnalysis(data_struct=translate)
+    elf_analysis = ELFAnalysis(data_struct=reader.iter_analysis_items())
     elf_analysis.perform_stack_trace_assessment()
 
     # Print results based on specific defect id
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import typing
+
+from MDCBR.elf.elf_compact import CompactELFModel
+from MDCBR.elf.elf_compressed import parse_elf_attachment
+from MDCBR.elf.elf_parser import ELFLogParser
+from MDCBR.metrics.run_metrics import METRICS
+
+
+class ParsedELFCache:
+    """
+    Parsed ELF logs, shared by attachment contents. Each downloaded attachment is hashed; the first defect with a
+    given payload parses it, and every other defect with an identical payload shares the same (frozen, immutable)
+    ELFLogParser model instead of parsing its own copy.
+
+    The defects sharing each payload are recorded as well: duplicate attachments (the same log attached to several
+    tickets) are useful triage data in their own right.
+
+    The cache is thread safe: concurrent downloads of the same payload wait for a single parse.
+    """
+
+    def __init__(self, sections: typing.Optional[typing.Iterable[str]] = None) -> typing.NoReturn:
+        """
+        :param sections: Only keep these parsed sections of each model (compact mode; see CompactELFModel).
+            Default: None (keep the full models)
+        """
+        self.sections = None if sections is None else tuple(sections)
+        self._models = {}
+        self._defects = {}
+        self._in_progress = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    @staticmethod
+    def digest(content: typing.Union[str, bytes]) -> str:
+        """
+        :param content: Attachment contents (as downloaded, or as read from a local log)
+
+        :return: Hash (hex digest) of the contents.
+        """
+        if isinstance(content, str):
+            content = content.encode('utf8', errors='surrogateescape')
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, digest: str) -> typing.Optional[ELFLogParser]:
+        """
+        :param digest: Hash of the attachment contents (see digest())
+
+        :return: Shared parsed model, or None if the contents have not been parsed.
+        """
+        return self._models.get(digest)
+
+    def put(self, digest: str, model: ELFLogParser) -> ELFLogParser:
+        """
+        Store a parsed model (e.g. - parsed in a worker process). If a model is already stored for the digest, the
+        stored model is kept, so every defect with the same contents shares a single model.
+
+        :param digest: Hash of the attachment contents (see digest())
+        :param model: Parsed ELF log
+
+        :return: The shared (frozen) model for the digest.
+
+        """
+        with self._lock:
+            stored = self._models.get(digest)
+            if stored is None:
+                if self.sections is not None:
+                    model = CompactELFModel.from_model(model, self.sections)
+                else:
+                    model = model.freeze()
+                stored = self._models[digest] = model
+        return stored
+
+    def release_models(self) -> int:
+        """
+        Release the shared models (e.g. - their defects have been spilled to disk). The recorded defects are kept, so
+        duplicate attachments are still reported; an attachment seen again is parsed again.
+
+        :return: Number of models released.
+        """
+        with self._lock:
+            released = len(self._models)
+            self._models.clear()
+        return released
+
+    def record(self, digest: str, defect_id: str) -> bool:
+        """
+        Record that a defect's attachment has the given contents.
+
+        :param digest: Hash of the attachment contents (see digest())
+        :param defect_id: Defect ID
+
+        :return: True if another defect has already been recorded with identical contents (duplicate).
+
+        """
+        with self._lock:
+            defect_ids = self._defects.setdefault(digest, [])
+            defect_ids.append(defect_id)
+            duplicate = len(defect_ids) > 1
+
+        METRICS.counter('attachment.duplicate_payloads' if duplicate else 'attachment.unique_payloads').inc()
+        return duplicate
+
+    def get_or_parse(self, content: typing.Union[str, bytes],
+                     defect_id: typing.Optional[str] = None) -> typing.Tuple[str, ELFLogParser]:
+        """
+        Get the shared model for the contents, parsing the contents if they have not been parsed (or are being
+        parsed by another thread).
+
+        :param content: Attachment contents, as returned by DefectInfo.download_elf_attachment()
+        :param defect_id: Defect ID to record against the contents (see record()); None = not recorded.
+
+        :return: Tuple of (digest, shared parsed model)
+
+        """
+        digest = self.digest(content)
+        while True:
+            with self._lock:
+                model = self._models.get(digest)
+                if model is not None:
+                    break
+                event = self._in_progress.get(digest)
+                owner = event is None
+                if owner:
+                    event = self._in_progress[digest] = threading.Event()
+
+            # Another thread is parsing the same contents: wait, then use its model (or parse, if it failed).
+            if not owner:
+                event.wait()
+                continue
+
+            try:
+                with METRICS.timer('attachment.parse_seconds'):
+                    model = self.put(digest, parse_elf_attachment(content))
+            finally:
+                with self._lock:
+                    self._in_progress.pop(digest, None)
+                event.set()
+            break
+
+        if defect_id is not None:
+            self.record(digest, defect_id)
+        return digest, model
+
+    def duplicates(self) -> typing.Dict[str, typing.List[str]]:
+        """
+        :return: Dictionary of digest -> list of defect ids, for the contents shared by more than one defect
+            (largest group first).
+        """
+        with self._lock:
+            groups = [(digest, list(ids)) for digest, ids in self._defects.items() if len(ids) > 1]
+        return dict(sorted(groups, key=lambda x: len(x[1]), reverse=True))
+
+    def summary(self) -> dict:
+        """
+        :return: Dictionary of the attachment counts: recorded, unique payloads, duplicates (attachments that did not
+            need to be parsed) and duplicate groups.
+        """
+        with self._lock:
+            recorded = sum(len(ids) for ids in self._defects.values())
+            groups = sum(1 for ids in self._defects.values() if len(ids) > 1)
+            unique = len(self._defects)
+        return {
+            'attachments': recorded,
+            'unique_attachments': unique,
+            'duplicate_attachments': recorded - unique,
+            'duplicate_groups': groups,
+        }
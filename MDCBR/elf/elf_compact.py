@@ -0,0 +1,91 @@
+import typing
+
+from MDCBR.elf.elf_parser import ELFLogParser, SectionNotFound
+
+
+class CompactELFModel:
+    """
+    Read-only stand-in for ELFLogParser, keeping only the requested parsed sections. The log contents, the raw
+    (unparsed) sections and every other parsed section are released.
+
+    Provides the same get_section() semantics as ELFLogParser for the parsed sections that were kept.
+    """
+    __slots__ = ('_parsed_sections',)
+
+    def __init__(self, parsed_sections: typing.Dict[str, typing.Any]) -> typing.NoReturn:
+        """
+        :param parsed_sections: Dictionary of section key (see ELFLogParser.convert_section_type_to_key) -> parsed data
+        """
+        self._parsed_sections = parsed_sections
+
+    @classmethod
+    def from_model(cls, model: typing.Any, sections: typing.Iterable[str]) -> "CompactELFModel":
+        """
+        Extract the requested parsed sections from a parsed ELF log. The section data is frozen (tuples), so it can be
+        shared with the original model (e.g. - a model shared by identical attachments).
+
+        :param model: ELFLogParser (or CompactELFModel)
+        :param sections: Names of the sections to keep (ELFLogSections attributes); sections not found in the log
+            are skipped.
+
+        :return: CompactELFModel (the model itself, if it is already a CompactELFModel containing the sections)
+
+        """
+        keys = [ELFLogParser.convert_section_type_to_key(section) for section in sections]
+        if isinstance(model, cls) and all(key in model._parsed_sections for key in keys):
+            return model
+
+        if isinstance(model, ELFLogParser):
+            model.freeze()
+
+        parsed_sections = {}
+        for key in keys:
+            try:
+                parsed_sections[key] = model.get_section(key)
+            except SectionNotFound:
+                continue
+        return cls(parsed_sections)
+
+    def freeze(self) -> "CompactELFModel":
+        """
+        The section data is already frozen (see from_model); provided for ELFLogParser compatibility.
+
+        :return: self
+        """
+        return self
+
+    def get_section_names_found(self, raw: bool = False) -> typing.List[str]:
+        """
+        :param raw: Not supported (raw sections are not kept); returns an empty list if True.
+
+        :return: List of the sections kept.
+        """
+        return [] if raw else list(self._parsed_sections.keys())
+
+    def get_section(self, section_name: str, raw: bool = False) -> typing.Any:
+        """
+        Get a specific ELF report section (same semantics as ELFLogParser.get_section, parsed data only).
+
+        :param section_name: Name of the desired section (use ELFLogSection class attributes)
+        :param raw: Not supported (raw text is not kept); raises SectionNotFound if True.
+
+        :raises: SectionNotFound
+
+        :return: Parsed section data.
+
+        """
+        if not raw:
+            if section_name in self._parsed_sections:
+                return self._parsed_sections[section_name]
+            key = ELFLogParser.convert_section_type_to_key(section_name)
+            if key in self._parsed_sections:
+                return self._parsed_sections[key]
+        raise SectionNotFound(section_name)
+
+    def get_all_sections(self, raw: bool = False) -> typing.Dict[str, typing.Any]:
+        """
+        :param raw: Not supported (raw sections are not kept); returns an empty dictionary if True.
+
+        :return: Dictionary of the sections kept: key: section_name, value: parsed data
+        """
+        return {} if raw else dict(self._parsed_sections)
@@ -0,0 +1,124 @@
+import bz2
+import gzip
+import io
+import lzma
+import typing
+import zipfile
+
+from MDCBR.elf.elf_parser import ELFLogParser, UnableToParseELFLog
+from MDCBR.metrics.run_metrics import METRICS
+
+
+class CompressedELFFormats:
+    """
+    Compressed ELF log formats (standard library only): zip archives (the first ELF log member is used), and gzip,
+    bzip2 and xz compressed logs (e.g. - 'CBR-1234.el.gz').
+    """
+    ELF_LOG = '.el'
+    ZIP = 'zip'
+    GZIP = 'gzip'
+    BZIP2 = 'bzip2'
+    XZ = 'xz'
+
+    EXTENSIONS = {
+        '.zip': ZIP,
+        '.gz': GZIP,
+        '.bz2': BZIP2,
+        '.xz': XZ,
+        '.lzma': XZ,
+    }
+
+    @classmethod
+    def get_format(cls, filename: str) -> typing.Optional[str]:
+        """
+        :param filename: Attachment/file name
+
+        :return: Compression format (class attribute), or None if the file is not compressed.
+        """
+        filename = filename.lower()
+        for extension, compression in cls.EXTENSIONS.items():
+            if filename.endswith(extension):
+                return compression
+        return None
+
+    @classmethod
+    def is_compressed_elf_log(cls, filename: str) -> bool:
+        """
+        :param filename: Attachment/file name
+
+        :return: True for a zip archive (which may contain an ELF log), or a compressed ELF log ('<name>.el.gz', etc.)
+        """
+        compression = cls.get_format(filename)
+        if compression is None:
+            return False
+        if compression == cls.ZIP:
+            return True
+        return filename.lower().rsplit('.', 1)[0].endswith(cls.ELF_LOG)
+
+
+class CompressedELFContent(bytes):
+    """
+    Downloaded contents of a compressed ELF log attachment. The contents are kept compressed (as downloaded); the log
+    is decompressed as it is parsed (see parse_elf_attachment). Hashes (see ParsedELFCache.digest) and pickles as bytes.
+    """
+
+    def __new__(cls, content: bytes, filename: str) -> "CompressedELFContent":
+        """
+        :param content: Compressed contents, as downloaded.
+        :param filename: Attachment filename (determines the compression format).
+        """
+        obj = super().__new__(cls, content)
+        obj.filename = filename
+        return obj
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, (bytes(self), self.filename)
+
+
+def open_elf_stream(binary_stream: typing.BinaryIO, filename: str) -> typing.TextIO:
+    """
+    Open a compressed ELF log as a text stream: the log is decompressed and decoded incrementally, as the stream is
+    read (no temporary files, and no decompressed copy of the log).
+
+    :param binary_stream: Binary file object of the compressed contents (file, io.BytesIO)
+    :param filename: File/attachment name (determines the compression format)
+
+    :raises: UnableToParseELFLog: Not a supported compressed file, or a zip archive without an ELF log.
+
+    :return: Text stream of the ELF log lines.
+
+    """
+    compression = CompressedELFFormats.get_format(filename)
+    if compression == CompressedELFFormats.ZIP:
+        archive = zipfile.ZipFile(binary_stream)
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(CompressedELFFormats.ELF_LOG)]
+        if not members:
+            raise UnableToParseELFLog(f"{filename}: No ELF log found in the zip archive.")
+        stream = archive.open(members[0])
+    elif compression == CompressedELFFormats.GZIP:
+        stream = gzip.GzipFile(fileobj=binary_stream, mode='rb')
+    elif compression == CompressedELFFormats.BZIP2:
+        stream = bz2.BZ2File(binary_stream, mode='rb')
+    elif compression == CompressedELFFormats.XZ:
+        stream = lzma.LZMAFile(binary_stream, mode='rb')
+    else:
+        raise UnableToParseELFLog(f"{filename}: Unsupported compressed file.")
+    return io.TextIOWrapper(stream, encoding='utf8', errors='replace', newline=None)
+
+
+def parse_elf_attachment(content: typing.Union[str, bytes]) -> ELFLogParser:
+    """
+    Parse downloaded ELF attachment contents: plain contents (as returned by DefectInfo.download_elf_attachment()),
+    or compressed contents (CompressedELFContent), which are decompressed as they are parsed.
+
+    :param content: Attachment contents
+
+    :return: Parsed ELF log model
+
+    """
+    if isinstance(content, CompressedELFContent):
+        METRICS.counter('attachment.compressed_parses').inc()
+        with open_elf_stream(io.BytesIO(content), content.filename) as stream:
+            return ELFLogParser(text_stream=stream)
+    return ELFLogParser(binary_content=content)
@@ -111,15 +111,24 @@ class ELFDataTuples:
         self._define_named_tuples()
 
     # noinspection PyTypeChecker
-    def _define_named_tuples(self) -> typing.NoReturn:
+    @classmethod
+    def _define_named_tuples(cls) -> typing.NoReturn:
         """
         Define the namedtuple for each section, name: {section name}Element, attributes: list of identified elements.
 
+        The namedtuples are defined once (when the module is imported) and registered as attributes of this module, so
+        the parsed data can be pickled (e.g. - returned from worker processes).
+
         :return: None.
         """
-        for section_name in self.definitions:
-            self.definitions[section_name][self.named_tuple] = namedtuple(
-                self._build_tuple_name(section_name), self.get_elf_section_attribute_list(section_name))
+        for section_name in cls.definitions:
+            if cls.definitions[section_name][cls.named_tuple] is not None:
+                continue
+
+            tuple_name = cls._build_tuple_name(section_name)
+            data_tuple = namedtuple(tuple_name, cls.get_elf_section_attribute_list(section_name), module=__name__)
+            globals()[tuple_name] = data_tuple
+            cls.definitions[section_name][cls.named_tuple] = data_tuple
 
     @staticmethod
     def _build_tuple_name(section: str) -> str:
@@ -191,3 +200,7 @@ class ELFDataTuples:
         for illegal_character in [x for x in self.illegal_variable_name_characters if x in string]:
             string = re.sub(illegal_character, ' ', string)
         return string.strip()
+
+
+# Define the section namedtuples at import, so they can be unpickled in any process.
+ELFDataTuples._define_named_tuples()
@@ -5,6 +5,7 @@ import typing
 
 from MDCBR.elf.elf_data_tuples import ELFDataTuples
 from MDCBR.elf.elf_log_sections import ELFLogSections
+from MDCBR.metrics.run_metrics import METRICS
 
 
 class SectionNotFound(Exception):
@@ -15,6 +16,23 @@ class UnableToParseELFLog(Exception):
     pass
 
 
+class FrozenDict(dict):
+    """
+    Read-only dictionary: the parsed section data of a frozen model (see ELFLogParser.freeze). Any modification raises
+    TypeError. Unlike types.MappingProxyType, it is still a dict (isinstance checks), and it can be pickled (e.g. -
+    models returned from worker processes, run checkpoints).
+    """
+
+    def _read_only(self, *args: typing.Any, **kwargs: typing.Any) -> typing.NoReturn:
+        raise TypeError(f"{self.__class__.__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, (dict(self),)
+
+
 class ELFLogParser:
     """
     This is the primary logic for parsing the ELF logs. Many routines are generalized (as the section formats are
@@ -47,23 +65,30 @@ class ELFLogParser:
     TABLE_DELIMITER = re.compile(r'^[|]*-{12,}')
     DATA_LINE_PATTERN = re.compile(r'^\s*\d+\.\d+\s+(?P<attribute>.*?)\s*:\s*(?P<data>.*)?')
 
-    def __init__(self, log_file: str = '', binary_content: str = '') -> None:
+    def __init__(self, log_file: str = '', binary_content: str = '',
+                 text_stream: typing.Optional[typing.Iterable[str]] = None) -> None:
         """
         Initialize the object and parse the file.
         :param log_file: ELF Log file to parse.
+        :param binary_content: ELF Log contents, as received from Jira (str of the downloaded bytes).
+        :param text_stream: Iterable of ELF log lines (e.g. - a text file object or a decoded archive member).
         """
         self.log_file = log_file
         self._tuples = ELFDataTuples()
 
         if self.log_file != '':
             self._contents = self._read_file()
+        elif text_stream is not None:
+            self._contents = list(text_stream)
         elif binary_content != '':
             self._contents = self._process_data_stream(binary_content)
         else:
             raise UnableToParseELFLog('No ELF log filename or file contents provided.')
 
-        self._raw_sections = self._parse_raw_sections()
-        self._parsed_sections = self._parse_elf_sections()
+        with METRICS.timer('elf.parse.split_seconds'):
+            self._raw_sections = self._parse_raw_sections()
+        with METRICS.timer('elf.parse.total_seconds'):
+            self._parsed_sections = self._parse_elf_sections()
 
     def _read_file(self) -> typing.List[str]:
         """
@@ -132,8 +157,12 @@ class ELFLogParser:
                 method = getattr(self, method_name)
 
                 # If the method name exists in the class but is not callable (e.g. - stubbing var):
-                # return an empty dictionary.
-                sections[name] = method() if callable(method) else {}
+                # return an empty dictionary. Sections missing from the log (e.g. - a partial download) are skipped.
+                try:
+                    with METRICS.timer(f'elf.parse.{name}_seconds'):
+                        sections[name] = method() if callable(method) else {}
+                except SectionNotFound:
+                    continue
 
             # No method found, so the section is not supported. (Thus needs to have support added).
             else:
@@ -468,6 +497,27 @@ class ELFLogParser:
         """
         return re.sub(r'\s+', char, string)
 
+    def freeze(self) -> "ELFLogParser":
+        """
+        Make the parsed data immutable (each section's list of lines/namedtuples becomes a tuple, and each dictionary
+        a read-only FrozenDict), so a single parsed model can be safely shared by several defects (e.g. - identical
+        attachments; see elf_cache.ParsedELFCache).
+
+        :return: self (to allow chaining)
+
+        """
+        def _freeze(data: typing.Any) -> typing.Any:
+            if isinstance(data, list):
+                return tuple(data)
+            if isinstance(data, dict):
+                return FrozenDict((key, _freeze(value)) for key, value in data.items())
+            return data
+
+        self._contents = tuple(self._contents)
+        self._raw_sections = _freeze(self._raw_sections)
+        self._parsed_sections = _freeze(self._parsed_sections)
+        return self
+
     @classmethod
     def convert_section_type_to_key(cls, section_name: str) -> str:
         """
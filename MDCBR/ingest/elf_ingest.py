@@ -0,0 +1,236 @@
+from collections import namedtuple
+import concurrent.futures
+import io
+import logging
+import os
+import tarfile
+import typing
+import zipfile
+
+from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.defects.defects_list import Defects
+from MDCBR.elf.elf_cache import ParsedELFCache
+from MDCBR.elf.elf_compressed import CompressedELFFormats, open_elf_stream
+from MDCBR.elf.elf_parser import ELFLogParser, ELFLogSections, SectionNotFound
+from MDCBR.md.md_records import IssueFieldsRecord, IssueRecord
+from MDCBR.metrics.run_metrics import METRICS
+
+
+# A single ELF log to ingest: name (used as the defect id), path (local file) or data (bytes read from an archive).
+ELFSource = namedtuple('ELFSource', ['name', 'path', 'data'])
+
+
+class ELFIngestFormats:
+    """
+    File extensions recognized by the offline ingestion. Single compressed ELF logs ('<name>.el.gz', '.el.bz2',
+    '.el.xz') are recognized as well (see CompressedELFFormats); zip files are treated as archives.
+    """
+    ELF_LOG = '.el'
+    ZIP = ('.zip',)
+    TAR = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+    @classmethod
+    def is_elf_log(cls, filename: str) -> bool:
+        return filename.lower().endswith(cls.ELF_LOG) or cls.is_compressed_elf_log(filename)
+
+    @classmethod
+    def is_compressed_elf_log(cls, filename: str) -> bool:
+        return (not cls.is_archive(filename) and CompressedELFFormats.is_compressed_elf_log(filename))
+
+    @classmethod
+    def is_archive(cls, filename: str) -> bool:
+        return filename.lower().endswith(cls.ZIP + cls.TAR)
+
+
+def find_elf_sources(path: str) -> typing.Iterator[ELFSource]:
+    """
+    Recursively find the ELF logs in a directory or archive. Archives found in a directory are expanded as well.
+    Logs in archives are read (in archive order) one at a time, as the iterator is consumed.
+
+    :param path: Directory, tar/zip archive, or single ELF log file.
+
+    :return: Iterator of ELFSource tuples.
+
+    """
+    if os.path.isdir(path):
+        for directory, sub_dirs, filenames in os.walk(path):
+            sub_dirs.sort()
+            for filename in sorted(filenames):
+                full_path = os.path.join(directory, filename)
+                name = os.path.relpath(full_path, path)
+                if ELFIngestFormats.is_elf_log(filename):
+                    yield ELFSource(name=name, path=full_path, data=None)
+                elif ELFIngestFormats.is_archive(filename):
+                    yield from _find_archive_sources(full_path, prefix=name)
+
+    elif ELFIngestFormats.is_archive(path):
+        yield from _find_archive_sources(path, prefix=os.path.basename(path))
+
+    elif os.path.isfile(path):
+        yield ELFSource(name=os.path.basename(path), path=path, data=None)
+
+
+def _find_archive_sources(archive: str, prefix: str) -> typing.Iterator[ELFSource]:
+    """
+    Read the ELF logs from a zip or tar (optionally compressed) archive.
+
+    :param archive: Archive filename
+    :param prefix: Prefix for the log names (archive name)
+
+    :return: Iterator of ELFSource tuples.
+
+    """
+    if archive.lower().endswith(ELFIngestFormats.ZIP):
+        with zipfile.ZipFile(archive) as ZIP:
+            for info in ZIP.infolist():
+                if not info.is_dir() and ELFIngestFormats.is_elf_log(info.filename):
+                    yield ELFSource(name=f"{prefix}/{info.filename}", path='', data=ZIP.read(info))
+    else:
+        with tarfile.open(archive, 'r:*') as TAR:
+            for member in TAR:
+                if member.isfile() and ELFIngestFormats.is_elf_log(member.name):
+                    yield ELFSource(name=f"{prefix}/{member.name}", path='', data=TAR.extractfile(member).read())
+
+
+def build_offline_issue(name: str, elf_model: ELFLogParser) -> IssueRecord:
+    """
+    Build a Jira issue stand-in from a parsed ELF log, using the same summary and description formats as the Jira
+    bug reports, so the defect is classified exactly as if it had been reported through Jira.
+
+        summary: <exception type> (ELF Log <exception id>; v<application version>)
+        description: Server Hostname: <computer name>
+                     <exception message>
+
+    :param name: Log name (used as the issue key)
+    :param elf_model: Parsed ELF log
+
+    :return: IssueRecord
+
+    """
+    exception = _get_optional_section(elf_model, ELFLogSections.EXCEPTION)
+    application = _get_optional_section(elf_model, ELFLogSections.APPLICATION)
+    computer = _get_optional_section(elf_model, ELFLogSections.COMPUTER)
+
+    summary = (f"{getattr(exception, 'type_', '') or 'Exception'} "
+               f"(ELF Log {getattr(exception, 'id_', '') or 'NA'}; "
+               f"v{getattr(application, 'version_number', '') or '0'})")
+    description = (f"Server Hostname: {getattr(computer, 'name', '')}\r\n"
+                   f"{getattr(exception, 'message', '')}")
+
+    return IssueRecord(key=name, fields=IssueFieldsRecord(
+        summary=summary, description=description, created=getattr(exception, 'date', '')))
+
+
+def _get_optional_section(elf_model: ELFLogParser, section: str) -> typing.Any:
+    try:
+        return elf_model.get_section(section)
+    except SectionNotFound:
+        return None
+
+
+def process_elf_source(source: ELFSource, debug: bool = False, compact: bool = False,
+                       sections: typing.Optional[typing.Tuple[str, ...]] = None) -> DefectInfo:
+    """
+    Parse and classify a single ELF log. (Module-level function, so it can be run in a worker process.)
+
+    :param source: ELFSource to process
+    :param debug: Enable debug messages
+    :param compact: Compact defect (see DefectInfo); only the requested sections are sent back from the worker.
+    :param sections: Parsed ELF sections kept in compact mode (default: DefectInfo.COMPACT_SECTIONS)
+
+    :return: DefectInfo (with the parsed ELF log model)
+
+    """
+    if ELFIngestFormats.is_compressed_elf_log(source.name):
+        # Decompressed as the log is parsed (no temporary file or decompressed copy).
+        if source.data is None:
+            with open(source.path, 'rb') as ELF:
+                digest = ParsedELFCache.digest(ELF.read())
+                ELF.seek(0)
+                with open_elf_stream(ELF, source.name) as stream:
+                    elf_model = ELFLogParser(text_stream=stream)
+        else:
+            digest = ParsedELFCache.digest(source.data)
+            with open_elf_stream(io.BytesIO(source.data), source.name) as stream:
+                elf_model = ELFLogParser(text_stream=stream)
+    else:
+        # Plain logs are decoded the same way whether loose on disk or in an archive (invalid UTF-8 is replaced).
+        data = source.data
+        if data is None:
+            with open(source.path, 'rb') as ELF:
+                data = ELF.read()
+        elf_model = ELFLogParser(text_stream=io.StringIO(data.decode('utf8', errors='replace'), newline=None))
+        digest = ParsedELFCache.digest(data)
+
+    defect = DefectInfo(build_offline_issue(source.name, elf_model), debug=debug, parse_elf_log=False,
+                        elf_log_model=elf_model, compact=compact, sections=sections)
+    defect.attachment_digest = digest
+    return defect
+
+
+def ingest_elf_logs(path: str, workers: typing.Optional[int] = None,
+                    listeners: typing.Iterable[typing.Callable[[DefectInfo], typing.Any]] = (),
+                    debug: bool = False, logger: typing.Optional[logging.Logger] = None,
+                    parse_cache: typing.Optional[ParsedELFCache] = None, compact: bool = False,
+                    sections: typing.Optional[typing.Tuple[str, ...]] = None) -> Defects:
+    """
+    Ingest a directory or archive of ELF logs: parse and classify each log in parallel (worker processes), and
+    collect the results into a Defects list. No Jira access is required.
+
+    :param path: Directory, tar/zip archive, or single ELF log file.
+    :param workers: Number of worker processes (default: number of CPUs; 1 = process in this process).
+    :param listeners: Defects listeners (called with each completed DefectInfo)
+    :param debug: Enable debug messages
+    :param logger: Logging facility
+    :param parse_cache: ParsedELFCache: records the identical logs (duplicates), which then share a single model.
+    :param compact: Compact defects: only the extracted fields and the requested parsed sections are kept.
+    :param sections: Parsed ELF sections kept in compact mode (default: DefectInfo.COMPACT_SECTIONS)
+
+    :return: Defects list
+
+    """
+    logger = logger or logging.getLogger(__name__)
+    defects = Defects([], debug=debug, listeners=listeners, parse_elf_log=False)
+    failures = 0
+
+    def collect(future_or_defect: typing.Any, name: str) -> typing.NoReturn:
+        nonlocal failures
+        try:
+            defect = future_or_defect() if callable(future_or_defect) else future_or_defect.result()
+        except Exception as exc:
+            failures += 1
+            METRICS.counter('ingest.failures').inc()
+            logger.error(f"{name}: Unable to parse ELF log: {exc!r}")
+            return
+        METRICS.counter('ingest.logs').inc()
+
+        # Each log is parsed in a worker process; identical logs keep a single (shared) model in this process.
+        if parse_cache is not None and defect.attachment_digest is not None:
+            defect.elf_log_model = parse_cache.put(defect.attachment_digest, defect.elf_log_model)
+            parse_cache.record(defect.attachment_digest, defect.defect_id)
+        defects.add_defect(defect)
+
+    sources = find_elf_sources(path)
+
+    if workers == 1:
+        for source in sources:
+            collect(lambda: process_elf_source(source, debug, compact, sections), source.name)
+
+    else:
+        workers = workers or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            # Limit the number of logs in flight, so archive contents are not all read into memory at once.
+            max_in_flight = 4 * workers
+            pending = {}
+            for source in sources:
+                pending[executor.submit(process_elf_source, source, debug, compact, sections)] = source.name
+                if len(pending) >= max_in_flight:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        collect(future, pending.pop(future))
+
+            for future in concurrent.futures.as_completed(list(pending)):
+                collect(future, pending.pop(future))
+
+    logger.info(f"Ingested {len(defects)} ELF logs from '{path}' ({failures} failed).")
+    return defects
@@ -0,0 +1,404 @@
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+import random
+import re
+import threading
+import time
+import typing
+
+from MDCBR.elf.elf_compressed import CompressedELFFormats
+from MDCBR.elf.elf_log_sections import ELFLogSections
+from MDCBR.metrics.run_metrics import METRICS, Histogram
+
+# Size of the first range requested by a partial download (bytes); each subsequent range is twice the size.
+DEFAULT_RANGE_SIZE = 16 * 1024
+
+# ELF log section heading (e.g. - 'Call Stack Information:'), on its own line.
+SECTION_HEADING = re.compile(rb'^(?P<section_name>\w[\w ]*\w):\r*\n', re.MULTILINE)
+
+
+class DownloadFailed(Exception):
+    pass
+
+
+def fetch_attachment(attachment: typing.Any, timeout: float) -> bytes:
+    """
+    Download an attachment's contents, with a per-request timeout.
+
+    The jira attachment resource's get() does not accept a timeout, so the attachment's session and content URL are
+    used directly when available (jira resource: _session + content; md_records.AttachmentRecord from a raw search:
+    session + url); otherwise, attachment.get() is used.
+
+    Args:
+        attachment: Jira attachment resource (or equivalent)
+        timeout: Connect/read timeout in seconds.
+
+    Returns:
+        Attachment contents (bytes)
+
+    """
+    session, url = get_attachment_session(attachment)
+    if session is not None:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+    return attachment.get()
+
+
+def get_attachment_session(attachment: typing.Any) -> typing.Tuple[typing.Optional[typing.Any], typing.Optional[str]]:
+    """
+    Args:
+        attachment: Jira attachment resource (or equivalent)
+
+    Returns:
+        Tuple of (HTTP session, content URL); (None, None) if the attachment is not downloaded over HTTP.
+
+    """
+    session = getattr(attachment, '_session', None) or getattr(attachment, 'session', None)
+    url = getattr(attachment, 'content', None)
+    if not isinstance(url, str):
+        url = getattr(attachment, 'url', None) or None
+    if session is None or not isinstance(url, str):
+        return None, None
+    return session, url
+
+
+def find_sections_end(content: bytes, sections: typing.Iterable[str]) -> typing.Optional[int]:
+    """
+    Find where the requested ELF log sections end: each section ends at the next section heading.
+
+    Args:
+        content: (Partial) ELF log contents
+        sections: Names of the required sections (ELFLogSections attributes)
+
+    Returns:
+        Offset of the first section heading following all of the required sections (the contents up to the offset
+        include the complete sections), or None if they have not all been read.
+
+    """
+    known = set(dataclasses.asdict(ELFLogSections()).values())
+    remaining = set(sections)
+    for match in SECTION_HEADING.finditer(content):
+        name = match.group('section_name').decode('utf8', errors='replace')
+        if name not in known:
+            continue
+        if not remaining:
+            return match.start()
+        remaining.discard(name)
+    return None
+
+
+def fetch_attachment_sections(attachment: typing.Any, sections: typing.Iterable[str], timeout: float,
+                              range_size: int = DEFAULT_RANGE_SIZE) -> bytes:
+    """
+    Download the beginning of an ELF log attachment, up to the end of the required sections, in successive HTTP
+    ranges (each twice the size of the previous one). The large sections at the end of the logs (modules, processes,
+    etc.) are not downloaded unless they are required.
+
+    If the server ignores the Range header (full response), the full contents are used; attachments that are not
+    downloaded over HTTP are downloaded in full (see fetch_attachment).
+
+    Args:
+        attachment: Jira attachment resource (or equivalent)
+        sections: Names of the required sections (ELFLogSections attributes)
+        timeout: Connect/read timeout in seconds (per request).
+        range_size: Size of the first range (bytes).
+
+    Returns:
+        Attachment contents (bytes): the full contents, or the contents up to the end of the required sections.
+
+    """
+    session, url = get_attachment_session(attachment)
+    if session is None:
+        return fetch_attachment(attachment, timeout)
+
+    sections = tuple(sections)
+    content = bytearray()
+    while True:
+        start = len(content)
+        response = session.get(url, headers={'Range': f'bytes={start}-{start + range_size - 1}'}, timeout=timeout)
+
+        # 416: the range starts at (or past) the end of the contents.
+        if response.status_code == 416:
+            break
+        response.raise_for_status()
+        if response.status_code != 206:
+            METRICS.counter('attachment.range_ignored').inc()
+            return response.content
+
+        METRICS.counter('attachment.range_requests').inc()
+        content += response.content
+        total = get_content_length(response)
+        end = find_sections_end(content, sections)
+        if end is not None:
+            if total is not None:
+                METRICS.counter('attachment.range_skipped_bytes').inc(total - end)
+            return bytes(content[:end])
+        if not response.content or (total is not None and len(content) >= total):
+            break
+        range_size *= 2
+    return bytes(content)
+
+
+def get_content_length(response: typing.Any) -> typing.Optional[int]:
+    """
+    Args:
+        response: Partial content (206) response
+
+    Returns:
+        Complete length of the contents (from the Content-Range header), or None if not known.
+
+    """
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+class AdaptiveDownloadController:
+    """
+    Limits the number of concurrent attachment downloads, adjusting the limit to the server's behavior (AIMD):
+
+        * Each fast, successful download raises the limit slightly (additive increase: +1 per 'limit' downloads).
+        * A throttled (429/503) or failed (5xx, timeout, connection error) download halves the limit; a slow
+          download (latency above the target) reduces it by 10% (multiplicative decrease). Other failures (e.g. -
+          404) do not change the limit.
+
+    Failed downloads are retried with full-jitter exponential backoff (honoring a Retry-After header, if provided).
+    Optionally, when a download takes longer than the hedge delay (the 95th percentile of the observed latencies),
+    a second (hedged) request is sent, and the first response is used.
+
+    Usage:
+        controller = AdaptiveDownloadController(max_concurrency=16)
+        content = controller.download(attachment)
+        ...
+        controller.summary()
+    """
+
+    RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+    THROTTLE_STATUS = {429, 503}
+    HEDGE_PERCENTILE = 95
+    HEDGE_MIN_SAMPLES = 20
+
+    def __init__(self, max_concurrency: int = 16, min_concurrency: int = 1, initial_concurrency: int = 4,
+                 target_latency: float = 2.0, timeout: float = 30.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0, hedge: bool = False,
+                 min_hedge_delay: float = 1.0, seed: typing.Optional[int] = None,
+                 sections: typing.Optional[typing.Iterable[str]] = None) -> typing.NoReturn:
+        """
+        Args:
+            max_concurrency: Upper bound of the concurrency limit.
+            min_concurrency: Lower bound of the concurrency limit.
+            initial_concurrency: Starting concurrency limit.
+            target_latency: Downloads slower than this (secs) reduce the limit.
+            timeout: Per-request timeout (secs).
+            max_retries: Number of retries per download (after the initial attempt).
+            backoff_base: Base backoff delay (secs); doubled for each retry.
+            backoff_cap: Maximum backoff delay (secs).
+            hedge: Send a second request when a download exceeds the hedge delay.
+            min_hedge_delay: Minimum hedge delay (secs).
+            seed: Random seed (jitter)
+            sections: Partial downloads: only download the ELF logs up to the end of these sections (HTTP ranges;
+                see fetch_attachment_sections). Default: None (full downloads)
+
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.sections = None if sections is None else tuple(sections)
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.active = 0
+        self.peak_limit = self.limit
+        self.low_limit = self.limit
+        self._condition = threading.Condition()
+        self._random = random.Random(seed)
+        self._latency = Histogram('controller.latency_seconds')
+
+        # Requests run in these threads, so the per-request timeout and hedging apply to any attachment type.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * max_concurrency,
+                                                               thread_name_prefix='download')
+
+    # ------------------------------------------------------------------------------------------------
+    # Concurrency limit
+    # ------------------------------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def slot(self) -> typing.Iterator[typing.NoReturn]:
+        """
+        Hold one of the (currently allowed) concurrent download slots for the enclosed block.
+        """
+        with self._condition:
+            while self.active >= int(self.limit):
+                self._condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+    def _set_limit(self, limit: float) -> typing.NoReturn:
+        with self._condition:
+            self.limit = max(float(self.min_concurrency), min(float(self.max_concurrency), limit))
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self.low_limit = min(self.low_limit, self.limit)
+            self._condition.notify_all()
+        METRICS.histogram('attachment.concurrency_limit').observe(self.limit)
+
+    def on_success(self, latency: float) -> typing.NoReturn:
+        self._latency.observe(latency)
+        if latency > self.target_latency:
+            self._set_limit(self.limit * 0.9)
+        else:
+            self._set_limit(self.limit + 1.0 / self.limit)
+
+    def on_failure(self) -> typing.NoReturn:
+        self._set_limit(self.limit * 0.5)
+
+    # ------------------------------------------------------------------------------------------------
+    # Downloads
+    # ------------------------------------------------------------------------------------------------
+    @staticmethod
+    def get_status(exc: Exception) -> typing.Optional[int]:
+        """
+        Get the HTTP status code of a failed request (requests.HTTPError or jira.JIRAError), if available.
+        """
+        status = getattr(exc, 'status_code', None)
+        if status is None:
+            status = getattr(getattr(exc, 'response', None), 'status_code', None)
+        return status
+
+    def is_retryable(self, exc: Exception) -> bool:
+        status = self.get_status(exc)
+        if status is not None:
+            return status in self.RETRYABLE_STATUS
+        # No status: timeouts and connection errors (requests exceptions are subclasses of OSError/IOError).
+        return isinstance(exc, (TimeoutError, concurrent.futures.TimeoutError, OSError))
+
+    def backoff_delay(self, attempt: int, exc: typing.Optional[Exception] = None) -> float:
+        """
+        Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt)), or the server's Retry-After.
+        """
+        headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+        retry_after = headers.get('Retry-After')
+        if retry_after is not None and str(retry_after).isdigit():
+            return min(self.backoff_cap, float(retry_after))
+        return self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    @property
+    def hedge_delay(self) -> typing.Optional[float]:
+        if not self.hedge or self._latency.count < self.HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.min_hedge_delay, self._latency.percentile(self.HEDGE_PERCENTILE))
+
+    def _attempt(self, request: typing.Callable[[], bytes]) -> bytes:
+        """
+        Make a single (possibly hedged) request, bounded by the per-request timeout.
+        """
+        futures = [self._executor.submit(request)]
+        deadline = time.perf_counter() + self.timeout
+
+        hedge_delay = self.hedge_delay
+        if hedge_delay is not None and hedge_delay < self.timeout:
+            done, _ = concurrent.futures.wait(futures, timeout=hedge_delay)
+            if not done:
+                METRICS.counter('attachment.hedged_requests').inc()
+                futures.append(self._executor.submit(request))
+
+        # Use the first successful response; fail if all requests fail, or on timeout.
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=max(0.0, deadline - time.perf_counter()),
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        METRICS.counter('attachment.hedge_wins').inc()
+                    return future.result()
+                error = future.exception()
+
+        if pending:
+            raise TimeoutError(f"Download exceeded {self.timeout} secs.")
+        raise error
+
+    def download(self, attachment: typing.Any) -> bytes:
+        """
+        Download an attachment: waits for a free slot, retries retryable failures with backoff.
+
+        Args:
+            attachment: Jira attachment resource (or equivalent)
+
+        Returns:
+            Attachment contents (bytes)
+
+        Raises:
+            DownloadFailed: The download failed after all retries (or with a non-retryable error).
+
+        """
+        # Compressed attachments are downloaded in full (the sections cannot be found in the compressed contents).
+        filename = getattr(attachment, 'filename', '')
+        if self.sections is not None and CompressedELFFormats.get_format(filename) is None:
+            request = lambda: fetch_attachment_sections(attachment, self.sections, self.timeout)
+        else:
+            request = lambda: fetch_attachment(attachment, self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.slot():
+                    # Latency is measured once a slot is held, so time spent waiting for a slot is not counted.
+                    start_time = time.perf_counter()
+                    content = self._attempt(request)
+                    latency = time.perf_counter() - start_time
+            except Exception as exc:
+                status = self.get_status(exc)
+                if status in self.THROTTLE_STATUS:
+                    METRICS.counter('attachment.throttled').inc()
+                elif isinstance(exc, (TimeoutError, concurrent.futures.TimeoutError)):
+                    METRICS.counter('attachment.timeouts').inc()
+
+                # Only overload signals (throttling, timeouts, connection errors) reduce the concurrency limit; e.g. - a
+                # missing attachment (404) says nothing about the server's load.
+                retryable = self.is_retryable(exc)
+                if retryable:
+                    self.on_failure()
+
+                if attempt >= self.max_retries or not retryable:
+                    raise DownloadFailed(f"{getattr(attachment, 'filename', attachment)}: {exc!r}") from exc
+
+                delay = self.backoff_delay(attempt, exc)
+                METRICS.counter('attachment.retries').inc()
+                self.log.warning(f"{getattr(attachment, 'filename', attachment)}: Download failed ({exc!r}); "
+                                 f"retry {attempt + 1}/{self.max_retries} in {delay:0.2f} secs.")
+                time.sleep(delay)
+            else:
+                self.on_success(latency)
+                return content
+
+    def summary(self) -> dict:
+        """
+        Describe the concurrency the controller settled on (also recorded in the run metrics).
+        """
+        return {
+            'settled_concurrency': int(self.limit),
+            'peak_concurrency': int(self.peak_limit),
+            'lowest_concurrency': int(self.low_limit),
+            'max_concurrency': self.max_concurrency,
+            'latency_p50': self._latency.percentile(50),
+            'latency_p95': self._latency.percentile(95),
+            'hedge_delay': self.hedge_delay,
+        }
+
+    def close(self) -> typing.NoReturn:
+        self._executor.shutdown(wait=False, cancel_futures=True)
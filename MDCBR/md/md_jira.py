@@ -2,15 +2,43 @@ import logging
 import time
 import typing
 
-import jira
+from MDCBR.md.md_records import AttachmentRecord, IssueFieldsRecord, IssueRecord
+from MDCBR.metrics.run_metrics import METRICS
+
+# The jira package (and its requests/oauth dependencies) is imported when connecting, not when this module is loaded.
+if typing.TYPE_CHECKING:
+    import jira
+
+# Number of issues requested per Jira search call.
+SEARCH_PAGE_SIZE = 100
+
+# Issue fields requested in each search.
+SEARCH_FIELDS = 'key, description, attachment, summary, created'
+
+# Issue fields requested in summary-only mode (classification only; no attachments).
+SUMMARY_FIELDS = 'key, summary, description'
+
+# JQL sort orders (the order in which the issues are returned, and processed).
+ISSUE_ORDER = {
+    'default': 'priority DESC, updated DESC',
+    'newest': 'created DESC',
+    'priority': 'priority DESC, created DESC',
+}
+DEFAULT_ISSUE_ORDER = 'default'
+
+# Connections kept per host by the shared (pooled) Jira session; see configure_connection_pool().
+DEFAULT_POOL_SIZE = 16
 
 
 def get_jira_issues(
-        client: jira.JIRA, project: str, query: str, max_results: int,
-        start_date: str, stop_date: str, logger: logging.Logger) -> typing.List[jira.Issue]:
+        client: 'jira.JIRA', project: str, query: str, max_results: int,
+        start_date: str, stop_date: str, logger: logging.Logger,
+        page_size: int = SEARCH_PAGE_SIZE, raw: bool = False,
+        fields: str = SEARCH_FIELDS) -> typing.List['jira.Issue']:
     """
     Query the specified JIRA Project for issues that match JQL query. The routine will measure the time required
-    to gather the data, so the processing performance can be monitored and improved as needed.
+    to gather the data, so the processing performance can be monitored and improved as needed. Results are requested
+    one page at a time; each page is recorded in the run metrics.
 
     Args:
         client: Instantiated Jira Client
@@ -20,9 +48,12 @@ def get_jira_issues(
         start_date: Start date of query (CCYY-MM-DD formatted string)
         stop_date: Stop date of query (CCYY-MM-DD formatted string)
         logger: Logging facility
+        page_size: Number of issues requested per search call.
+        raw: Request the raw JSON search results, and return lightweight IssueRecords (see iter_jira_issue_pages).
+        fields: Issue fields to request (comma-separated).
 
     Returns:
-        List of Jira Issues (jira.Issue)
+        List of Jira Issues (jira.Issue, or md_records.IssueRecord if raw)
 
     """
     start_msg = (f"- Querying JIRA '{project}' project for all issues in 'To Do' in "
@@ -31,8 +62,11 @@ def get_jira_issues(
     logger.info(start_msg)
 
     start_time = time.perf_counter()
-    results = client.search_issues(jql_str=query, maxResults=max_results,
-                                   fields='key, description, attachment, summary')
+    results = []
+    for page in iter_jira_issue_pages(client=client, query=query, max_results=max_results, page_size=page_size,
+                                      raw=raw, fields=fields):
+        results.extend(page)
+    METRICS.histogram('stage.fetch_seconds').observe(time.perf_counter() - start_time)
 
     stop_msg = f" --> Complete. {len(results)} found. ({time.perf_counter() - start_time:0.2f} secs)"
     print(stop_msg)
@@ -41,7 +75,107 @@ def get_jira_issues(
     return results
 
 
-def connect_to_jira(url: str, user: str, password: str, logger: logging.Logger) -> jira.JIRA:
+def iter_jira_issue_pages(
+        client: 'jira.JIRA', query: str, max_results: int, page_size: int = SEARCH_PAGE_SIZE,
+        fields: str = SEARCH_FIELDS, raw: bool = False,
+        start_at: int = 0) -> typing.Iterator[typing.List['jira.Issue']]:
+    """
+    Request the issues matching the JQL query one page at a time; each page is recorded in the run metrics.
+    Pages are requested lazily (as the iterator is consumed), so the caller can process each page as it arrives.
+
+    If raw, the search results are requested as JSON and converted into lightweight IssueRecords (see
+    issue_record_from_json): the jira client does not build its nested resource objects for every field and
+    attachment of every issue. The attachments are downloaded with the client's (shared, pooled) session.
+
+    Args:
+        client: Instantiated Jira Client
+        query: JQL query
+        max_results: Maximum number of results to return.
+        page_size: Number of issues requested per search call.
+        fields: Issue fields to request (comma-separated).
+        raw: Request the raw JSON results, and return md_records.IssueRecords.
+        start_at: Offset of the first issue requested (e.g. - resuming an interrupted run).
+
+    Returns:
+        Iterator of pages (lists of jira.Issue, or md_records.IssueRecord if raw)
+
+    """
+    session = getattr(client, '_session', None)
+    max_results = int(max_results)
+    returned = start_at
+    while returned < max_results:
+        with METRICS.timer('jira.search.page_seconds'):
+            if raw:
+                results = client.search_issues(jql_str=query, startAt=returned,
+                                               maxResults=min(page_size, max_results - returned),
+                                               fields=fields, json_result=True)
+                page = [issue_record_from_json(issue, session=session) for issue in results.get('issues', [])]
+                total = results.get('total', returned + len(page))
+            else:
+                page = client.search_issues(jql_str=query, startAt=returned,
+                                            maxResults=min(page_size, max_results - returned),
+                                            fields=fields)
+                total = getattr(page, 'total', returned + len(page))
+        METRICS.counter('jira.search.pages').inc()
+        METRICS.counter('jira.search.issues').inc(len(page))
+        returned += len(page)
+        if len(page) > 0:
+            yield page
+
+        # Stop on an empty page or once all matching issues have been returned.
+        if len(page) == 0 or returned >= total:
+            break
+
+
+def issue_record_from_json(issue: dict, session: typing.Optional[typing.Any] = None) -> IssueRecord:
+    """
+    Convert an issue from a raw JSON search result into a lightweight IssueRecord (only the fields used by
+    DefectInfo: key, summary, description, created, and the attachments' metadata).
+
+    Args:
+        issue: Issue dictionary (an element of the search result's 'issues' list)
+        session: HTTP session (requests.Session) used to download the attachments (e.g. - the client's session).
+
+    Returns:
+        IssueRecord
+
+    """
+    fields = issue.get('fields') or {}
+    attachments = [AttachmentRecord(filename=attachment.get('filename', ''), size=attachment.get('size'),
+                                    url=attachment.get('content', ''), session=session)
+                   for attachment in fields.get('attachment') or []]
+    return IssueRecord(key=issue['key'], fields=IssueFieldsRecord(
+        summary=fields.get('summary') or '', description=fields.get('description') or '',
+        attachment=attachments, created=fields.get('created') or ''))
+
+
+def configure_connection_pool(client: 'jira.JIRA', pool_size: int = DEFAULT_POOL_SIZE) -> typing.NoReturn:
+    """
+    Size the connection pool of the client's session, so the concurrent attachment downloads (which all use the
+    client's session) reuse pooled connections instead of opening (and discarding) connections beyond the default
+    pool size.
+
+    Args:
+        client: Instantiated Jira Client
+        pool_size: Connections kept per host (at least the number of concurrent downloads).
+
+    Returns:
+        None
+
+    """
+    session = getattr(client, '_session', None)
+    if session is None:
+        return
+    import requests.adapters
+
+    for prefix in ('https://', 'http://'):
+        adapter = session.get_adapter(prefix)
+        retries = getattr(adapter, 'max_retries', 0)
+        session.mount(prefix, requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                                            max_retries=retries))
+
+
+def connect_to_jira(url: str, user: str, password: str, logger: logging.Logger) -> 'jira.JIRA':
     """
     Connects to Jira; tracks timing to connect.
 
@@ -58,6 +192,8 @@ def connect_to_jira(url: str, user: str, password: str, logger: logging.Logger)
     start_msg = "- Connecting to Jira... "
     print(start_msg, end='', flush=True)
     logger.info(start_msg)
+    import jira
+
     start_time = time.perf_counter()
     client = jira.JIRA(url, basic_auth=(user, password))
     stop_msg = f"Connected. ({time.perf_counter() - start_time:0.2f} secs)"
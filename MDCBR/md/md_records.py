@@ -0,0 +1,66 @@
+import typing
+
+
+class AttachmentRecord:
+    """
+    Lightweight attachment record providing the subset of the jira attachment resource used by DefectInfo:
+    filename, size and get() (returns the attachment contents as bytes).
+
+    The contents can be provided directly, loaded on demand by a callable, or downloaded from the content URL with a
+    (shared, pooled) HTTP session.
+    """
+
+    def __init__(self, filename: str, content: typing.Optional[bytes] = None,
+                 loader: typing.Optional[typing.Callable[[], bytes]] = None, size: typing.Optional[int] = None,
+                 url: str = '', session: typing.Optional[typing.Any] = None) -> typing.NoReturn:
+        """
+        :param filename: Attachment filename
+        :param content: Attachment contents (bytes)
+        :param loader: Callable returning the attachment contents (used if content is not provided)
+        :param size: Attachment size in bytes (if known)
+        :param url: Attachment content URL (if known)
+        :param session: HTTP session (requests.Session) used to download the contents from the URL (used if neither
+            content nor loader is provided)
+        """
+        self.filename = filename
+        self.content = content
+        self.loader = loader
+        self.size = len(content) if size is None and content is not None else size
+        self.url = url
+        self.session = session
+
+    def get(self) -> bytes:
+        if self.content is not None:
+            return self.content
+        if self.loader is not None:
+            return self.loader()
+        if self.session is not None and self.url:
+            response = self.session.get(self.url)
+            response.raise_for_status()
+            return response.content
+        return b''
+
+
+class IssueFieldsRecord:
+    """
+    Lightweight issue fields record (the fields requested from Jira: summary, description, attachment, created).
+    """
+
+    def __init__(self, summary: str = '', description: str = '',
+                 attachment: typing.Optional[typing.List[AttachmentRecord]] = None,
+                 created: str = '') -> typing.NoReturn:
+        self.summary = summary
+        self.description = description
+        self.attachment = attachment if attachment is not None else []
+        self.created = created
+
+
+class IssueRecord:
+    """
+    Lightweight issue record providing the subset of jira.Issue used by DefectInfo: key + fields.
+    Used for issues that do not come from the jira client (offline ELF logs, raw JSON searches, synthetic data).
+    """
+
+    def __init__(self, key: str, fields: IssueFieldsRecord) -> typing.NoReturn:
+        self.key = key
+        self.fields = fields
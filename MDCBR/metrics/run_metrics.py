@@ -0,0 +1,218 @@
+import contextlib
+import datetime
+import json
+import random
+import sys
+import threading
+import time
+import typing
+
+
+class Counter:
+    """
+    Monotonically increasing count (e.g. - number of Jira pages, attachment bytes downloaded).
+    """
+
+    def __init__(self, name: str) -> typing.NoReturn:
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: typing.Union[int, float] = 1) -> typing.NoReturn:
+        with self._lock:
+            self.value += amount
+
+    def to_dict(self) -> dict:
+        return {'type': 'counter', 'value': self.value}
+
+
+class Histogram:
+    """
+    Distribution of observed values (e.g. - latency in seconds). Count, sum, min and max are exact; percentiles are
+    computed from a bounded reservoir sample, so memory use is constant regardless of the number of observations.
+    """
+
+    RESERVOIR_SIZE = 4096
+    PERCENTILES = [50, 90, 95, 99]
+
+    def __init__(self, name: str) -> typing.NoReturn:
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._samples = []
+        self._random = random.Random(name)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> typing.NoReturn:
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+            # Reservoir sampling: every observation has an equal chance of being kept.
+            if len(self._samples) < self.RESERVOIR_SIZE:
+                self._samples.append(value)
+            else:
+                index = self._random.randrange(self.count)
+                if index < self.RESERVOIR_SIZE:
+                    self._samples[index] = value
+
+    @property
+    def mean(self) -> typing.Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> typing.Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(percent / 100.0 * (len(samples) - 1))))]
+
+    def to_dict(self) -> dict:
+        data = {'type': 'histogram', 'count': self.count, 'sum': self.total, 'min': self.min, 'max': self.max,
+                'mean': self.mean}
+        for percent in self.PERCENTILES:
+            data[f'p{percent}'] = self.percentile(percent)
+        return data
+
+
+class MetricsRegistry:
+    """
+    Collection of named counters and histograms for a single run. Metrics are created on first use, so instrumented
+    code only needs the metric name.
+
+    Naming convention: <stage>.<what>[.<unit>] - e.g. 'jira.search.page_seconds', 'attachment.download_bytes'.
+    """
+
+    def __init__(self) -> typing.NoReturn:
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = datetime.datetime.now()
+        self._start_time = time.perf_counter()
+
+    def _get(self, name: str, metric_class: type) -> typing.Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, metric_class(name))
+        return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._get(name, Histogram)
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> typing.Iterator[typing.NoReturn]:
+        """
+        Time the enclosed block and record the elapsed seconds in the named histogram.
+
+        Usage:
+            with METRICS.timer('excel.write_seconds'):
+                ...
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - start)
+
+    def reset(self) -> typing.NoReturn:
+        with self._lock:
+            self._metrics = {}
+        self.started = datetime.datetime.now()
+        self._start_time = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'elapsed_seconds': time.perf_counter() - self._start_time,
+            'metrics': dict((name, self._metrics[name].to_dict()) for name in sorted(self._metrics)),
+        }
+
+    def write_report(self, filename: str, **extra: typing.Any) -> str:
+        """
+        Write the JSON run report.
+
+        :param filename: Name of report file.
+        :param extra: Additional top-level report fields (e.g. - query parameters).
+
+        :return: Name of report file
+
+        """
+        report = self.to_dict()
+        report.update(extra)
+        with open(filename, "w") as REPORT:
+            json.dump(report, REPORT, indent=2)
+        return filename
+
+
+class ProgressLine:
+    """
+    Single, continuously updated console line showing progress, throughput and ETA. The instance is callable, so it
+    can be registered as a Defects listener (one call per processed defect).
+    """
+
+    UPDATE_INTERVAL = 0.5
+
+    def __init__(self, total: int, label: str = 'Processing', stream: typing.TextIO = None,
+                 metrics: typing.Optional[MetricsRegistry] = None) -> typing.NoReturn:
+        """
+        :param total: Total number of items expected (0 if unknown).
+        :param label: Text displayed at the start of the line.
+        :param stream: Output stream (default: sys.stdout)
+        :param metrics: Optional registry; if the registry has an 'attachment.download_bytes' counter,
+            the download rate is included in the line.
+        """
+        self.total = total
+        self.label = label
+        self.stream = stream or sys.stdout
+        self.metrics = metrics
+        self.done = 0
+        self._start = time.perf_counter()
+        self._last_update = 0.0
+        self._line_length = 0
+
+    def _write(self, line: str, end: str = '') -> typing.NoReturn:
+        # Pad with spaces to overwrite any remains of a longer previous line.
+        self.stream.write(f"\r{line.ljust(self._line_length)}{end}")
+        self.stream.flush()
+        self._line_length = len(line)
+
+    def update(self, count: int = 1) -> typing.NoReturn:
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last_update >= self.UPDATE_INTERVAL or self.done == self.total:
+            self._last_update = now
+            self._write(self.format_line(now - self._start))
+
+    def __call__(self, *_args: typing.Any) -> typing.NoReturn:
+        self.update()
+
+    def format_line(self, elapsed: float) -> str:
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f"- {self.label}: {self.done}"
+        if self.total:
+            line += f"/{self.total} ({100.0 * self.done / self.total:0.1f}%)"
+        line += f"  {rate:0.1f}/s"
+
+        if self.metrics is not None and elapsed > 0:
+            downloaded = self.metrics.counter('attachment.download_bytes').value
+            line += f"  {downloaded / elapsed / 1024:0.1f} KB/s"
+
+        if self.total and rate > 0:
+            remaining = (self.total - self.done) / rate
+            line += f"  ETA: {datetime.timedelta(seconds=int(remaining))}"
+        return line
+
+    def finish(self) -> typing.NoReturn:
+        self._write(self.format_line(time.perf_counter() - self._start), end='\n')
+
+
+# Default registry for the run. Modules record into this registry; cbr.py writes it as the JSON run report.
+METRICS = MetricsRegistry()
@@ -0,0 +1,309 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import time
+import typing
+
+from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.defects.defects_list import Defects
+from MDCBR.elf.elf_cache import ParsedELFCache
+from MDCBR.elf.elf_compact import CompactELFModel
+from MDCBR.elf.elf_compressed import parse_elf_attachment
+from MDCBR.elf.elf_parser import ELFLogParser
+from MDCBR.md.md_jira import SEARCH_PAGE_SIZE, iter_jira_issue_pages
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+def parse_elf_content(content: str, sections: typing.Optional[typing.Tuple[str, ...]] = None) -> typing.Any:
+    """
+    Parse a downloaded ELF attachment. (Module-level function, so it can be run in a worker process.)
+
+    Args:
+        content: Attachment contents, as returned by DefectInfo.download_elf_attachment()
+        sections: Only return these parsed sections (CompactELFModel), so only they are sent back from the worker.
+
+    Returns:
+        Parsed ELF log model (ELFLogParser, or CompactELFModel if sections are specified)
+
+    """
+    model = parse_elf_attachment(content)
+    return model if sections is None else CompactELFModel.from_model(model, sections)
+
+
+class AsyncDefectPipeline:
+    """
+    Processes the Jira query results as a set of overlapping stages, connected by bounded queues:
+
+        fetch (Jira search pages) -> download (classify + attachment download, thread pool)
+            -> parse (ELF parsing, process pool) -> aggregate (Defects list, listeners, ReportAggregate)
+
+    Each stage starts working as soon as the first item arrives from the previous stage, and a full queue blocks the
+    stage feeding it (backpressure), so memory use is bounded and the total run time approaches the time of the
+    slowest stage, rather than the sum of the stage times.
+
+    Each issue is numbered as it is fetched; the aggregate stage holds back any defect completed ahead of an earlier
+    one, so the defects are added to the list (and passed to the listeners) in query order (e.g. - --order priority).
+
+    Failures follow the DefectInfo policy, so a run gives the same report with or without the pipeline: a defect whose
+    ELF attachment is missing, cannot be downloaded or cannot be parsed is logged and counted (failures, and the
+    pipeline.missing_attachments/download_failures/parse_failures metrics), and is still added to the Defects list
+    and the aggregate (classified from its summary and description), with elf_log_model None. Only an issue that
+    cannot be classified at all is skipped (pipeline.classify_failures).
+    """
+
+    DEFAULT_DOWNLOAD_WORKERS = 8
+    DEFAULT_QUEUE_SIZE = 100
+
+    # End-of-stream marker passed between stages.
+    _DONE = object()
+
+    def __init__(self, client: typing.Any, query: str, max_results: int,
+                 listeners: typing.Iterable[typing.Callable[[DefectInfo], typing.Any]] = (),
+                 download_workers: int = DEFAULT_DOWNLOAD_WORKERS, parse_workers: typing.Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, page_size: int = SEARCH_PAGE_SIZE,
+                 debug: bool = False, download_controller: typing.Optional[typing.Any] = None,
+                 parse_cache: typing.Optional[ParsedELFCache] = None, compact: bool = False,
+                 sections: typing.Optional[typing.Iterable[str]] = None, raw_search: bool = False,
+                 spill_store: typing.Optional[typing.Any] = None) -> typing.NoReturn:
+        """
+        Args:
+            client: Instantiated Jira Client
+            query: JQL query
+            max_results: Maximum number of results to return.
+            listeners: Defects listeners (called with each completed DefectInfo)
+            download_workers: Number of concurrent attachment downloads.
+            parse_workers: Number of ELF parsing processes (Default: number of CPUs)
+            queue_size: Maximum number of items waiting between two stages.
+            page_size: Number of issues requested per Jira search call.
+            debug: Enable debug messaging output.
+            download_controller: AdaptiveDownloadController used for the attachment downloads (limits the number of
+                concurrent downloads to its current limit, which is at most download_workers).
+            parse_cache: ParsedELFCache: identical attachments are parsed once, and the parsed model is shared.
+            compact: Compact defects (see DefectInfo); the workers only return the requested sections.
+            sections: Parsed ELF sections kept in compact mode (Default: DefectInfo.COMPACT_SECTIONS)
+            raw_search: Request the raw JSON search results (lightweight IssueRecords; see md_jira).
+            spill_store: DefectSpillStore: completed defects are spilled to disk once the memory budget is exceeded.
+
+        """
+        self.client = client
+        self.query = query
+        self.max_results = max_results
+        self.listeners = list(listeners)
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.page_size = page_size
+        self.debug = debug
+        self.download_controller = download_controller
+        self.parse_cache = parse_cache
+        self.compact = compact
+        self.raw_search = raw_search
+        self.sections = (tuple(DefectInfo.COMPACT_SECTIONS if sections is None else sections) if compact else None)
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.defects = Defects([], debug=debug, listeners=self.listeners, parse_elf_log=False,
+                               spill_store=spill_store)
+        self.aggregate = ReportAggregate()
+        self.failures = 0
+        self._fetched = 0
+
+        # Attachments being parsed (digest -> parse future), so identical attachments in flight are parsed once.
+        self._parsing = {}
+
+    def run(self) -> typing.Tuple[Defects, ReportAggregate]:
+        """
+        Run the pipeline to completion.
+
+        Returns:
+            Tuple of (Defects list, finalized ReportAggregate)
+
+        """
+        start_time = time.perf_counter()
+        asyncio.run(self._run())
+        METRICS.histogram('stage.pipeline_seconds').observe(time.perf_counter() - start_time)
+        self.log.info(f"Pipeline processed {len(self.defects)} defects ({self.failures} failed). "
+                      f"({time.perf_counter() - start_time:0.3f} secs)")
+        return self.defects, self.aggregate.finalize()
+
+    async def _run(self) -> typing.NoReturn:
+        issue_queue = asyncio.Queue(maxsize=self.queue_size)
+        download_queue = asyncio.Queue(maxsize=self.queue_size)
+        parsed_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # Fetch + downloads are I/O bound (threads); parsing is CPU bound (processes).
+        io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.download_workers + 1,
+                                                            thread_name_prefix='pipeline_io')
+        parse_count = self.parse_workers or os.cpu_count() or 1
+        parse_executor = concurrent.futures.ProcessPoolExecutor(max_workers=parse_count)
+
+        stages = [
+            asyncio.create_task(self._run_stage(
+                [self._fetch(issue_queue, io_executor)], issue_queue, self.download_workers)),
+            asyncio.create_task(self._run_stage(
+                [self._download(issue_queue, download_queue, io_executor) for _ in range(self.download_workers)],
+                download_queue, parse_count)),
+            asyncio.create_task(self._run_stage(
+                [self._parse(download_queue, parsed_queue, parse_executor) for _ in range(parse_count)],
+                parsed_queue, 1)),
+            asyncio.create_task(self._aggregate(parsed_queue)),
+        ]
+
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            io_executor.shutdown(wait=False, cancel_futures=True)
+            parse_executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run_stage(self, workers: typing.List[typing.Awaitable], output: asyncio.Queue,
+                         consumers: int) -> typing.NoReturn:
+        """
+        Run a stage's workers to completion, then signal the end of the stream to each consumer of the next stage.
+        """
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await output.put(self._DONE)
+
+    def _failed(self, defect_id: str, metric: str, msg: str) -> typing.NoReturn:
+        """
+        Record a defect whose ELF log could not be loaded (or that could not be classified).
+        """
+        self.failures += 1
+        METRICS.counter(metric).inc()
+        self.log.error(f"{defect_id}: {msg}")
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, item: typing.Any, name: str) -> typing.NoReturn:
+        METRICS.histogram(f'pipeline.{name}_queue_depth').observe(queue.qsize())
+        await queue.put(item)
+
+    async def _fetch(self, output: asyncio.Queue, executor: concurrent.futures.Executor) -> typing.NoReturn:
+        """
+        Stage 1: Request the Jira search pages (in a thread) and queue each issue.
+        """
+        loop = asyncio.get_running_loop()
+        pages = iter_jira_issue_pages(client=self.client, query=self.query, max_results=self.max_results,
+                                      page_size=self.page_size, raw=self.raw_search)
+        while True:
+            page = await loop.run_in_executor(executor, next, pages, None)
+            if page is None:
+                break
+            for issue in page:
+                await self._put(output, (self._fetched, issue), 'issue')
+                self._fetched += 1
+
+    def _classify_and_download(self, issue: typing.Any) -> typing.Tuple[DefectInfo, typing.Optional[str],
+                                                                       typing.Optional[Exception]]:
+        """
+        Classify an issue and download its ELF attachment.
+
+        Returns:
+            Tuple of (DefectInfo, attachment contents ('' if there is no ELF attachment; None if the download
+            failed), download error)
+
+        """
+        defect = DefectInfo(issue, debug=self.debug, parse_elf_log=False,
+                            download_controller=self.download_controller, compact=self.compact,
+                            sections=self.sections)
+        try:
+            content = defect.download_elf_attachment()
+        except Exception as exc:
+            return defect, None, exc
+
+        # Hash the attachment here (in a download thread), rather than in the event loop.
+        if self.parse_cache is not None and content != '':
+            defect.attachment_digest = self.parse_cache.digest(content)
+        return defect, content, None
+
+    async def _download(self, source: asyncio.Queue, output: asyncio.Queue,
+                        executor: concurrent.futures.Executor) -> typing.NoReturn:
+        """
+        Stage 2: Classify each issue and download its ELF attachment (in a thread).
+        """
+        loop = asyncio.get_running_loop()
+        while (item := await source.get()) is not self._DONE:
+            index, issue = item
+            try:
+                with METRICS.timer('pipeline.download.busy_seconds'):
+                    defect, content, error = await loop.run_in_executor(executor, self._classify_and_download, issue)
+            except Exception as exc:
+                self._failed(issue.key, 'pipeline.classify_failures', f"Unable to classify the defect: {exc!r}")
+                defect = content = None
+            else:
+                if error is not None:
+                    self._failed(defect.defect_id, 'pipeline.download_failures',
+                                 f"Unable to download the ELF attachment: {error!r}")
+            await self._put(output, (index, defect, content), 'download')
+
+    async def _parse(self, source: asyncio.Queue, output: asyncio.Queue,
+                     executor: concurrent.futures.Executor) -> typing.NoReturn:
+        """
+        Stage 3: Parse each downloaded ELF attachment (in a worker process).
+        """
+        loop = asyncio.get_running_loop()
+        while (item := await source.get()) is not self._DONE:
+            index, defect, content = item
+            if defect is None or content is None:
+                # Not classified, or the download failed (already recorded).
+                pass
+            elif content == '':
+                self._failed(defect.defect_id, 'pipeline.missing_attachments', "No ELF attachment found.")
+            else:
+                try:
+                    with METRICS.timer('pipeline.parse.busy_seconds'):
+                        if defect.attachment_digest is None:
+                            defect.elf_log_model = await loop.run_in_executor(
+                                executor, parse_elf_content, content, self.sections)
+                        else:
+                            defect.elf_log_model = await self._parse_shared(defect, content, loop, executor)
+                except Exception as exc:
+                    self._failed(defect.defect_id, 'pipeline.parse_failures', f"Unable to parse the ELF log: {exc!r}")
+
+            # Every issue is passed on (None: not classified), so the aggregate stage does not wait for it.
+            await self._put(output, (index, defect), 'parsed')
+
+    async def _parse_shared(self, defect: DefectInfo, content: str, loop: asyncio.AbstractEventLoop,
+                            executor: concurrent.futures.Executor) -> ELFLogParser:
+        """
+        Get the shared model for a defect's attachment: from the parse cache, from a parse of the same attachment
+        already in progress, or by parsing the attachment (in a worker process).
+        """
+        digest = defect.attachment_digest
+        model = self.parse_cache.get(digest)
+        if model is None:
+            pending = self._parsing.get(digest)
+            if pending is not None:
+                model = await pending
+            else:
+                pending = self._parsing[digest] = loop.run_in_executor(
+                    executor, parse_elf_content, content, self.sections)
+                try:
+                    model = self.parse_cache.put(digest, await pending)
+                finally:
+                    del self._parsing[digest]
+        self.parse_cache.record(digest, defect.defect_id)
+        return model
+
+    async def _aggregate(self, source: asyncio.Queue) -> typing.NoReturn:
+        """
+        Stage 4: Add each completed defect to the Defects list (notifying the listeners) and the report aggregate, in
+        query order: defects completed ahead of an earlier defect are held until it has been added.
+        """
+        held = {}
+        next_index = 0
+        while (item := await source.get()) is not self._DONE:
+            index, defect = item
+            held[index] = defect
+            METRICS.histogram('pipeline.held_defects').observe(len(held) - 1)
+            with METRICS.timer('pipeline.aggregate.busy_seconds'):
+                while next_index in held:
+                    defect = held.pop(next_index)
+                    next_index += 1
+                    if defect is not None:
+                        self.defects.add_defect(defect)
+                        self.aggregate.add_defect(defect)
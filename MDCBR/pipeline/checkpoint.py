@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+import typing
+
+from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.defects.defects_list import Defects
+from MDCBR.md.md_jira import SEARCH_PAGE_SIZE, iter_jira_issue_pages
+from MDCBR.metrics.run_metrics import METRICS
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+class RunCheckpoint:
+    """
+    On-disk checkpoint of a long run: the progress through the Jira search pages, and the completed (parsed)
+    defects. A run that is interrupted can be resumed from its last checkpoint, without querying the completed pages
+    or downloading and parsing the completed attachments again.
+
+    Checkpoint directory:
+        progress.json:   query, offset of the first incomplete search page, size of the completed defects file
+                         (replaced atomically each time the checkpoint is saved)
+        defects.pickle:  completed defects, appended one pickle at a time (anything written after the last saved
+                         checkpoint is discarded on resume)
+    """
+
+    PROGRESS_FILE = 'progress.json'
+    DEFECTS_FILE = 'defects.pickle'
+
+    # Completed defects between checkpoints (a checkpoint is also saved after each search page).
+    DEFAULT_INTERVAL = 50
+
+    def __init__(self, directory: str, query: str, interval: int = DEFAULT_INTERVAL) -> typing.NoReturn:
+        """
+        :param directory: Checkpoint directory (created if it does not exist).
+        :param query: JQL query of the run (a checkpoint can only be resumed by the same query).
+        :param interval: Number of completed defects between checkpoints.
+        """
+        self.directory = directory
+        self.query = query
+        self.interval = max(1, interval)
+        self.start_at = 0
+        self.completed = set()
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._progress_file = os.path.join(directory, self.PROGRESS_FILE)
+        self._defects_file = os.path.join(directory, self.DEFECTS_FILE)
+        self._file = None
+        self._unsaved = 0
+
+    def exists(self) -> bool:
+        """
+        :return: True if a saved checkpoint exists in the checkpoint directory.
+        """
+        return os.path.exists(self._progress_file)
+
+    def start(self) -> typing.NoReturn:
+        """
+        Start a new checkpoint (any existing checkpoint in the directory is discarded).
+
+        :return: None
+
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.start_at = 0
+        self.completed = set()
+        self._file = open(self._defects_file, 'wb')
+        self.save()
+
+    def restore(self) -> typing.List[DefectInfo]:
+        """
+        Load the last saved checkpoint, and continue writing to it.
+
+        :raises: CheckpointMismatch: The checkpoint was saved by a different query.
+
+        :return: List of the completed defects (in completion order).
+
+        """
+        with open(self._progress_file, 'r', encoding='utf8') as PROGRESS:
+            progress = json.load(PROGRESS)
+        if progress['query'] != self.query:
+            raise CheckpointMismatch(f"Checkpoint '{self.directory}' was saved by a different query: "
+                                     f"{progress['query']}")
+
+        defects = []
+        with open(self._defects_file, 'rb') as DEFECTS:
+            while DEFECTS.tell() < progress['defects_bytes']:
+                defects.append(pickle.load(DEFECTS))
+
+        # Discard the defects written after the last saved checkpoint; they are processed again.
+        self._file = open(self._defects_file, 'r+b')
+        self._file.truncate(progress['defects_bytes'])
+        self._file.seek(progress['defects_bytes'])
+
+        self.start_at = progress['start_at']
+        self.completed = set(defect.defect_id for defect in defects)
+        METRICS.counter('checkpoint.restored_defects').inc(len(defects))
+        self.log.info(f"Restored {len(defects)} defects from checkpoint '{self.directory}' "
+                      f"(resuming at search offset {self.start_at}).")
+        return defects
+
+    def add(self, defect: DefectInfo) -> typing.NoReturn:
+        """
+        Record a completed defect; the checkpoint is saved every 'interval' defects.
+
+        :param defect: Completed DefectInfo (ELF log loaded)
+
+        :return: None
+
+        """
+        pickle.dump(defect, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.completed.add(defect.defect_id)
+        self._unsaved += 1
+        if self._unsaved >= self.interval:
+            self.save()
+
+    def page_complete(self, start_at: int) -> typing.NoReturn:
+        """
+        Record the progress through the search pages, and save the checkpoint.
+
+        :param start_at: Search offset of the next page.
+
+        :return: None
+
+        """
+        self.start_at = start_at
+        self.save()
+
+    def save(self) -> typing.NoReturn:
+        """
+        Save the checkpoint: the completed defects are flushed to disk, then the progress file is replaced atomically.
+
+        :return: None
+
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        progress = {'query': self.query, 'start_at': self.start_at, 'defects': len(self.completed),
+                    'defects_bytes': self._file.tell(), 'saved': time.time()}
+
+        temp_file = f"{self._progress_file}.tmp"
+        with open(temp_file, 'w', encoding='utf8') as PROGRESS:
+            json.dump(progress, PROGRESS)
+        os.replace(temp_file, self._progress_file)
+        self._unsaved = 0
+        METRICS.counter('checkpoint.saves').inc()
+
+    def close(self) -> typing.NoReturn:
+        if self._file is not None and not self._file.closed:
+            self.save()
+            self._file.close()
+
+    def remove(self) -> typing.NoReturn:
+        """
+        Remove the checkpoint (e.g. - once the run has completed).
+
+        :return: None
+
+        """
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CheckpointedDefectFetcher:
+    """
+    Query, download and parse the defects one search page at a time, saving a RunCheckpoint as the defects are
+    completed. When resumed, the completed defects are restored from the checkpoint (and passed to the listeners
+    again, in their original order, so the outputs are rebuilt), and the query continues from the first incomplete
+    page. Issues already restored from the checkpoint are skipped.
+
+    Provided the query results have not changed, a resumed run produces the same defects (and reports) as an
+    uninterrupted run.
+    """
+
+    def __init__(self, client: typing.Any, query: str, max_results: int, checkpoint: RunCheckpoint,
+                 resume: bool = False, listeners: typing.Iterable[typing.Callable[[DefectInfo], typing.Any]] = (),
+                 workers: int = Defects.DEFAULT_PREFETCH_WORKERS, page_size: int = SEARCH_PAGE_SIZE,
+                 debug: bool = False, download_controller: typing.Optional[typing.Any] = None,
+                 parse_cache: typing.Optional[typing.Any] = None, compact: bool = False,
+                 sections: typing.Optional[typing.Iterable[str]] = None, raw_search: bool = False,
+                 spill_store: typing.Optional[typing.Any] = None) -> typing.NoReturn:
+        """
+        Args:
+            client: Instantiated Jira Client
+            query: JQL query
+            max_results: Maximum number of issues returned.
+            checkpoint: RunCheckpoint (for the same query)
+            resume: Resume from the saved checkpoint (if one exists); otherwise a new checkpoint is started.
+            listeners: Defects listeners (called with each completed DefectInfo, in order)
+            workers: Number of concurrent attachment downloads/parses.
+            page_size: Number of issues requested per search call.
+            debug: Enable debug messaging output.
+            download_controller: AdaptiveDownloadController used for the attachment downloads.
+            parse_cache: ParsedELFCache: identical attachments are parsed once (restored defects are recorded too).
+            compact: Compact defects (see DefectInfo).
+            sections: Parsed ELF sections kept in compact mode.
+            raw_search: Request the raw JSON search results (lightweight IssueRecords; see md_jira).
+            spill_store: DefectSpillStore: completed defects are spilled to disk once the memory budget is exceeded.
+
+        """
+        self.client = client
+        self.query = query
+        self.max_results = int(max_results)
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.workers = workers
+        self.page_size = page_size
+        self.debug = debug
+        self.download_controller = download_controller
+        self.parse_cache = parse_cache
+        self.compact = compact
+        self.sections = sections
+        self.raw_search = raw_search
+        self.restored = 0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.defects = Defects([], debug=debug, listeners=listeners, parse_elf_log=False, spill_store=spill_store)
+
+    def run(self) -> Defects:
+        """
+        Process the query (resuming from the checkpoint, if requested).
+
+        Returns:
+            Defects list (restored and newly processed defects)
+
+        """
+        if self.resume and self.checkpoint.exists():
+            for defect in self.checkpoint.restore():
+                self._restore_defect(defect)
+            self.restored = len(self.defects)
+        else:
+            self.checkpoint.start()
+
+        start_at = self.checkpoint.start_at
+        for page in iter_jira_issue_pages(client=self.client, query=self.query, start_at=start_at,
+                                          max_results=self.max_results, page_size=self.page_size,
+                                          raw=self.raw_search):
+            start_at += len(page)
+            pending = [issue for issue in page if issue.key not in self.checkpoint.completed]
+            METRICS.counter('checkpoint.skipped_issues').inc(len(page) - len(pending))
+
+            page_defects = Defects(pending, debug=self.debug, download_controller=self.download_controller,
+                                   parse_cache=self.parse_cache, compact=self.compact, sections=self.sections,
+                                   defer_elf_log=True)
+            for defect in page_defects.iter_prefetched(workers=self.workers):
+                self.defects.add_defect(defect)
+                self.checkpoint.add(defect)
+            self.checkpoint.page_complete(start_at)
+
+        self.checkpoint.close()
+        return self.defects
+
+    def _restore_defect(self, defect: DefectInfo) -> typing.NoReturn:
+        """
+        Add a defect restored from the checkpoint: its attachment is recorded in (and its model shared through) the
+        parse cache, as if it had been downloaded in this run.
+        """
+        if self.parse_cache is not None and defect.attachment_digest is not None:
+            defect.elf_log_model = self.parse_cache.put(defect.attachment_digest, defect.elf_log_model)
+            self.parse_cache.record(defect.attachment_digest, defect.defect_id)
+        self.defects.add_defect(defect)
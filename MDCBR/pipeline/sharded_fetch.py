@@ -0,0 +1,196 @@
+from collections import namedtuple
+import concurrent.futures
+import datetime
+import logging
+import threading
+import time
+import typing
+
+from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.defects.defects_list import Defects
+from MDCBR.md.md_jira import DEFAULT_ISSUE_ORDER, ISSUE_ORDER, SEARCH_PAGE_SIZE, iter_jira_issue_pages
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+# A single query shard: one project, one created date range (start inclusive; stop exclusive, unless last).
+QueryShard = namedtuple('QueryShard', ['project', 'start', 'stop', 'last'])
+
+
+def build_shards(projects: typing.Iterable[str], start_date: str, stop_date: str,
+                 shard_days: typing.Optional[int] = None) -> typing.List[QueryShard]:
+    """
+    Split a created date range (and a list of projects) into query shards.
+
+    Args:
+        projects: Jira projects
+        start_date: Start of the created date range (CCYY-MM-DD)
+        stop_date: End of the created date range (CCYY-MM-DD)
+        shard_days: Number of days per shard. None = one shard per project (the whole range).
+
+    Returns:
+        List of QueryShard tuples: consecutive shards of a project do not overlap.
+
+    """
+    start = datetime.date.fromisoformat(start_date)
+    stop = datetime.date.fromisoformat(stop_date)
+    step = datetime.timedelta(days=shard_days) if shard_days else stop - start + datetime.timedelta(days=1)
+
+    shards = []
+    for project in projects:
+        shard_start = start
+        while True:
+            shard_stop = shard_start + step
+            if shard_stop >= stop:
+                shards.append(QueryShard(project=project, start=shard_start.isoformat(), stop=stop.isoformat(),
+                                         last=True))
+                break
+            shards.append(QueryShard(project=project, start=shard_start.isoformat(), stop=shard_stop.isoformat(),
+                                     last=False))
+            shard_start = shard_stop
+    return shards
+
+
+def shard_query(shard: QueryShard, statuses: typing.List[str], order: str = DEFAULT_ISSUE_ORDER) -> str:
+    """
+    Build the JQL query for a shard (same criteria and order as the unsharded query).
+
+    Args:
+        shard: QueryShard
+        statuses: Issue statuses (JQL quoted, e.g. - '"To Do"')
+        order: Issue order (ISSUE_ORDER key; see md_jira)
+
+    Returns:
+        JQL query
+
+    """
+    stop_clause = f'created <= {shard.stop}' if shard.last else f'created < {shard.stop}'
+    return (f'project = {shard.project} '
+            f'AND status in ({",".join(statuses)}) '
+            f'AND created >= {shard.start} '
+            f'AND {stop_clause} '
+            f'ORDER BY {ISSUE_ORDER[order]}')
+
+
+class ShardedDefectFetcher:
+    """
+    Fetch and process several query shards (date ranges and/or projects) in parallel, instead of one large query.
+    The shards share the Jira client (connection pool), the attachment download controller and the parsed ELF log
+    cache. Each shard builds its own aggregate; the shard aggregates are merged into one report aggregate.
+
+    An issue returned by more than one shard (e.g. - overlapping projects, or an issue updated while the shards are
+    running) is only processed once: the first shard to return it claims the issue key.
+    """
+
+    DEFAULT_SHARD_WORKERS = 4
+
+    def __init__(self, client: typing.Any, shards: typing.Sequence[QueryShard], statuses: typing.List[str],
+                 max_results: int, workers: int = DEFAULT_SHARD_WORKERS,
+                 listeners: typing.Iterable[typing.Callable[[DefectInfo], typing.Any]] = (),
+                 page_size: int = SEARCH_PAGE_SIZE, debug: bool = False,
+                 download_controller: typing.Optional[typing.Any] = None,
+                 parse_cache: typing.Optional[typing.Any] = None, compact: bool = False,
+                 sections: typing.Optional[typing.Iterable[str]] = None, raw_search: bool = False,
+                 order: str = DEFAULT_ISSUE_ORDER,
+                 spill_store: typing.Optional[typing.Any] = None) -> typing.NoReturn:
+        """
+        Args:
+            client: Instantiated Jira Client (shared by all shards)
+            shards: Query shards (see build_shards); the shards are started in this order.
+            statuses: Issue statuses (JQL quoted, e.g. - '"To Do"')
+            max_results: Maximum number of issues returned per shard.
+            workers: Number of shards processed concurrently.
+            listeners: Defects listeners (called with each completed DefectInfo, one call at a time)
+            page_size: Number of issues requested per search call.
+            debug: Enable debug messaging output.
+            download_controller: AdaptiveDownloadController used for the attachment downloads (shared).
+            parse_cache: ParsedELFCache (shared): identical attachments are parsed once.
+            compact: Compact defects (see DefectInfo).
+            sections: Parsed ELF sections kept in compact mode.
+            raw_search: Request the raw JSON search results (lightweight IssueRecords; see md_jira).
+            order: Issue order within each shard (ISSUE_ORDER key; see md_jira)
+            spill_store: DefectSpillStore: completed defects are spilled to disk once the memory budget is exceeded.
+
+        """
+        self.client = client
+        self.shards = list(shards)
+        self.statuses = statuses
+        self.max_results = max_results
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.debug = debug
+        self.download_controller = download_controller
+        self.parse_cache = parse_cache
+        self.compact = compact
+        self.sections = sections
+        self.raw_search = raw_search
+        self.order = order
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.defects = Defects([], debug=debug, listeners=listeners, parse_elf_log=False, spill_store=spill_store)
+        self.shard_results = []
+        self._claimed = set()
+        self._lock = threading.Lock()
+
+    def run(self) -> typing.Tuple[Defects, ReportAggregate]:
+        """
+        Process all shards.
+
+        Returns:
+            Tuple of (Defects list, merged and finalized ReportAggregate)
+
+        """
+        start_time = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shard') as executor:
+            aggregates = list(executor.map(self._run_shard, self.shards))
+
+        aggregate = ReportAggregate()
+        for shard_aggregate in aggregates:
+            aggregate.merge(shard_aggregate)
+
+        METRICS.histogram('stage.sharded_fetch_seconds').observe(time.perf_counter() - start_time)
+        self.log.info(f"Processed {len(self.shards)} shards: {len(self.defects)} defects. "
+                      f"({time.perf_counter() - start_time:0.3f} secs)")
+        return self.defects, aggregate.finalize()
+
+    def _claim(self, key: str) -> bool:
+        with self._lock:
+            if key in self._claimed:
+                return False
+            self._claimed.add(key)
+            return True
+
+    def _run_shard(self, shard: QueryShard) -> ReportAggregate:
+        """
+        Query, download and parse a single shard.
+        """
+        start_time = time.perf_counter()
+        query = shard_query(shard, self.statuses, order=self.order)
+        aggregate = ReportAggregate()
+        returned = duplicates = 0
+
+        for page in iter_jira_issue_pages(client=self.client, query=query, max_results=self.max_results,
+                                          page_size=self.page_size, raw=self.raw_search):
+            for issue in page:
+                returned += 1
+                if not self._claim(issue.key):
+                    duplicates += 1
+                    continue
+
+                defect = DefectInfo(issue, debug=self.debug, download_controller=self.download_controller,
+                                    parse_cache=self.parse_cache, compact=self.compact, sections=self.sections)
+                aggregate.add_defect(defect)
+
+                # The listeners (corpus writers, progress) are called one defect at a time.
+                with self._lock:
+                    self.defects.add_defect(defect)
+
+        elapsed = time.perf_counter() - start_time
+        METRICS.counter('shard.count').inc()
+        METRICS.counter('shard.duplicate_issues').inc(duplicates)
+        METRICS.histogram('shard.seconds').observe(elapsed)
+        with self._lock:
+            self.shard_results.append({'project': shard.project, 'start': shard.start, 'stop': shard.stop,
+                                       'issues': returned, 'duplicates': duplicates, 'seconds': round(elapsed, 3)})
+        self.log.info(f"Shard {shard.project} {shard.start} - {shard.stop}: {returned} issues, "
+                      f"{duplicates} duplicates. ({elapsed:0.3f} secs)")
+        return aggregate
@@ -0,0 +1,219 @@
+import datetime
+import logging
+import threading
+import time
+import typing
+
+from MDCBR.defects.defect_info import DefectInfo
+from MDCBR.defects.defects_list import Defects
+from MDCBR.md.md_jira import SEARCH_FIELDS, iter_jira_issue_pages
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+class DefectWatcher:
+    """
+    Long-running watch mode: keeps the parsed defects and their aggregate in memory, and polls Jira for the issues
+    updated since the previous poll. Only the differences are applied:
+
+        * New issues are classified, downloaded and parsed.
+        * Updated issues are re-processed only if the summary, description or attachments changed.
+        * Issues that no longer match the query (e.g. - moved out of the watched statuses) are removed.
+
+    The on_change callback (e.g. - regenerate the XLSX report and corpus) is only called when the aggregate
+    actually changes.
+    """
+
+    DEFAULT_POLL_INTERVAL = 300
+
+    # The 'updated >= ...' JQL clause has minute resolution, and the client and server clocks may differ, so each
+    # poll overlaps the previous one; issues whose 'updated' timestamp has not changed are skipped.
+    POLL_OVERLAP = datetime.timedelta(minutes=2)
+    JQL_TIME_FORMAT = '%Y-%m-%d %H:%M'
+    WATCH_FIELDS = f'{SEARCH_FIELDS}, status, updated'
+
+    def __init__(self, client: typing.Any, project: str, statuses: typing.List[str], start_date: str,
+                 on_change: typing.Callable[[Defects, ReportAggregate], typing.Any],
+                 stop_date: typing.Optional[str] = None, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_results: int = 10000, download_controller: typing.Optional[typing.Any] = None,
+                 debug: bool = False,
+                 sections: typing.Optional[typing.Tuple[str, ...]] = None) -> typing.NoReturn:
+        """
+        Args:
+            client: Instantiated Jira Client
+            project: Target Jira project
+            statuses: Watched issue statuses (JQL quoted, e.g. - '"To Do"')
+            start_date: Start of the created date range (CCYY-MM-DD)
+            on_change: Called with (Defects, ReportAggregate) after the initial load and whenever the aggregate
+                changes.
+            stop_date: End of the created date range (CCYY-MM-DD); None = no end date.
+            poll_interval: Seconds between polls.
+            max_results: Maximum number of issues returned per query.
+            download_controller: AdaptiveDownloadController used for the attachment downloads.
+            debug: Enable debug messaging output.
+            sections: Keep compact defects in memory, with only these parsed ELF sections (see DefectInfo).
+                Default: None (full defects)
+
+        """
+        self.client = client
+        self.project = project
+        self.statuses = statuses
+        self.start_date = start_date
+        self.stop_date = stop_date
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.max_results = max_results
+        self.download_controller = download_controller
+        self.debug = debug
+        self.sections = sections
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.defects = {}
+        self.aggregate = ReportAggregate().finalize()
+        self.last_poll = None
+        self.polls = 0
+        self._updated = {}
+        self._content_keys = {}
+        self._signature = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------------------------------
+    def _base_query(self) -> str:
+        query = f'project = {self.project} AND created >= {self.start_date}'
+        if self.stop_date is not None:
+            query += f' AND created <= {self.stop_date}'
+        return query
+
+    def initial_query(self) -> str:
+        return f'{self._base_query()} AND status in ({",".join(self.statuses)}) ORDER BY updated ASC'
+
+    def update_query(self, since: datetime.datetime) -> str:
+        # No status clause: issues that moved out of the watched statuses must be returned, so they can be removed.
+        return f'{self._base_query()} AND updated >= "{since.strftime(self.JQL_TIME_FORMAT)}" ORDER BY updated ASC'
+
+    def _is_watched(self, issue: typing.Any) -> bool:
+        status = getattr(getattr(issue.fields, 'status', None), 'name', None)
+        return status is None or f'"{status}"' in self.statuses or status in self.statuses
+
+    @staticmethod
+    def _content_key(issue: typing.Any) -> tuple:
+        """
+        The issue fields used to build a DefectInfo; if these have not changed, the defect is not re-processed.
+        """
+        attachments = tuple(sorted((str(getattr(attachment, 'id', '')), attachment.filename,
+                                    getattr(attachment, 'size', None))
+                                   for attachment in (getattr(issue.fields, 'attachment', None) or [])))
+        return issue.fields.summary, issue.fields.description, attachments
+
+    # ------------------------------------------------------------------------------------------------
+    # Polling
+    # ------------------------------------------------------------------------------------------------
+    def poll(self) -> bool:
+        """
+        Query Jira (all watched issues on the first poll; then, the issues updated since the previous poll) and apply
+        the differences. Calls on_change if the aggregate changed.
+
+        Returns:
+            True if the aggregate changed.
+
+        """
+        poll_time = datetime.datetime.now()
+        query = (self.initial_query() if self.last_poll is None else
+                 self.update_query(self.last_poll - self.POLL_OVERLAP))
+        self.log.info(f"Poll {self.polls + 1}: {query}")
+
+        added = updated = removed = unchanged = 0
+        with METRICS.timer('watch.poll_seconds'):
+            for page in iter_jira_issue_pages(client=self.client, query=query, max_results=self.max_results,
+                                              fields=self.WATCH_FIELDS):
+                for issue in page:
+                    key = issue.key
+                    if not self._is_watched(issue):
+                        if self.defects.pop(key, None) is not None:
+                            self._updated.pop(key, None)
+                            self._content_keys.pop(key, None)
+                            removed += 1
+                        continue
+
+                    stamp = getattr(issue.fields, 'updated', None)
+                    content_key = self._content_key(issue)
+                    if key in self.defects and (stamp == self._updated.get(key) or
+                                                content_key == self._content_keys.get(key)):
+                        self._updated[key] = stamp
+                        unchanged += 1
+                        continue
+
+                    if key in self.defects:
+                        updated += 1
+                    else:
+                        added += 1
+                    # The ELF attachment is only downloaded when the outputs need it (results changed).
+                    self.defects[key] = DefectInfo(issue, debug=self.debug, compact=self.sections is not None,
+                                                   sections=self.sections, defer_elf_log=True,
+                                                   download_controller=self.download_controller)
+                    self._updated[key] = stamp
+                    self._content_keys[key] = content_key
+
+        self.last_poll = poll_time
+        self.polls += 1
+        METRICS.counter('watch.polls').inc()
+        METRICS.counter('watch.defects_added').inc(added)
+        METRICS.counter('watch.defects_updated').inc(updated)
+        METRICS.counter('watch.defects_removed').inc(removed)
+        self.log.info(f"Poll {self.polls}: {added} added, {updated} updated, {removed} removed, "
+                      f"{unchanged} unchanged. ({len(self.defects)} defects)")
+
+        if not (added or updated or removed) and self._signature is not None:
+            return False
+
+        # Rebuild the aggregate from the in-memory defects (no re-download or re-parse), and only report if the
+        # results changed (e.g. - an update that does not change the classification is not reported).
+        self.aggregate = ReportAggregate.from_defects(self.defects.values())
+        signature = self.aggregate.signature()
+        if signature == self._signature:
+            return False
+
+        self._signature = signature
+        METRICS.counter('watch.reports').inc()
+        self.on_change(self.get_defects(), self.aggregate)
+        return True
+
+    def get_defects(self) -> Defects:
+        """
+        Returns:
+            Defects list of the current (in-memory) defects.
+        """
+        defects = Defects([], debug=self.debug, parse_elf_log=False)
+        defects.extend(self.defects.values())
+        return defects
+
+    def run(self, max_polls: typing.Optional[int] = None) -> typing.NoReturn:
+        """
+        Poll until stopped (stop() or KeyboardInterrupt), or until max_polls polls have been made. A failed poll is
+        logged and retried at the next interval; the in-memory state is kept.
+
+        Args:
+            max_polls: Maximum number of polls (None = no limit).
+
+        Returns:
+            None
+
+        """
+        while not self._stop.is_set() and (max_polls is None or self.polls < max_polls):
+            start_time = time.perf_counter()
+            try:
+                self.poll()
+            except Exception as exc:
+                METRICS.counter('watch.poll_failures').inc()
+                self.log.exception(f"Poll failed: {exc!r}")
+                if self.last_poll is None:
+                    raise
+
+            if max_polls is not None and self.polls >= max_polls:
+                break
+            self._stop.wait(max(0.0, self.poll_interval - (time.perf_counter() - start_time)))
+
+    def stop(self) -> typing.NoReturn:
+        self._stop.set()
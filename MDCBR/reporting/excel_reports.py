@@ -1,9 +1,13 @@
 import logging
+import time
 import typing
 
 import xlsxwriter
 from xlsxwriter.worksheet import Worksheet
 
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
 
 class ExcelWorkbook:
     """
@@ -57,24 +61,33 @@ class ExcelWorkbook:
         """
         worksheet.freeze_panes(1, 0)
 
-    def build_summary_sheet(self, data_dict: typing.Dict[str, int], name: str = 'Summary') -> typing.NoReturn:
+    def build_summary_sheet(
+            self, data_dict: typing.Union[typing.Dict[str, int], ReportAggregate],
+            name: str = 'Summary') -> typing.NoReturn:
         """
         Build the summary sheet: a list of all exceptions and their relative defect/issue counts.
 
         Args:
-            data_dict: Dictionary from Defects.tally_defect_types()
+            data_dict: ReportAggregate (Defects.build_aggregate()) or dictionary from Defects.tally_defect_types()
             name: Name of worksheet (Default: Summary)
 
         Returns:
             None
 
         """
+        start_time = time.perf_counter()
         exception_header = 'Exception'
         total_count_header = 'Total Count'
         total_header = 'Total'
 
+        # Data sorted by counts, in descending order
+        if isinstance(data_dict, ReportAggregate):
+            tally = list(data_dict.tally().items())
+        else:
+            tally = sorted(data_dict.items(), key=lambda x: x[1], reverse=True)
+
         # Determine which row the data summary will be located and how many rows to total.
-        total_row_num = len(data_dict.keys()) + 1
+        total_row_num = len(tally) + 1
         total_sum_formula = f"=SUM(B1:B{total_row_num})"
 
         wksht = self.workbook.add_worksheet(name=name)
@@ -82,34 +95,40 @@ class ExcelWorkbook:
         # Define the table header and track the size of the various entries per column
         wksht.write(0, 0, exception_header, self.header_cell)
         wksht.write(0, 1, total_count_header, self.header_cell)
-        max_widths = self._find_max_col_widths(col_entries=[exception_header, total_count_header])
+        exc_width = max([len(exception_header), len(total_header)] + [len(exc) for exc, _ in tally])
+        count_width = max([len(total_count_header)] + [len(str(count)) for _, count in tally])
 
-        # Add exceptions and counts (per row). Data sorted by counts, in descending order
-        for row, (exc, issue_count) in enumerate(sorted(data_dict.items(), key=lambda x: x[1], reverse=True), 1):
+        # Add exceptions and counts (per row).
+        for row, (exc, issue_count) in enumerate(tally, 1):
             wksht.write_string(row, 0, exc)
             wksht.write_number(row, 1, issue_count)
-            max_widths = self._find_max_col_widths(col_entries=[exc, issue_count], widths=max_widths)
 
         # Add the summary row
         wksht.write(total_row_num, 0, total_header, self.header_cell)
         wksht.write(total_row_num, 1, total_sum_formula, self.header_cell)
-        max_widths = self._find_max_col_widths(col_entries=[total_header, 'SUM'], widths=max_widths)
 
         # Adjust columns to width of widest entry in column. Freeze the header row.
-        self._set_column_widths(wksht, max_widths)
+        self._set_column_widths(wksht, [exc_width, count_width])
         self.freeze_header_row(worksheet=wksht)
+        METRICS.histogram('excel.summary_sheet_seconds').observe(time.perf_counter() - start_time)
 
-    def build_detailed_table(self, data_dict: typing.Dict[str, dict], name: str = 'Details') -> typing.NoReturn:
+    def build_detailed_table(
+            self, data_dict: typing.Union[typing.Dict[str, dict], ReportAggregate],
+            name: str = 'Details') -> typing.NoReturn:
         """
         Build a detailed report worksheet of the issues.
 
         Args:
-            data_dict: Dictionary - DefectList.build_reporting_dict()
+            data_dict: ReportAggregate (Defects.build_aggregate()) or dictionary - DefectList.build_reporting_dict()
             name: Name of worksheet (default: Details)
 
         Returns:
             None
         """
+        start_time = time.perf_counter()
+        aggregate = (data_dict if isinstance(data_dict, ReportAggregate) else
+                     ReportAggregate.from_reporting_dict(data_dict))
+        aggregate.finalize()
 
         # Column header values
         exception_header = 'Exception'
@@ -121,7 +140,6 @@ class ExcelWorkbook:
         # For some columns, the entries can be very long (e.g. - descriptions), so an override is specified.
         # If the maximum entry length of a given column exceeds the override value,
         # set the corresponding maximum to the override value. (-1 means no override set).
-        # NOTE: if the column order is changed, please refer to the debugging note lower in this routine.
         defect_list_column_width = 100
         column_info = {
             exception_header: -1,
@@ -133,73 +151,152 @@ class ExcelWorkbook:
 
         wksht = self.workbook.add_worksheet(name=name)
 
-        # Determine the column names and the corresponding width overrides.
+        # Determine the column names, indices and the corresponding width overrides.
         columns = list(column_info.keys())
         max_width_overrides = list(column_info.values())
-
-        max_widths = self._find_max_col_widths(col_entries=columns, overrides=max_width_overrides)
+        exception_col = columns.index(exception_header)
+        summary_col = columns.index(summary_header)
+        defect_count_col = columns.index(defect_count_header)
+        version_col = columns.index(version_header)
+        defect_ids_col = columns.index(defect_ids_header)
 
         # Define headers
+        wksht.set_row(0, None, self.bold)
         for col_index, col_name in enumerate(columns, 0):
-            wksht.set_row(0, None, self.bold)
             wksht.write_string(0, col_index, col_name)
 
         # For each exception... (sorted based on number of defects, in descending order)
         row_index = 1
-        for exc_name, exc_dict in sorted(
-                data_dict.items(),
-                key=lambda x: sum([len(def_ids) for defect in x[1].keys()
-                                   for ver in x[1][defect].keys()
-                                   for def_ids in x[1][defect][ver]]),
-                reverse=True):
-
-            # Save the exception parent row - used to add sum of issues associated with exception to the same row.
-            parent_exc_row = row_index
-            total_exc_defect_counts = 0
-
-            # Record exception
+        for exc_entry in aggregate.exceptions:
+
+            # Record exception and the total issue count for the exception on the same row.
             wksht.set_row(row_index, None, self.grey_row)
-            wksht.write_string(row_index, columns.index(exception_header), exc_name)
+            wksht.write_string(row_index, exception_col, exc_entry.exception_type)
+            wksht.write_number(row_index, defect_count_col, exc_entry.count)
             row_index += 1
 
-            # Add Summary (generalized description)
-            for summary, exc_details_dict in sorted(
-                    exc_dict.items(), key=lambda x: sum([len(x[1][ver]) for ver in x[1].keys()]), reverse=True):
-                wksht.write_string(row_index, columns.index(summary_header), summary)
+            # Add Summary (generalized description), sorted by number of defects
+            for msg_entry in exc_entry.messages:
+                wksht.write_string(row_index, summary_col, str(msg_entry.message))
 
-                # Add version, Defect ID, and Defect Count data; sorted by version
+                # Add version, Defect ID, and Defect Count data; sorted by version (newest first)
                 # Each unique version will be put on a separate row
-                for version, defect_ids_list in sorted(exc_details_dict.items(), key=lambda x: len(x[0]), reverse=True):
-                    wksht.write_string(row_index, columns.index(version_header), version)
-                    wksht.write_string(row_index, columns.index(defect_ids_header), ", ".join(defect_ids_list))
-                    wksht.write_number(row_index, columns.index(defect_count_header), len(defect_ids_list))
-                    total_exc_defect_counts += len(defect_ids_list)
-
-                    # =========================================================================================
-                    # DEBUGGING NOTE
-                    # =========================================================================================
-                    # If the column widths are off... check that the parameter list (below) is in the correct
-                    # order as defined in the column_info dictionary at the top of this routine.
-                    # If the column order is changed, the list in this call needs to be updated to match.
-                    # =========================================================================================
-                    max_widths = self._find_max_col_widths(
-                        [exc_name, summary, str(len(defect_ids_list)), version, "-" * defect_list_column_width],
-                        widths=max_widths, overrides=max_width_overrides)
+                for ver_entry in msg_entry.versions:
+                    wksht.write_string(row_index, version_col, ver_entry.version)
+                    wksht.write_string(row_index, defect_ids_col, ", ".join(ver_entry.defect_ids))
+                    wksht.write_number(row_index, defect_count_col, ver_entry.count)
                     row_index += 1
 
-            # Add the total issue count for the exception to the same row as the exception entry.
-            wksht.write_number(parent_exc_row, columns.index(defect_count_header), total_exc_defect_counts)
             row_index += 1
 
         # Add a note about the <defect_id>* notation
-        wksht.write_string(row_index, columns.index(summary_header),
+        wksht.write_string(row_index, summary_col,
                            "NOTE: '*' next to the defect id indicates additional user input found in the description.",
                            self.bold)
 
-        # Adjust the columns based on the widest entry per column; freeze the header row.
+        # Adjust the columns based on the widest entry per column (tracked by the aggregate); freeze the header row.
+        widest_entries = [None] * len(columns)
+        widest_entries[exception_col] = "-" * aggregate.max_exception_len
+        widest_entries[summary_col] = "-" * aggregate.max_message_len
+        widest_entries[defect_count_col] = str(aggregate.total_count)
+        widest_entries[version_col] = "-" * aggregate.max_version_len
+        widest_entries[defect_ids_col] = "-" * defect_list_column_width
+
+        max_widths = self._find_max_col_widths(col_entries=columns, overrides=max_width_overrides)
+        max_widths = self._find_max_col_widths(widest_entries, widths=max_widths, overrides=max_width_overrides)
+        self._set_column_widths(wksht, max_widths)
+        self.freeze_header_row(worksheet=wksht)
+        METRICS.histogram('excel.details_sheet_seconds').observe(time.perf_counter() - start_time)
+
+    def build_stack_groups_sheet(
+            self, call_stacks: typing.Dict[str, typing.List[str]], name: str = 'Call Stacks') -> typing.NoReturn:
+        """
+        Build a worksheet of the defects grouped by identical call stack (ELFAnalysis.perform_stack_trace_assessment).
+
+        Args:
+            call_stacks: Dictionary of call stack string -> list of defect ids
+            name: Name of worksheet (default: Call Stacks)
+
+        Returns:
+            None
+
+        """
+        start_time = time.perf_counter()
+        self._build_defect_groups_sheet(call_stacks, name=name, key_column='Call Stack', key_width=150)
+        METRICS.histogram('excel.stack_groups_sheet_seconds').observe(time.perf_counter() - start_time)
+
+    def build_duplicate_attachments_sheet(
+            self, duplicates: typing.Dict[str, typing.List[str]],
+            name: str = 'Duplicate ELF Logs') -> typing.NoReturn:
+        """
+        Build a worksheet of the defects with identical ELF attachments (ParsedELFCache.duplicates).
+
+        Args:
+            duplicates: Dictionary of attachment hash -> list of defect ids
+            name: Name of worksheet (default: Duplicate ELF Logs)
+
+        Returns:
+            None
+
+        """
+        start_time = time.perf_counter()
+        self._build_defect_groups_sheet(duplicates, name=name, key_column='Attachment Hash (SHA-256)', key_width=70)
+        METRICS.histogram('excel.duplicates_sheet_seconds').observe(time.perf_counter() - start_time)
+
+    def _build_defect_groups_sheet(
+            self, groups: typing.Dict[str, typing.List[str]], name: str, key_column: str,
+            key_width: int) -> typing.NoReturn:
+        """
+        Build a worksheet of grouped defects: one row per group (defect count, defect ids, group key).
+
+        Args:
+            groups: Dictionary of group key -> list of defect ids
+            name: Name of worksheet
+            key_column: Name of the group key column
+            key_width: Maximum width of the group key column
+
+        Returns:
+            None
+
+        """
+        column_info = {'Defect Count': -1, 'Defect IDs': 100, key_column: key_width}
+        columns = list(column_info.keys())
+        max_width_overrides = list(column_info.values())
+        max_widths = self._find_max_col_widths(col_entries=columns, overrides=max_width_overrides)
+
+        wksht = self.workbook.add_worksheet(name=name)
+        wksht.set_row(0, None, self.bold)
+        for col_index, col_name in enumerate(columns, 0):
+            wksht.write_string(0, col_index, col_name)
+
+        # Largest groups (most defects) first.
+        for row, (key, defect_ids) in enumerate(sorted(groups.items(), key=lambda x: len(x[1]), reverse=True), 1):
+            row_data = [len(defect_ids), ", ".join(defect_ids), key]
+            wksht.write_number(row, 0, row_data[0])
+            wksht.write_string(row, 1, row_data[1])
+            wksht.write_string(row, 2, row_data[2])
+            max_widths = self._find_max_col_widths(row_data, widths=max_widths, overrides=max_width_overrides)
+
         self._set_column_widths(wksht, max_widths)
         self.freeze_header_row(worksheet=wksht)
 
+    def build_report(self, source: typing.Any) -> ReportAggregate:
+        """
+        Build the Summary and Details worksheets from any source providing build_aggregate()
+        (e.g. - Defects or SQLiteCorpusStore).
+
+        Args:
+            source: Object providing build_aggregate() -> ReportAggregate
+
+        Returns:
+            The ReportAggregate used to build the worksheets.
+
+        """
+        aggregate = source.build_aggregate()
+        self.build_summary_sheet(aggregate)
+        self.build_detailed_table(aggregate)
+        return aggregate
+
     def _find_max_col_widths(
             self, col_entries: typing.List[typing.Any], widths: typing.List[int] = None,
             overrides: typing.List[int] = None) -> typing.List[int]:
@@ -252,15 +349,20 @@ class ExcelWorkbook:
         for index, col_width in enumerate(col_widths, 0):
             worksheet.set_column(index, index, col_width + column_buffer)
 
-    def save(self) -> typing.NoReturn:
+    def save(self, quiet: bool = False) -> typing.NoReturn:
         """
         Close the workbook and save file. Can only be called ONCE on a workbook; cannot save multiple times.
 
+        Args:
+            quiet: Only log the status (not printed; e.g. - provisional reports written while the run is in progress)
+
         Returns:
             None
 
         """
-        self.workbook.close()
+        with METRICS.timer('excel.save_seconds'):
+            self.workbook.close()
         status = f"- Wrote XLSX file to: '{self.wkbk_name}'"
         self.log.info(status)
-        print(status)
+        if not quiet:
+            print(status)
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import time
+import typing
+
+from MDCBR.metrics.run_metrics import METRICS
+from MDCBR.reporting.report_aggregate import ReportAggregate
+
+
+def replace_atomically(filename: str, write: typing.Callable[[str], typing.Any]) -> str:
+    """
+    Write a file under a temporary name, then rename it over the target: readers only ever see a complete file.
+
+    Args:
+        filename: Name of the file to write (or replace).
+        write: Callable writing the contents to the (temporary) filename it is given.
+
+    Returns:
+        Name of the file written.
+
+    """
+    root, extension = os.path.splitext(filename)
+    temp_file = f"{root}.tmp{extension}"
+    write(temp_file)
+    os.replace(temp_file, filename)
+    return filename
+
+
+class ProvisionalReports:
+    """
+    Provisional summary outputs, updated while a run is in progress: the defects are added to a running aggregate as
+    they are processed, and the outputs are rewritten every 'every' defects or 'interval' seconds (checked as each
+    defect is added). Each output is replaced atomically, so it can be opened at any time.
+
+    Outputs:
+        <name>.provisional.json: exception counts, and the top messages of each exception type
+        <name>.provisional.xlsx: Summary and Details worksheets (optional)
+
+    The instance is callable, so it can be registered as a Defects listener. Once the run is complete, close() writes
+    the outputs one last time (marked complete).
+    """
+
+    DEFAULT_EVERY = 100
+    DEFAULT_INTERVAL = 60.0
+
+    # Messages listed per exception type in the JSON summary.
+    TOP_MESSAGES = 5
+
+    def __init__(self, report_name: str, every: int = DEFAULT_EVERY, interval: float = DEFAULT_INTERVAL,
+                 xlsx: bool = False, clock: typing.Callable[[], float] = time.monotonic) -> typing.NoReturn:
+        """
+        Args:
+            report_name: Report path and name, without extension (e.g. - 'reports/CBR_issues_<start>_to_<stop>')
+            every: Rewrite the outputs after this many defects (0 = time-based only).
+            interval: Rewrite the outputs once this many seconds have elapsed since the last update (0 = count-based
+                only).
+            xlsx: Also write the provisional XLSX workbook.
+            clock: Time source (seconds).
+
+        """
+        self.json_file = f"{report_name}.provisional.json"
+        self.xlsx_file = f"{report_name}.provisional.xlsx" if xlsx else None
+        self.every = every
+        self.interval = interval
+        self.aggregate = ReportAggregate()
+        self.writes = 0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._clock = clock
+        self._start = self._last_write = clock()
+        self._since_write = 0
+
+    def add_defect(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Add a processed defect; the outputs are rewritten if an update is due.
+
+        Args:
+            defect: DefectInfo (or equivalent) object.
+
+        Returns:
+            None
+
+        """
+        self.aggregate.add_defect(defect)
+        self._since_write += 1
+        if ((self.every and self._since_write >= self.every) or
+                (self.interval and self._clock() - self._last_write >= self.interval)):
+            self.write()
+
+    __call__ = add_defect
+
+    def write(self, complete: bool = False) -> typing.NoReturn:
+        """
+        Rewrite the provisional outputs from the running aggregate.
+
+        Args:
+            complete: The run is complete (the outputs are final).
+
+        Returns:
+            None
+
+        """
+        with METRICS.timer('provisional.write_seconds'):
+            self.aggregate.finalize()
+            replace_atomically(self.json_file, lambda filename: self._write_json(filename, complete))
+            if self.xlsx_file is not None:
+                replace_atomically(self.xlsx_file, self._write_xlsx)
+
+        self.writes += 1
+        self._since_write = 0
+        self._last_write = self._clock()
+        METRICS.counter('provisional.writes').inc()
+        self.log.info(f"Provisional reports updated: {self.aggregate.total_count} defects "
+                      f"({'complete' if complete else 'in progress'}).")
+
+    def close(self) -> typing.NoReturn:
+        self.write(complete=True)
+
+    def summary(self, complete: bool = False) -> dict:
+        """
+        Build the JSON summary: exception types by descending count, each with its most common messages.
+
+        Args:
+            complete: The run is complete.
+
+        Returns:
+            Dictionary of the summary fields.
+
+        """
+        return {
+            'provisional': not complete,
+            'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed_seconds': round(self._clock() - self._start, 3),
+            'defects': self.aggregate.total_count,
+            'exceptions': [{
+                'exception': exc_entry.exception_type,
+                'count': exc_entry.count,
+                'messages': [{'message': msg_entry.message, 'count': msg_entry.count}
+                             for msg_entry in exc_entry.messages[:self.TOP_MESSAGES]],
+            } for exc_entry in self.aggregate.finalize().exceptions],
+        }
+
+    def _write_json(self, filename: str, complete: bool) -> typing.NoReturn:
+        with open(filename, "w", encoding='utf8') as SUMMARY:
+            json.dump(self.summary(complete=complete), SUMMARY, indent=2)
+
+    def _write_xlsx(self, filename: str) -> typing.NoReturn:
+        # xlsxwriter is only needed if the provisional workbook is requested.
+        from MDCBR.reporting.excel_reports import ExcelWorkbook
+
+        xlsx = ExcelWorkbook(workbook_name=filename)
+        xlsx.build_summary_sheet(self.aggregate)
+        xlsx.build_detailed_table(self.aggregate)
+        xlsx.save(quiet=True)
@@ -0,0 +1,266 @@
+import dataclasses
+import re
+import typing
+
+
+@dataclasses.dataclass
+class VersionEntry:
+    """
+    All defects reported against a single SW version for a given (exception, message) pair.
+    """
+    version: str
+    defect_ids: typing.List[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.defect_ids)
+
+
+@dataclasses.dataclass
+class MessageEntry:
+    """
+    All defects sharing the same genericized error message for a given exception type.
+    Versions are stored in version-aware, descending order (newest first) once the aggregate is finalized.
+    """
+    message: str
+    versions: typing.List[VersionEntry] = dataclasses.field(default_factory=list)
+    count: int = 0
+
+
+@dataclasses.dataclass
+class ExceptionEntry:
+    """
+    All defects of a single exception type. Messages are stored by descending defect count once the aggregate is
+    finalized.
+    """
+    exception_type: str
+    messages: typing.List[MessageEntry] = dataclasses.field(default_factory=list)
+    count: int = 0
+
+
+class ReportAggregate:
+    """
+    Precomputed, output-format independent view of a defect collection. All counts and sort orders are computed once,
+    in a single pass over the defects, so the report writers (Excel, console, etc.) only need to walk the results.
+
+    Structure (sorted):
+        exceptions: List[ExceptionEntry] (descending count)
+            messages: List[MessageEntry] (descending count)
+                versions: List[VersionEntry] (descending version)
+    """
+
+    # Used to split a version/build string into comparable components: e.g. - '19.2.10.3' -> (19, 2, 10, 3)
+    VERSION_COMPONENT_DELIMITER = re.compile(r'[.\-_\s]+')
+
+    # Marker appended to a defect id when the description contains additional user input.
+    USER_DATA_MARKER = '*'
+
+    def __init__(self) -> typing.NoReturn:
+        self._exceptions = {}
+        self._messages = {}
+        self._versions = {}
+        self._finalized = False
+        self.exceptions = []
+
+        # Longest entry per reporting field; maintained as data is added (used for column sizing).
+        self.max_exception_len = 0
+        self.max_message_len = 0
+        self.max_version_len = 0
+
+    @classmethod
+    def from_defects(cls, defects: typing.Iterable) -> "ReportAggregate":
+        """
+        Build the aggregate from an iterable of DefectInfo (or equivalent) objects.
+
+        Args:
+            defects: Iterable of objects providing: defect_id, exception_type, version, error_msg,
+                general_error_msg, user_added_data
+
+        Returns:
+            Finalized ReportAggregate
+
+        """
+        aggregate = cls()
+        for defect in defects:
+            aggregate.add_defect(defect)
+        return aggregate.finalize()
+
+    @classmethod
+    def from_reporting_dict(cls, data_dict: typing.Dict[str, dict]) -> "ReportAggregate":
+        """
+        Build the aggregate from the output of Defects.build_reporting_dict().
+
+        Args:
+            data_dict: Dictionary - <exception>: <summary>: <version>: [defect ids]
+
+        Returns:
+            Finalized ReportAggregate
+
+        """
+        aggregate = cls()
+        for exc_name, exc_dict in data_dict.items():
+            for message, version_dict in exc_dict.items():
+                for version, defect_ids in version_dict.items():
+                    for defect_id in defect_ids:
+                        aggregate.add(exception_type=exc_name, message=message, version=version, defect_id=defect_id)
+        return aggregate.finalize()
+
+    def merge(self, other: "ReportAggregate") -> "ReportAggregate":
+        """
+        Add all records of another aggregate (e.g. - the aggregate of one query shard). The caller is responsible for
+        not adding the same defect twice.
+
+        Args:
+            other: ReportAggregate to merge into this aggregate.
+
+        Returns:
+            self (to allow chaining; finalize() before reporting)
+
+        """
+        for exc_entry in other._exceptions.values():
+            for msg_entry in exc_entry.messages:
+                for ver_entry in msg_entry.versions:
+                    for defect_id in ver_entry.defect_ids:
+                        self.add(exception_type=exc_entry.exception_type, message=msg_entry.message,
+                                 version=ver_entry.version, defect_id=defect_id)
+        return self
+
+    def add_defect(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Add a single defect to the aggregate.
+
+        Args:
+            defect: DefectInfo (or equivalent) object.
+
+        Returns:
+            None
+
+        """
+        # Determine the generic error msg (if not parsed, get the general_error_msg)
+        message = defect.error_msg if defect.general_error_msg is None else defect.general_error_msg
+        extra_data = '' if defect.user_added_data is None else self.USER_DATA_MARKER
+        self.add(exception_type=defect.exception_type, message=message, version=defect.version,
+                 defect_id=f'{defect.defect_id}{extra_data}')
+
+    def add(self, exception_type: str, message: typing.Optional[str], version: str,
+            defect_id: str) -> typing.NoReturn:
+        """
+        Add a single (exception, message, version, defect_id) record to the aggregate.
+
+        Args:
+            exception_type: Exception type (from the defect summary)
+            message: Genericized error message
+            version: SW version/build
+            defect_id: Defect ID (with user data marker, if applicable)
+
+        Returns:
+            None
+
+        """
+        self._finalized = False
+
+        exc_entry = self._exceptions.get(exception_type)
+        if exc_entry is None:
+            exc_entry = self._exceptions[exception_type] = ExceptionEntry(exception_type=exception_type)
+            self.max_exception_len = max(self.max_exception_len, len(exception_type))
+
+        msg_key = (exception_type, message)
+        msg_entry = self._messages.get(msg_key)
+        if msg_entry is None:
+            msg_entry = self._messages[msg_key] = MessageEntry(message=message)
+            exc_entry.messages.append(msg_entry)
+            self.max_message_len = max(self.max_message_len, len(str(message)))
+
+        ver_key = (exception_type, message, version)
+        ver_entry = self._versions.get(ver_key)
+        if ver_entry is None:
+            ver_entry = self._versions[ver_key] = VersionEntry(version=version)
+            msg_entry.versions.append(ver_entry)
+            self.max_version_len = max(self.max_version_len, len(version))
+
+        ver_entry.defect_ids.append(defect_id)
+        msg_entry.count += 1
+        exc_entry.count += 1
+
+    def finalize(self) -> "ReportAggregate":
+        """
+        Sort the aggregate (exceptions and messages by count, versions by version number). Each list is sorted
+        exactly once, using precomputed counts.
+
+        Returns:
+            self (to allow chaining)
+
+        """
+        if self._finalized:
+            return self
+
+        for exc_entry in self._exceptions.values():
+            for msg_entry in exc_entry.messages:
+                msg_entry.versions.sort(key=lambda x: self.version_sort_key(x.version), reverse=True)
+            exc_entry.messages.sort(key=lambda x: x.count, reverse=True)
+
+        self.exceptions = sorted(self._exceptions.values(), key=lambda x: x.count, reverse=True)
+        self._finalized = True
+        return self
+
+    @classmethod
+    def version_sort_key(cls, version: str) -> typing.Tuple[typing.Tuple[int, typing.Any], ...]:
+        """
+        Build a sort key for a version/build string, so '19.10.2' sorts after '19.9.15'.
+        Numeric components compare numerically; non-numeric components compare as text (and after numbers).
+
+        Args:
+            version: Version/build string (e.g. - '19.2.10.3')
+
+        Returns:
+            Tuple usable as a sort key.
+
+        """
+        return tuple((0, int(part)) if part.isdigit() else (1, part)
+                     for part in cls.VERSION_COMPONENT_DELIMITER.split(version or '') if part != '')
+
+    @property
+    def total_count(self) -> int:
+        """
+        Returns: (int) - Total number of defects in the aggregate.
+        """
+        return sum(exc_entry.count for exc_entry in self._exceptions.values())
+
+    def tally(self) -> typing.Dict[str, int]:
+        """
+        Build a dictionary of all exception types and their counts (same format as Defects.tally_defect_types()).
+
+        Returns:
+            A dictionary (k,v) => <exception_type>: <count of defects of the exception type>
+
+        """
+        return dict((exc_entry.exception_type, exc_entry.count) for exc_entry in self.finalize().exceptions)
+
+    def to_reporting_dict(self) -> typing.Dict[str, dict]:
+        """
+        Build the Defects.build_reporting_dict() structure (the inverse of from_reporting_dict()), in report order.
+
+        Returns:
+            Dictionary - <exception>: <summary>: <version>: [defect ids]
+
+        """
+        return dict((exc_entry.exception_type,
+                     dict((msg_entry.message,
+                           dict((ver_entry.version, list(ver_entry.defect_ids)) for ver_entry in msg_entry.versions))
+                          for msg_entry in exc_entry.messages))
+                    for exc_entry in self.finalize().exceptions)
+
+    def signature(self) -> int:
+        """
+        Hash of the aggregate contents (every exception, message, version and defect id), used to determine whether
+        the reported results have changed (e.g. - between two polls of Jira).
+
+        Returns:
+            (int) - Hash of the aggregate contents (independent of the order in which the defects were added).
+
+        """
+        return hash(tuple(sorted(
+            (exc_entry.exception_type, str(msg_entry.message), ver_entry.version, tuple(sorted(ver_entry.defect_ids)))
+            for exc_entry in self._exceptions.values()
+            for msg_entry in exc_entry.messages
+            for ver_entry in msg_entry.versions)))
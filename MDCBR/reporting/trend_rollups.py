@@ -0,0 +1,361 @@
+import collections
+import datetime
+import email.utils
+import hashlib
+import sqlite3
+import typing
+
+from MDCBR.elf.elf_analysis import ELFAnalysis
+from MDCBR.elf.elf_parser import ELFLogParser, ELFLogSections, SectionNotFound
+from MDCBR.metrics.run_metrics import METRICS
+
+
+class TimeBuckets:
+    """
+    Trend time bucket granularities. Buckets are keyed by their first day (CCYY-MM-DD); weeks start on Monday.
+    """
+    DAY = 'day'
+    WEEK = 'week'
+
+    @classmethod
+    def list_granularities(cls) -> typing.List[str]:
+        return [cls.DAY, cls.WEEK]
+
+    @classmethod
+    def bucket(cls, day: datetime.date, granularity: str) -> str:
+        """
+        Args:
+            day: Date of the defect
+            granularity: TimeBuckets.DAY or TimeBuckets.WEEK
+
+        Returns:
+            Bucket key (first day of the bucket, CCYY-MM-DD)
+
+        """
+        if granularity == cls.WEEK:
+            day = day - datetime.timedelta(days=day.weekday())
+        return day.isoformat()
+
+    @classmethod
+    def bucket_range(cls, start: str, end: str, granularity: str) -> typing.List[str]:
+        """
+        Every bucket key from start to end (inclusive), so trends include the buckets without any defects.
+
+        Args:
+            start: First date (CCYY-MM-DD)
+            end: Last date (CCYY-MM-DD)
+            granularity: TimeBuckets.DAY or TimeBuckets.WEEK
+
+        Returns:
+            List of bucket keys
+
+        """
+        step = datetime.timedelta(days=7 if granularity == cls.WEEK else 1)
+        day = datetime.date.fromisoformat(cls.bucket(datetime.date.fromisoformat(start), granularity))
+        last = datetime.date.fromisoformat(end)
+        buckets = []
+        while day <= last:
+            buckets.append(day.isoformat())
+            day += step
+        return buckets
+
+
+class TrendDimensions:
+    """
+    Dimensions the defect counts are rolled up by (per time bucket).
+    """
+    TOTAL = 'total'
+    EXCEPTION = 'exception'
+    VERSION = 'version'
+    STACK = 'stack'
+
+    @classmethod
+    def list_dimensions(cls) -> typing.List[str]:
+        return [cls.TOTAL, cls.EXCEPTION, cls.VERSION, cls.STACK]
+
+
+# Jira 'created' format; the ELF 'Exception' section date is RFC 2822 (e.g. - 'Mon, 01 Jun 2020 14:00:18 -0500').
+JIRA_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+
+def parse_defect_date(value: typing.Any) -> typing.Optional[datetime.date]:
+    """
+    Parse a Jira 'created' timestamp or an ELF 'Exception' section date.
+
+    Args:
+        value: Timestamp string (or datetime/date)
+
+    Returns:
+        Date (in the reporter's timezone), or None if the value could not be parsed.
+
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if not value:
+        return None
+
+    value = str(value).strip()
+    for parser in (lambda x: datetime.datetime.strptime(x, JIRA_DATE_FORMAT), datetime.datetime.fromisoformat,
+                   email.utils.parsedate_to_datetime):
+        try:
+            return parser(value).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def get_defect_date(defect: typing.Any) -> typing.Optional[datetime.date]:
+    """
+    Date of a defect: the Jira 'created' date, or if not available, the ELF 'Exception' section date.
+
+    Args:
+        defect: DefectInfo (or equivalent) object.
+
+    Returns:
+        Date, or None if neither date is available.
+
+    """
+    day = parse_defect_date(getattr(defect, 'created', None))
+    if day is None and defect.elf_log_model is not None:
+        try:
+            exception = defect.elf_log_model.get_section(ELFLogSections.EXCEPTION)
+        except SectionNotFound:
+            exception = None
+        day = parse_defect_date(getattr(exception, 'date', None))
+    return day
+
+
+def get_stack_key(defect: typing.Any) -> typing.Optional[str]:
+    """
+    Call stack key of a defect (the same key ELFAnalysis uses to group defects by call stack).
+
+    Args:
+        defect: DefectInfo (or equivalent) object.
+
+    Returns:
+        Call stack string, or None if the defect has no parsed call stack.
+
+    """
+    if defect.elf_log_model is None:
+        return None
+    try:
+        stack = defect.elf_log_model.get_section(ELFLogSections.CALL_STACK_INFORMATION)[ELFLogParser.STACK_SECTION]
+    except (SectionNotFound, KeyError, TypeError):
+        return None
+    if not stack:
+        return None
+    analysis = ELFAnalysis(data_struct=[(defect.defect_id, {ELFLogSections.CALL_STACK_INFORMATION: stack})])
+    return next(iter(analysis.perform_stack_trace_assessment()))
+
+
+class TrendRollupStore:
+    """
+    Persistent (SQLite) rollup tables of defect counts per time bucket (day, week) and dimension (total, exception
+    type, version, call stack group).
+
+    The rollups are maintained incrementally: adding a defect only updates the counters of its own buckets, so adding
+    a day's data costs only that day's defects, and trend reports over any date range are read directly from the
+    rollup tables (no reprocessing of the history). Each defect's bucketed values are also stored, so re-adding a
+    defect (e.g. - an overlapping query) is not double counted; if its classification changed, the counts are moved.
+
+    The instance is callable, so it can be registered as a Defects listener.
+    """
+
+    DEFECTS_TABLE = 'trend_defects'
+    ROLLUP_TABLE = 'trend_rollups'
+    STACKS_TABLE = 'trend_stacks'
+    DEFAULT_BATCH_SIZE = 500
+
+    # Call stack groups are stored by a short hash of the call stack string (the full string is stored once).
+    STACK_ID_LENGTH = 12
+
+    def __init__(self, db_file: str, batch_size: int = DEFAULT_BATCH_SIZE) -> typing.NoReturn:
+        """
+        Args:
+            db_file: SQLite database filename (created if it does not exist).
+            batch_size: Number of defects buffered before the batch is applied.
+
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        self._pending = {}
+        self._pending_stacks = {}
+        self._create_schema()
+
+    def _create_schema(self) -> typing.NoReturn:
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.DEFECTS_TABLE} '
+            f'(defect_id TEXT PRIMARY KEY, day TEXT, exception TEXT, version TEXT, stack TEXT)')
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.ROLLUP_TABLE} (granularity TEXT NOT NULL, bucket TEXT NOT NULL, '
+            f'dimension TEXT NOT NULL, value TEXT NOT NULL, count INTEGER NOT NULL, '
+            f'PRIMARY KEY (granularity, dimension, bucket, value)) WITHOUT ROWID')
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.STACKS_TABLE} (stack_id TEXT PRIMARY KEY, call_stack TEXT)')
+        self.connection.commit()
+
+    # ------------------------------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------------------------------
+    def add_defect(self, defect: typing.Any) -> typing.NoReturn:
+        """
+        Buffer a single defect; the buffer is applied to the rollups once it reaches the batch size. Defects without
+        a date (no Jira 'created' date or ELF exception date) cannot be bucketed, and are skipped.
+
+        Args:
+            defect: DefectInfo (or equivalent) object.
+
+        Returns:
+            None
+
+        """
+        day = get_defect_date(defect)
+        if day is None:
+            METRICS.counter('trends.undated_defects').inc()
+            return
+
+        stack_id = None
+        call_stack = get_stack_key(defect)
+        if call_stack is not None:
+            stack_id = hashlib.sha1(call_stack.encode('utf8')).hexdigest()[:self.STACK_ID_LENGTH]
+            self._pending_stacks[stack_id] = call_stack
+
+        self._pending[defect.defect_id] = (day.isoformat(), defect.exception_type, defect.version, stack_id)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    __call__ = add_defect
+
+    @staticmethod
+    def _rollup_keys(values: typing.Tuple[str, str, str, typing.Optional[str]]) -> typing.Iterator[tuple]:
+        """
+        Rollup counters (granularity, bucket, dimension, value) incremented by a single defect.
+        """
+        day, exception, version, stack_id = values
+        dimensions = [(TrendDimensions.TOTAL, ''), (TrendDimensions.EXCEPTION, exception or ''),
+                      (TrendDimensions.VERSION, version or '')]
+        if stack_id is not None:
+            dimensions.append((TrendDimensions.STACK, stack_id))
+
+        for granularity in TimeBuckets.list_granularities():
+            bucket = TimeBuckets.bucket(datetime.date.fromisoformat(day), granularity)
+            for dimension, value in dimensions:
+                yield granularity, bucket, dimension, value
+
+    def flush(self) -> typing.NoReturn:
+        """
+        Apply all buffered defects to the rollups in a single transaction. Only the counters of the buffered defects'
+        buckets are updated.
+
+        Returns:
+            None
+
+        """
+        if not self._pending:
+            return
+
+        # Previously stored values of the buffered defects (re-added defects move their counts).
+        defect_ids = list(self._pending)
+        previous = {}
+        for start in range(0, len(defect_ids), self.batch_size):
+            chunk = defect_ids[start:start + self.batch_size]
+            previous.update((row[0], row[1:]) for row in self.connection.execute(
+                f'SELECT defect_id, day, exception, version, stack FROM {self.DEFECTS_TABLE} '
+                f'WHERE defect_id IN ({", ".join("?" for _ in chunk)})', chunk))
+
+        deltas = collections.Counter()
+        changed = []
+        for defect_id, values in self._pending.items():
+            old_values = previous.get(defect_id)
+            if old_values == values:
+                continue
+            if old_values is not None:
+                deltas.subtract(self._rollup_keys(old_values))
+            deltas.update(self._rollup_keys(values))
+            changed.append((defect_id, *values))
+
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT INTO {self.ROLLUP_TABLE} VALUES (?, ?, ?, ?, ?) '
+                f'ON CONFLICT (granularity, dimension, bucket, value) DO UPDATE SET count = count + excluded.count',
+                [(*key, delta) for key, delta in deltas.items() if delta != 0])
+            self.connection.execute(f'DELETE FROM {self.ROLLUP_TABLE} WHERE count <= 0')
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO {self.DEFECTS_TABLE} VALUES (?, ?, ?, ?, ?)', changed)
+            self.connection.executemany(
+                f'INSERT OR IGNORE INTO {self.STACKS_TABLE} VALUES (?, ?)', self._pending_stacks.items())
+
+        METRICS.counter('trends.defects_applied').inc(len(changed))
+        self._pending.clear()
+        self._pending_stacks.clear()
+
+    def close(self) -> typing.NoReturn:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "TrendRollupStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
+
+    # ------------------------------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------------------------------
+    def __len__(self) -> int:
+        self.flush()
+        return self.connection.execute(f'SELECT COUNT(*) FROM {self.DEFECTS_TABLE}').fetchone()[0]
+
+    def date_range(self) -> typing.Tuple[typing.Optional[str], typing.Optional[str]]:
+        """
+        Returns:
+            Tuple of (first, last) defect dates (CCYY-MM-DD); (None, None) if the store is empty.
+        """
+        self.flush()
+        return self.connection.execute(f'SELECT MIN(day), MAX(day) FROM {self.DEFECTS_TABLE}').fetchone()
+
+    def call_stack(self, stack_id: str) -> typing.Optional[str]:
+        """
+        Returns:
+            The call stack string of a stack group id (TrendDimensions.STACK values)
+        """
+        row = self.connection.execute(
+            f'SELECT call_stack FROM {self.STACKS_TABLE} WHERE stack_id = ?', (stack_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def trend(self, dimension: str = TrendDimensions.EXCEPTION, granularity: str = TimeBuckets.DAY,
+              start: typing.Optional[str] = None, end: typing.Optional[str] = None,
+              top: typing.Optional[int] = None) -> typing.Dict[str, typing.Dict[str, int]]:
+        """
+        Read a trend directly from the rollup table.
+
+        Args:
+            dimension: TrendDimensions attribute
+            granularity: TimeBuckets attribute
+            start: First date to include (CCYY-MM-DD); None = from the first bucket.
+            end: Last date to include (CCYY-MM-DD); None = to the last bucket.
+            top: Only return the values with the most defects in the date range.
+
+        Returns:
+            Dictionary - <value>: <bucket>: <count> (values by descending total count)
+
+        """
+        self.flush()
+        query = (f'SELECT value, bucket, count FROM {self.ROLLUP_TABLE} '
+                 f'WHERE granularity = ? AND dimension = ? AND bucket >= ? AND bucket <= ?')
+        params = (granularity, dimension,
+                  '' if start is None else TimeBuckets.bucket(datetime.date.fromisoformat(start), granularity),
+                  '9999-12-31' if end is None else end)
+
+        trend = collections.defaultdict(dict)
+        for value, bucket, count in self.connection.execute(query, params):
+            trend[value][bucket] = count
+
+        values = sorted(trend, key=lambda x: sum(trend[x].values()), reverse=True)
+        return dict((value, dict(sorted(trend[value].items()))) for value in values[:top])
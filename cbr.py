@@ -1,31 +1,232 @@
+"""
+MDCBR: Jira CBR defect classification, ELF log parsing and reporting.
+
+Usage:
+    cbr.py run USER PSWD START STOP [options]   Query Jira, parse the defects, write the corpus and the XLSX report.
+                                                (--summary_only: summary/description only; no ELF logs or corpus.)
+    cbr.py fetch USER PSWD START STOP [options] Query Jira, parse the defects and write the corpus (no XLSX report).
+    cbr.py parse PATH [options]                 Parse local ELF logs (directory or archives) into a corpus (no Jira).
+    cbr.py analyze CORPUS [options]             Group the defects in a stored corpus by call stack.
+    cbr.py report CORPUS [options]              Write the XLSX report from a stored corpus (no Jira).
+    cbr.py watch USER PSWD START [options]      Keep polling Jira; update the corpus and report when results change.
+    cbr.py trends DB [options]                  Per-day/week defect trends from the trend rollup database.
+    cbr.py serve CORPUS [options]               Serve JSON queries (tallies, message and stack groups) over a corpus.
+
+'cbr.py USER PSWD START STOP [options]' (no subcommand) is the same as 'cbr.py run ...'.
+
+Stored corpora: JSON-lines corpus (.jsonl), SQLite corpus store (.db) or binary snapshot (any other extension).
+
+The heavy dependencies (jira and its requests/oauth dependencies, xlsxwriter) are only imported by the subcommands
+that use them, so the offline subcommands start quickly.
+"""
 import argparse
+import json
 import logging
 import os
+import sys
 import time
+import typing
+
+from MDCBR.md.md_jira import DEFAULT_ISSUE_ORDER, ISSUE_ORDER
+from MDCBR.metrics.run_metrics import METRICS, ProgressLine
+from MDCBR.reporting.provisional_reports import ProvisionalReports
 
-from MDCBR.defects.defects_list import Defects
-from MDCBR.md.md_jira import connect_to_jira, get_jira_issues
-from MDCBR.reporting.excel_reports import ExcelWorkbook
+if typing.TYPE_CHECKING:
+    from MDCBR.debug.profiler import StageProfiler
+    from MDCBR.defects.defects_list import Defects
+    from MDCBR.elf.elf_cache import ParsedELFCache
+    from MDCBR.md.md_download import AdaptiveDownloadController
 
-import MDCBR.debug.dump as debug
-from MDCBR.elf.elf_parser import ELFLogSections
+# Default values for accessing JIRA
+DEFAULT_MAX_RESULTS = 500
+DEFAULT_DOWNLOADS = 8
+DEFAULT_SHARDS = 4
+PROJECT = 'CBR'
+STATUS = ['"To Do"']
+URL = 'https://jira.pclender.com'
+REPORT_DIR = 'reports'
+DATA_FILE = 'CBR.data.jsonl'
+DEFAULT_POLL_INTERVAL = 300
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
 
 
 class CommandLineOptions:
     """ The utility command line arguments. """
 
-    def __init__(self):
-        self.parser = argparse.ArgumentParser()
-        self.parser.add_argument('user', help="Username (for Jira Access)")
-        self.parser.add_argument('pswd', help="Password (for Jira Access)")
-        self.parser.add_argument('start', help="Start of date range for query. Format: CCYY-MM-DD")
-        self.parser.add_argument('stop', help="Stop of date range for query. Format: CCYY-MM-DD")
-        self.parser.add_argument('-m', '--max_results', default=DEFAULT_MAX_RESULTS,
-                                 help=f"Max number of records to return. Default: {DEFAULT_MAX_RESULTS}")
-        self.parser.add_argument('-d', '--debug', action='store_true', default=False,
-                                 help="Enable debugging. Default: False")
+    SUBCOMMANDS = ['run', 'fetch', 'parse', 'analyze', 'report', 'watch', 'serve', 'trends']
+
+    def __init__(self, argv: typing.Optional[typing.List[str]] = None):
+        argv = list(sys.argv[1:] if argv is None else argv)
+
+        # No subcommand: original usage (cbr.py USER PSWD START STOP [options], options may come first) -> 'run'
+        if argv and argv[0] not in self.SUBCOMMANDS and argv[0] not in ('-h', '--help'):
+            argv.insert(0, 'run')
+
+        self.parser = argparse.ArgumentParser(description="Jira CBR defect classification and reporting.")
+        subparsers = self.parser.add_subparsers(dest='command', required=True)
+
+        run = subparsers.add_parser('run', help="Query Jira, parse the defects, write the corpus and XLSX report.")
+        self._add_jira_arguments(run)
+
+        fetch = subparsers.add_parser('fetch', help="Query Jira, parse the defects and write the corpus.")
+        self._add_jira_arguments(fetch)
+
+        parse = subparsers.add_parser('parse', help="Parse local ELF logs (directory, tar/zip archives) into a corpus.")
+        parse.add_argument('path', help="Directory, tar/zip archive or ELF log file to parse")
+        parse.add_argument('-w', '--workers', type=int, default=None,
+                           help="Number of worker processes. Default: number of CPUs")
+        self._add_corpus_arguments(parse)
+        self._add_debug_argument(parse)
+
+        analyze = subparsers.add_parser('analyze', help="Group the defects in a stored corpus by call stack.")
+        analyze.add_argument('corpus', help="Stored corpus: .jsonl, .db (SQLite store) or binary snapshot")
+        analyze.add_argument('-t', '--top', type=int, default=10,
+                             help="Number of call stack groups to display. Default: 10")
+        analyze.add_argument('-o', '--output', default=None,
+                             help="Write all call stack groups to this JSON file. Default: None")
+        self._add_debug_argument(analyze)
 
-        self.args = self.parser.parse_args()
+        report = subparsers.add_parser('report', help="Write the XLSX report from a stored corpus.")
+        report.add_argument('corpus', help="Stored corpus: .jsonl, .db (SQLite store) or binary snapshot")
+        report.add_argument('-n', '--name', default=None,
+                            help="Report name (written to the reports directory). Default: <corpus name>")
+        report.add_argument('--stacks', action='store_true', default=False,
+                            help="Add a worksheet of the defects grouped by call stack. Default: False")
+        self._add_debug_argument(report)
+
+        watch = subparsers.add_parser('watch', help="Keep polling Jira for updated issues; regenerate the corpus "
+                                                    "and XLSX report when the results change.")
+        watch.add_argument('user', help="Username (for Jira Access)")
+        watch.add_argument('pswd', help="Password (for Jira Access)")
+        watch.add_argument('start', help="Start of date range for query. Format: CCYY-MM-DD")
+        watch.add_argument('--stop', default=None, help="End of date range for query. Format: CCYY-MM-DD. "
+                                                        "Default: None (no end date)")
+        watch.add_argument('-i', '--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                           help=f"Seconds between polls. Default: {DEFAULT_POLL_INTERVAL}")
+        watch.add_argument('--polls', type=int, default=None, help="Stop after this many polls. Default: None")
+        watch.add_argument('--downloads', type=int, default=DEFAULT_DOWNLOADS,
+                           help=f"Maximum concurrent attachment downloads. Default: {DEFAULT_DOWNLOADS}")
+        watch.add_argument('--data_file', default=DATA_FILE,
+                           help=f"JSON-lines corpus file to write. Default: {DATA_FILE}")
+        watch.add_argument('-s', '--snapshot', default=None,
+                           help="Also write a binary snapshot of the parsed defects to this file. Default: None")
+        watch.add_argument('-c', '--compact', action='store_true', default=False,
+                           help="Compact defects: keep only the extracted fields and the parsed ELF sections written "
+                                "to the outputs (lower memory use). Default: False")
+        self._add_partial_argument(watch)
+        self._add_debug_argument(watch)
+
+        serve = subparsers.add_parser('serve', help="Local HTTP (JSON) query API over a stored corpus.")
+        serve.add_argument('corpus', help="Stored corpus: .jsonl, .db (SQLite store) or binary snapshot")
+        serve.add_argument('--host', default=DEFAULT_HOST, help=f"Interface to listen on. Default: {DEFAULT_HOST}")
+        serve.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on. Default: {DEFAULT_PORT}")
+        self._add_debug_argument(serve)
+
+        trends = subparsers.add_parser('trends', help="Per-day/week defect trends from the trend rollup database.")
+        trends.add_argument('db', help="Trend rollup database (see --trends)")
+        trends.add_argument('-g', '--granularity', choices=['day', 'week'], default='week',
+                            help="Time bucket size. Default: week")
+        trends.add_argument('-b', '--by', choices=['total', 'exception', 'version', 'stack'], default='exception',
+                            help="Dimension to trend. Default: exception")
+        trends.add_argument('--start', default=None, help="First date. Format: CCYY-MM-DD. Default: first defect")
+        trends.add_argument('--end', default=None, help="Last date. Format: CCYY-MM-DD. Default: last defect")
+        trends.add_argument('-t', '--top', type=int, default=5,
+                            help="Number of values (columns) to display. Default: 5")
+        trends.add_argument('-o', '--output', default=None,
+                            help="Write the full trend table (all values) to this CSV file. Default: None")
+        self._add_debug_argument(trends)
+
+        self.args = self.parser.parse_args(argv)
+
+    def _add_jira_arguments(self, parser: argparse.ArgumentParser) -> typing.NoReturn:
+        parser.add_argument('user', help="Username (for Jira Access)")
+        parser.add_argument('pswd', help="Password (for Jira Access)")
+        parser.add_argument('start', help="Start of date range for query. Format: CCYY-MM-DD")
+        parser.add_argument('stop', help="Stop of date range for query. Format: CCYY-MM-DD")
+        parser.add_argument('-m', '--max_results', type=int, default=DEFAULT_MAX_RESULTS,
+                            help=f"Max number of records to return. Default: {DEFAULT_MAX_RESULTS}")
+        self._add_corpus_arguments(parser)
+        parser.add_argument('-p', '--profile', action='store_true', default=False,
+                            help="Profile each stage (cProfile + tracemalloc); reports written to the reports "
+                                 "directory. Default: False")
+        parser.add_argument('-a', '--async_pipeline', action='store_true', default=False,
+                            help="Overlap the fetch, download, parse and aggregate stages (asyncio pipeline). "
+                                 "Default: False")
+        parser.add_argument('--downloads', type=int, default=DEFAULT_DOWNLOADS,
+                            help=f"Maximum concurrent attachment downloads. Default: {DEFAULT_DOWNLOADS}")
+        parser.add_argument('--summary_only', action='store_true', default=False,
+                            help="Fast mode: only request the summary and description of each issue; no attachments "
+                                 "are downloaded, and only the console tally and the XLSX summary and details are "
+                                 "generated. Default: False")
+        parser.add_argument('--projects', nargs='+', default=[PROJECT],
+                            help=f"Jira projects to query (merged into one report). Default: {PROJECT}")
+        parser.add_argument('--shard_days', type=int, default=None,
+                            help="Split the date range (and projects) into query shards of this many days, fetched "
+                                 "and processed in parallel. Default: None (one shard per project)")
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS,
+                            help=f"Maximum concurrent query shards. Default: {DEFAULT_SHARDS}")
+        parser.add_argument('-r', '--raw_search', action='store_true', default=False,
+                            help="Request the raw JSON search results and build lightweight issue records (faster "
+                                 "for large result sets). Default: False")
+        parser.add_argument('--order', choices=list(ISSUE_ORDER), default=DEFAULT_ISSUE_ORDER,
+                            help=f"Order in which the issues are fetched and processed: 'newest' (created date) or "
+                                 f"'priority' (Jira priority, then newest). Default: {DEFAULT_ISSUE_ORDER} "
+                                 f"({ISSUE_ORDER[DEFAULT_ISSUE_ORDER]})")
+        parser.add_argument('--provisional', action='store_true', default=False,
+                            help="Write provisional summary reports (JSON, and XLSX for 'run') while the run is in "
+                                 "progress; each update replaces the previous one. Use with -a (or --checkpoint) so "
+                                 "the defects are processed as the search pages arrive. Default: False")
+        parser.add_argument('--provisional_every', type=int, default=ProvisionalReports.DEFAULT_EVERY,
+                            help=f"Update the provisional reports after this many defects. "
+                                 f"Default: {ProvisionalReports.DEFAULT_EVERY}")
+        parser.add_argument('--provisional_interval', type=float, default=ProvisionalReports.DEFAULT_INTERVAL,
+                            help=f"Update the provisional reports at least this often (seconds). "
+                                 f"Default: {ProvisionalReports.DEFAULT_INTERVAL:0.0f}")
+        parser.add_argument('--memory_budget', type=float, default=None,
+                            help="Memory budget (MiB of RSS): once exceeded, the completed defects are spilled to a "
+                                 "temporary file, and read back from it as needed. Default: None (no budget)")
+        parser.add_argument('--spill_dir', default=None,
+                            help="Directory of the spill file (see --memory_budget). Default: the system temporary "
+                                 "directory")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Checkpoint directory: the search progress and the completed defects are saved as "
+                                 "the run progresses. Default: None (no checkpoints)")
+        parser.add_argument('--resume', action='store_true', default=False,
+                            help="Resume an interrupted run from its last checkpoint (--checkpoint directory, or the "
+                                 "run's default checkpoint in the reports directory). Default: False")
+        self._add_partial_argument(parser)
+        parser.add_argument('--hedge', action='store_true', default=False,
+                            help="Send a second (hedged) request for unusually slow attachment downloads. "
+                                 "Default: False")
+        self._add_debug_argument(parser)
+
+    @staticmethod
+    def _add_corpus_arguments(parser: argparse.ArgumentParser) -> typing.NoReturn:
+        parser.add_argument('-c', '--compact', action='store_true', default=False,
+                            help="Compact defects: keep only the extracted fields and the parsed ELF sections written "
+                                 "to the outputs (lower memory use for large runs). Default: False")
+        parser.add_argument('--data_file', default=DATA_FILE,
+                            help=f"JSON-lines corpus file to write. Default: {DATA_FILE}")
+        parser.add_argument('-s', '--snapshot', default=None,
+                            help="Also write a binary snapshot of the parsed defects to this file. Default: None")
+        parser.add_argument('--store', default=None,
+                            help="Also write the parsed defects to this SQLite corpus store. Default: None")
+        parser.add_argument('--trends', default=None,
+                            help="Add the parsed defects to this trend rollup database (per-day/week counts). "
+                                 "Default: None")
+
+    @staticmethod
+    def _add_partial_argument(parser: argparse.ArgumentParser) -> typing.NoReturn:
+        parser.add_argument('--partial', action='store_true', default=False,
+                            help="Download the ELF attachments in HTTP ranges, and stop once the sections used by the "
+                                 "outputs have been read (full download if the server ignores ranges). "
+                                 "Default: False")
+
+    @staticmethod
+    def _add_debug_argument(parser: argparse.ArgumentParser) -> typing.NoReturn:
+        parser.add_argument('-d', '--debug', action='store_true', default=False,
+                            help="Enable debugging. Default: False")
 
     def get_args(self):
         return self.args
@@ -42,6 +243,7 @@ def setup_logging(log_filename: str, logging_level=logging.INFO) -> logging.Logg
         Instance of logging.Logger()
 
     """
+    os.makedirs(os.path.dirname(log_filename) or '.', exist_ok=True)
     logging.basicConfig(filename=log_filename,
                         format='%(asctime)s : [%(levelname)s]: [%(name)s]: %(message)s',
                         datefmt='%m%d%YT%H:%M:%S',
@@ -50,67 +252,668 @@ def setup_logging(log_filename: str, logging_level=logging.INFO) -> logging.Logg
     return logging.getLogger(__name__)
 
 
-if __name__ == '__main__':
+def report_file(filename: str, extension: str) -> str:
+    return os.path.sep.join([REPORT_DIR, f"{filename}.{extension}"])
 
-    # Default values for accessing JIRA
-    DEFAULT_MAX_RESULTS = 500
-    PROJECT = 'CBR'
-    STATUS = ['"To Do"']
-    URL = 'https://jira.pclender.com'
-    REPORT_DIR = 'reports'
 
-    # Get the CLI arguments
-    cli = CommandLineOptions()
-    args = cli.get_args()
+def process_defects_in_stages(
+        jira_issues: typing.List[typing.Any], listeners: typing.List[typing.Callable],
+        profiler: 'StageProfiler', download_controller: typing.Optional['AdaptiveDownloadController'] = None,
+        parse_cache: typing.Optional['ParsedELFCache'] = None,
+        sections: typing.Optional[typing.Tuple[str, ...]] = None) -> 'Defects':
+    """
+    Process the Jira issues one stage at a time (classify, download, parse) rather than one defect at a time, so each
+    stage can be profiled separately. Listeners are notified once all stages are complete.
 
-    # Build the JQL query.
-    JQL = (f'project = {PROJECT} '
-           f'AND status in ({",".join(STATUS)}) '
-           f'AND created >= {args.start} '
-           f'AND created <= {args.stop} '
-           f'ORDER BY priority DESC, updated DESC')
-
-    filename = f"{PROJECT}_issues_{args.start}_to_{args.stop}"
-    xlsx_name = os.path.sep.join([REPORT_DIR, f"{filename}.{ExcelWorkbook.EXTENSION}"])
-    log_name = os.path.sep.join([REPORT_DIR, f"{filename}.log"])
-
-    log_level = logging.DEBUG if args.debug else logging.INFO
-    log = setup_logging(log_filename=log_name, logging_level=log_level)
-    log.info("----------------- START -----------------")
+    :param jira_issues: List of Jira issues
+    :param listeners: Defects listeners (called with each completed DefectInfo)
+    :param profiler: Stage profiler
+    :param download_controller: Attachment download controller
+    :param parse_cache: Parsed ELF log cache (identical attachments are parsed once)
+    :param sections: Parsed ELF sections kept by compact defects (None: the defects are not compact)
+
+    :return:
+        Defects list (with parsed ELF logs)
+
+    """
+    from MDCBR.defects.defects_list import Defects
+
+    with profiler.stage('classify'):
+        issues = Defects(jira_issues, parse_elf_log=False, download_controller=download_controller,
+                         parse_cache=parse_cache, compact=sections is not None, sections=sections)
+
+    with profiler.stage('download'):
+        contents = [defect.download_elf_attachment(raise_errors=False) for defect in issues]
+
+    with profiler.stage('parse'):
+        for defect, content in zip(issues, contents):
+            defect.load_elf_log(content)
+
+    issues.listeners = list(listeners)
+    for defect in issues:
+        issues.notify_listeners(defect)
+    return issues
+
+
+class CorpusOutputs:
+    """
+    The corpus outputs written as each defect is processed: JSON-lines corpus, and optionally, a binary snapshot,
+    a SQLite corpus store and the trend rollups. The instance is callable, so it can be registered as a single
+    Defects listener.
+    """
+
+    def __init__(self, data_file: str, snapshot: typing.Optional[str] = None, store: typing.Optional[str] = None,
+                 trends: typing.Optional[str] = None) -> typing.NoReturn:
+        from MDCBR.corpus.jsonl_corpus import JSONLCorpusWriter
+        from MDCBR.elf.elf_log_sections import ELFLogSections
+
+        self.data_file = data_file
+        self.snapshot = snapshot
+        self.store = store
+        self.trends = trends
+        self.corpus_writer = JSONLCorpusWriter(data_file=data_file, section=ELFLogSections.CALL_STACK_INFORMATION)
+        self.listeners = [self.corpus_writer]
+
+        self.snapshot_writer = None
+        if snapshot is not None:
+            from MDCBR.corpus.binary_snapshot import SnapshotWriter
+            self.snapshot_writer = SnapshotWriter(snapshot_file=snapshot)
+            self.listeners.append(self.snapshot_writer)
+
+        self.corpus_store = None
+        if store is not None:
+            from MDCBR.corpus.sqlite_store import SQLiteCorpusStore
+            self.corpus_store = SQLiteCorpusStore(db_file=store)
+            self.listeners.append(self.corpus_store)
+
+        self.trend_store = None
+        if trends is not None:
+            from MDCBR.reporting.trend_rollups import TrendRollupStore
+            self.trend_store = TrendRollupStore(db_file=trends)
+            self.listeners.append(self.trend_store)
+
+    def __call__(self, defect: typing.Any) -> typing.NoReturn:
+        for listener in self.listeners:
+            listener(defect)
+
+    def close(self) -> typing.NoReturn:
+        self.corpus_writer.close()
+        print(f"- Wrote {self.corpus_writer.count} defects to: {self.data_file}")
+
+        if self.corpus_store is not None:
+            self.corpus_store.close()
+            print(f"- Wrote parsed defects to corpus store: '{self.store}'")
+
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+            print(f"- Wrote binary snapshot ({self.snapshot_writer.count} defects) to: '{self.snapshot}'")
+
+        if self.trend_store is not None:
+            self.trend_store.close()
+            print(f"- Updated trend rollups: '{self.trends}'")
+
+
+def required_sections(args: argparse.Namespace) -> typing.Tuple[str, ...]:
+    """
+    The ELF log sections used by the outputs: the call stack and exception, plus the modules and processes if a
+    binary snapshot or corpus store is written.
+    """
+    from MDCBR.elf.elf_log_sections import ELFLogSections
+
+    sections = (ELFLogSections.CALL_STACK_INFORMATION, ELFLogSections.EXCEPTION)
+    if args.snapshot is not None or getattr(args, 'store', None) is not None:
+        sections += (ELFLogSections.MODULES, ELFLogSections.PROCESSES_INFORMATION)
+    return sections
+
+
+def compact_sections(args: argparse.Namespace) -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    The parsed ELF sections kept by compact defects (--compact; see required_sections). None if the defects are not
+    compact.
+    """
+    return required_sections(args) if args.compact else None
+
+
+def partial_sections(args: argparse.Namespace) -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    The ELF log sections downloaded by partial (HTTP range) downloads (--partial; see required_sections). None if the
+    attachments are downloaded in full.
+    """
+    return required_sections(args) if args.partial else None
+
+
+def print_duplicates(parse_cache: 'ParsedELFCache', log: logging.Logger) -> typing.NoReturn:
+    """
+    Report the identical ELF attachments/logs (each set was parsed once, and shares a single model).
+    """
+    summary = parse_cache.summary()
+    msg = (f"- {summary['attachments']} ELF logs: {summary['unique_attachments']} unique, "
+           f"{summary['duplicate_attachments']} duplicates (in {summary['duplicate_groups']} groups)")
+    log.info(msg)
+    print(msg)
+    for digest, defect_ids in list(parse_cache.duplicates().items())[:5]:
+        print(f"    {len(defect_ids):>4}  {', '.join(defect_ids[:8])}{' ...' if len(defect_ids) > 8 else ''}")
+
+
+def print_results(aggregate: typing.Any) -> typing.NoReturn:
+    """
+    Display summary of the exceptions and corresponding issue counts. This is not logged.
+    """
+    print(f"\nResults:")
+    for exc_type, count in aggregate.tally().items():
+        print(f"- '{exc_type}': {count}")
+    print(f"Total Issue Count: {aggregate.total_count}\n")
+
+
+def build_query(args: argparse.Namespace) -> str:
+    """
+    Build the JQL query for the requested projects and date range.
+    """
+    projects = f'= {args.projects[0]}' if len(args.projects) == 1 else f'in ({",".join(args.projects)})'
+    return (f'project {projects} '
+            f'AND status in ({",".join(STATUS)}) '
+            f'AND created >= {args.start} '
+            f'AND created <= {args.stop} '
+            f'ORDER BY {ISSUE_ORDER[args.order]}')
+
+
+def summary_only_skipped_outputs(args: argparse.Namespace, write_report: bool) -> typing.List[str]:
+    """
+    The outputs that depend on the ELF logs, and are not generated in summary-only mode.
+    """
+    skipped = ['ELF attachment downloads and parsing', f"JSON-lines corpus '{args.data_file}'"]
+    skipped.extend(f"{name} '{value}'" for name, value in (
+        ('binary snapshot', args.snapshot), ('SQLite corpus store', args.store), ('trend rollups', args.trends))
+        if value is not None)
+    if write_report:
+        skipped.append('XLSX duplicate attachments worksheet')
+    if args.profile:
+        skipped.append('stage profiling')
+    return skipped
+
+
+def cmd_fetch_summary(args: argparse.Namespace, write_report: bool = False) -> int:
+    """
+    'fetch'/'run' with --summary_only: Only the summary and description of each issue are requested from Jira, and no
+    attachments are downloaded or parsed. Only the outputs based on the summary and description classification are
+    generated: the console tally and the XLSX summary and details worksheets ('run').
+    """
+    from MDCBR.defects.defects_list import Defects
+    from MDCBR.md.md_jira import SUMMARY_FIELDS, connect_to_jira, get_jira_issues
+
+    jql = build_query(args)
+    filename = f"{'_'.join(args.projects)}_issues_{args.start}_to_{args.stop}"
+    log = setup_logging(log_filename=report_file(filename, 'log'),
+                        logging_level=logging.DEBUG if args.debug else logging.INFO)
+    log.info("----------------- START (summary only) -----------------")
 
-    # Connect to Jira and query defects matching criteria
     jira_client = connect_to_jira(url=URL, user=args.user, password=args.pswd, logger=log)
-    jira_issues = get_jira_issues(client=jira_client, project=PROJECT, query=JQL, max_results=args.max_results,
-                                  start_date=args.start, stop_date=args.stop, logger=log)
+    jira_issues = get_jira_issues(client=jira_client, project=', '.join(args.projects), query=jql,
+                                  max_results=args.max_results, start_date=args.start, stop_date=args.stop,
+                                  logger=log, raw=args.raw_search, fields=SUMMARY_FIELDS)
 
-    # Process and categorize the list of Jira defects
     start_processing = time.perf_counter()
-    issues = Defects(jira_issues)
-    msg = (f"- Parsing of returned defects and attachments complete. "
-           f"({time.perf_counter() - start_processing:0.3f} secs)")
+    with METRICS.timer('stage.process_seconds'):
+        issues = Defects(jira_issues, debug=args.debug, parse_elf_log=False)
+    with METRICS.timer('stage.aggregate_seconds'):
+        aggregate = issues.build_aggregate()
+    msg = f"- Classification of returned defects complete. ({time.perf_counter() - start_processing:0.3f} secs)"
     log.info(msg)
     print(msg)
 
-    # Record results to Excel spreadsheet.
+    if write_report:
+        from MDCBR.reporting.excel_reports import ExcelWorkbook
+
+        start_processing = time.perf_counter()
+        xlsx = ExcelWorkbook(workbook_name=report_file(filename, ExcelWorkbook.EXTENSION))
+        xlsx.build_summary_sheet(aggregate)
+        xlsx.build_detailed_table(aggregate)
+        xlsx.save()
+        processing_time = time.perf_counter() - start_processing
+        METRICS.histogram('stage.report_seconds').observe(processing_time)
+        msg = f"- XLSX processing complete (summary and details worksheets). ({processing_time:0.3f} secs)"
+        log.info(msg)
+        print(msg)
+
+    print_results(aggregate)
+
+    skipped = summary_only_skipped_outputs(args, write_report)
+    msg = "- Summary-only mode; not generated: " + '; '.join(skipped)
+    log.info(msg)
+    print(msg)
+
+    metrics_name = report_file(filename, 'metrics.json')
+    METRICS.write_report(metrics_name, query=jql, issue_count=len(issues), summary_only=True,
+                         skipped_outputs=skipped)
+    print(f"- Wrote run metrics to: '{metrics_name}'")
+    log.info("----------------- STOP -----------------")
+    return 0
+
+
+def cmd_fetch(args: argparse.Namespace, write_report: bool = False) -> int:
+    """
+    'fetch' (and 'run', with write_report=True): Query Jira, process and categorize the defects, write the corpus
+    (and the XLSX report).
+    """
+    if args.summary_only:
+        return cmd_fetch_summary(args, write_report=write_report)
+
+    from MDCBR.debug.profiler import StageProfiler
+    from MDCBR.defects.defect_spill import DefectSpillStore
+    from MDCBR.defects.defects_list import Defects
+    from MDCBR.elf.elf_cache import ParsedELFCache
+    from MDCBR.md.md_download import AdaptiveDownloadController
+    from MDCBR.md.md_jira import configure_connection_pool, connect_to_jira, get_jira_issues
+    from MDCBR.pipeline.async_pipeline import AsyncDefectPipeline
+    from MDCBR.pipeline.checkpoint import CheckpointedDefectFetcher, CheckpointMismatch, RunCheckpoint
+    from MDCBR.pipeline.sharded_fetch import ShardedDefectFetcher, build_shards
+
+    # Build the JQL query.
+    jql = build_query(args)
+
+    filename = f"{'_'.join(args.projects)}_issues_{args.start}_to_{args.stop}"
+    log = setup_logging(log_filename=report_file(filename, 'log'),
+                        logging_level=logging.DEBUG if args.debug else logging.INFO)
+    log.info("----------------- START -----------------")
+
+    # When profiling is not enabled, the profiler stages are no-ops.
+    profiler = StageProfiler(report_dir=REPORT_DIR, prefix=filename, enabled=args.profile)
+
+    # The stages are profiled one at a time, so the overlapped pipeline is not used when profiling.
+    # Several projects, or a date range split into shards: the shards are fetched and processed in parallel.
+    use_shards = (args.shard_days is not None or len(args.projects) > 1) and not profiler.enabled
+    # Checkpointed runs are processed one search page at a time (see RunCheckpoint).
+    checkpoint_dir = args.checkpoint or (report_file(filename, 'checkpoint') if args.resume else None)
+    use_checkpoint = checkpoint_dir is not None and not (profiler.enabled or use_shards)
+    if checkpoint_dir is not None and not use_checkpoint:
+        print("- NOTE: Checkpoints are not supported with --profile or sharded queries; no checkpoint is saved.")
+    use_pipeline = args.async_pipeline and not profiler.enabled and not use_shards and not use_checkpoint
+
+    # Connect to Jira and query defects matching criteria (the pipeline queries the defects as it processes them)
+    jira_issues = []
+    with profiler.stage('fetch'):
+        jira_client = connect_to_jira(url=URL, user=args.user, password=args.pswd, logger=log)
+        configure_connection_pool(jira_client, pool_size=args.downloads)
+        if not (use_pipeline or use_shards or use_checkpoint):
+            jira_issues = get_jira_issues(client=jira_client, project=', '.join(args.projects), query=jql,
+                                          max_results=args.max_results, start_date=args.start,
+                                          stop_date=args.stop, logger=log, raw=args.raw_search)
+
+    # Process and categorize the list of Jira defects. Each defect's data and call stack is written to the corpus
+    # as soon as it has been processed (used for building the analysis capability).
     start_processing = time.perf_counter()
-    xlsx = ExcelWorkbook(workbook_name=xlsx_name)
-    xlsx.build_summary_sheet(issues.tally_defect_types())
-    xlsx.build_detailed_table(issues.build_reporting_dict())
-    xlsx.save()
-    msg = f"- XLSX processing complete. ({time.perf_counter() - start_processing:0.3f} secs)"
+    outputs = CorpusOutputs(data_file=args.data_file, snapshot=args.snapshot, store=args.store,
+                            trends=args.trends)
+    progress = ProgressLine(total=len(jira_issues), label='Parsing defects', metrics=METRICS)
+    listeners = [outputs, progress]
+
+    # Provisional summary reports, updated as the defects are processed (in the requested order).
+    provisional = None
+    if args.provisional:
+        provisional = ProvisionalReports(os.path.sep.join([REPORT_DIR, filename]), every=args.provisional_every,
+                                         interval=args.provisional_interval, xlsx=write_report)
+        listeners.append(provisional)
+
+    # Attachment downloads: adaptive concurrency limit (up to --downloads), timeouts, retries with backoff.
+    download_controller = AdaptiveDownloadController(max_concurrency=args.downloads, hedge=args.hedge,
+                                                     sections=partial_sections(args))
+
+    # Identical attachments (the same ELF log attached to several issues) are parsed once, and the model is shared.
+    sections = compact_sections(args)
+    parse_cache = ParsedELFCache(sections=sections)
+
+    # Memory budget: the completed defects are spilled to disk once it is exceeded (not used when profiling).
+    spill_store = None
+    if args.memory_budget is not None and not profiler.enabled:
+        spill_store = DefectSpillStore(memory_budget=int(args.memory_budget * 1024 * 1024), spill_dir=args.spill_dir,
+                                       parse_cache=parse_cache)
+
+    aggregate = None
+    shard_results = None
+    checkpoint = RunCheckpoint(checkpoint_dir, query=jql) if use_checkpoint else None
+    try:
+        if profiler.enabled:
+            issues = process_defects_in_stages(jira_issues, listeners=listeners, profiler=profiler,
+                                               download_controller=download_controller, parse_cache=parse_cache,
+                                               sections=sections)
+        elif use_pipeline:
+            pipeline = AsyncDefectPipeline(client=jira_client, query=jql, max_results=args.max_results,
+                                           listeners=listeners, download_workers=args.downloads, debug=args.debug,
+                                           download_controller=download_controller, parse_cache=parse_cache,
+                                           compact=args.compact, sections=sections, raw_search=args.raw_search,
+                                           spill_store=spill_store)
+            issues, aggregate = pipeline.run()
+        elif use_shards:
+            # Newest first: the most recent date ranges are started first.
+            shards = build_shards(args.projects, args.start, args.stop, args.shard_days)
+            if args.order == 'newest':
+                shards.sort(key=lambda shard: shard.start, reverse=True)
+            fetcher = ShardedDefectFetcher(client=jira_client, shards=shards, statuses=STATUS,
+                                           max_results=args.max_results, workers=args.shards,
+                                           listeners=listeners, debug=args.debug,
+                                           download_controller=download_controller, parse_cache=parse_cache,
+                                           compact=args.compact, sections=sections, raw_search=args.raw_search,
+                                           order=args.order, spill_store=spill_store)
+            issues, aggregate = fetcher.run()
+            shard_results = fetcher.shard_results
+        elif use_checkpoint:
+            fetcher = CheckpointedDefectFetcher(client=jira_client, query=jql, max_results=args.max_results,
+                                                checkpoint=checkpoint,
+                                                resume=args.resume, listeners=listeners, workers=args.downloads,
+                                                debug=args.debug, download_controller=download_controller,
+                                                parse_cache=parse_cache, compact=args.compact, sections=sections,
+                                                raw_search=args.raw_search, spill_store=spill_store)
+            try:
+                issues = fetcher.run()
+            except CheckpointMismatch as exc:
+                log.error(str(exc))
+                print(f"- ERROR: {exc}")
+                if spill_store is not None:
+                    spill_store.close()
+                return 1
+            if fetcher.restored:
+                print(f"- Restored {fetcher.restored} defects from checkpoint: '{checkpoint_dir}'")
+        else:
+            # Classify all defects first; the ELF attachments are then downloaded and parsed concurrently (batched
+            # prefetch), and each defect is passed to the outputs in order.
+            issues = Defects(jira_issues, download_controller=download_controller, parse_cache=parse_cache,
+                             compact=args.compact, sections=sections, defer_elf_log=True, spill_store=spill_store)
+            issues.listeners = listeners
+            for defect in issues.iter_prefetched(workers=args.downloads):
+                issues.notify_listeners(defect)
+    finally:
+        progress.finish()
+        download_controller.close()
+        outputs.close()
+
+    if provisional is not None:
+        provisional.close()
+        print(f"- Updated the provisional reports {provisional.writes} times: '{provisional.json_file}'")
+
+    download_summary = download_controller.summary()
+    msg = (f"- Attachment download concurrency settled at {download_summary['settled_concurrency']} "
+           f"(range: {download_summary['lowest_concurrency']}-{download_summary['peak_concurrency']}, "
+           f"max: {download_summary['max_concurrency']})")
     log.info(msg)
     print(msg)
+    print_duplicates(parse_cache, log)
 
-    # Display summary of the exceptions and corresponding issue counts. This is not logged.
-    total_count = 0
-    print(f"\nResults:")
-    for exc_type, count in sorted(issues.tally_defect_types().items(), key=lambda x: x[1], reverse=True):
-        print(f"- '{exc_type}': {count}")
-        total_count += count
-    print(f"Total Issue Count: {total_count}")
+    processing_time = time.perf_counter() - start_processing
+    METRICS.histogram('stage.process_seconds').observe(processing_time)
+    msg = f"- Parsing of returned defects and attachments complete. ({processing_time:0.3f} secs)"
+    log.info(msg)
+    print(msg)
+
+    # Build the reporting aggregate once; all outputs are generated from it. (The pipeline builds it incrementally.)
+    if aggregate is None:
+        with METRICS.timer('stage.aggregate_seconds'), profiler.stage('aggregate'):
+            aggregate = issues.build_aggregate()
+
+    # Record results to Excel spreadsheet.
+    if write_report:
+        from MDCBR.reporting.excel_reports import ExcelWorkbook
+
+        start_processing = time.perf_counter()
+        with profiler.stage('report'):
+            xlsx = ExcelWorkbook(workbook_name=report_file(filename, ExcelWorkbook.EXTENSION))
+            xlsx.build_summary_sheet(aggregate)
+            xlsx.build_detailed_table(aggregate)
+            if parse_cache.duplicates():
+                xlsx.build_duplicate_attachments_sheet(parse_cache.duplicates())
+            xlsx.save()
+        processing_time = time.perf_counter() - start_processing
+        METRICS.histogram('stage.report_seconds').observe(processing_time)
+        msg = f"- XLSX processing complete. ({processing_time:0.3f} secs)"
+        log.info(msg)
+        print(msg)
 
+    print_results(aggregate)
+
+    # Write the per-stage metrics (timings, download sizes, parse times) as a JSON run report.
+    metrics_name = report_file(filename, 'metrics.json')
+    METRICS.write_report(metrics_name, query=jql, issue_count=len(issues), downloads=download_summary,
+                         attachments=parse_cache.summary(), shards=shard_results)
+    print(f"- Wrote run metrics to: '{metrics_name}'")
+
+    # Record the bytes retained per defect and per parsed ELF log. The objects shared by every defect (the Jira client
+    # and its session, the parse cache and the download controller) are excluded.
+    if profiler.enabled:
+        shared = [jira_client, getattr(jira_client, '_session', None), parse_cache, download_controller]
+        profiler.record_retained_sizes('DefectInfo', issues, exclude=[obj for obj in shared if obj is not None])
+        profiler.record_retained_sizes('ELFLogParser', [defect.elf_log_model for defect in issues
+                                                        if defect.elf_log_model is not None])
+        print(f"- Wrote profiling reports to: '{profiler.write_summary()}'")
+
+    if spill_store is not None:
+        print(f"- Spilled {len(spill_store)} defects to disk (memory budget: {args.memory_budget:0.0f} MiB)")
+        spill_store.close()
+
+    # The run is complete: the checkpoint is no longer needed.
+    if checkpoint is not None:
+        checkpoint.remove()
     log.info("----------------- STOP -----------------")
+    return 0
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    """
+    'run': The complete flow - query Jira, process the defects, write the corpus and the XLSX report.
+    """
+    return cmd_fetch(args, write_report=True)
+
+
+def cmd_parse(args: argparse.Namespace) -> int:
+    """
+    'parse': Parse and classify local ELF logs (directory, tar/zip archives) into a corpus. No Jira access.
+    """
+    from MDCBR.elf.elf_cache import ParsedELFCache
+    from MDCBR.ingest.elf_ingest import ingest_elf_logs
+
+    filename = f"{os.path.basename(os.path.normpath(args.path)).split('.')[0]}_elf_logs"
+    log = setup_logging(log_filename=report_file(filename, 'log'),
+                        logging_level=logging.DEBUG if args.debug else logging.INFO)
+
+    start_processing = time.perf_counter()
+    outputs = CorpusOutputs(data_file=args.data_file, snapshot=args.snapshot, store=args.store,
+                            trends=args.trends)
+    progress = ProgressLine(total=0, label='Parsing ELF logs')
+    sections = compact_sections(args)
+    parse_cache = ParsedELFCache(sections=sections)
+    try:
+        issues = ingest_elf_logs(args.path, workers=args.workers, listeners=[outputs, progress],
+                                 debug=args.debug, logger=log, parse_cache=parse_cache,
+                                 compact=args.compact, sections=sections)
+    finally:
+        progress.finish()
+        outputs.close()
+    print(f"- Parsing of {len(issues)} ELF logs complete. ({time.perf_counter() - start_processing:0.3f} secs)")
+    print_duplicates(parse_cache, log)
+
+    print_results(issues.build_aggregate())
+    return 0
+
 
-    # Write each ELF File's defect and call stack data into a json file for building the analysis capability
-    section = ELFLogSections.CALL_STACK_INFORMATION
-    debug.issue_list_to_file(issue_list=issues, section=section, data_file="CBR.data.json.txt")
+def cmd_analyze(args: argparse.Namespace) -> int:
+    """
+    'analyze': Group the defects in a stored corpus by identical call stack.
+    """
+    from MDCBR.corpus.corpus_files import open_corpus
+    from MDCBR.elf.elf_analysis import ELFAnalysis
+
+    start_processing = time.perf_counter()
+    corpus = open_corpus(args.corpus)
+    call_stacks = ELFAnalysis(data_struct=corpus.iter_analysis_items()).perform_stack_trace_assessment()
+    groups = sorted(call_stacks.items(), key=lambda x: len(x[1]), reverse=True)
+    print(f"- Analyzed {sum(len(ids) for _, ids in groups)} defects: {len(groups)} unique call stacks. "
+          f"({time.perf_counter() - start_processing:0.3f} secs)\n")
+
+    for call_stack, defect_ids in groups[:args.top]:
+        print(f"{len(defect_ids):>5}  {', '.join(defect_ids[:10])}{' ...' if len(defect_ids) > 10 else ''}")
+        print(f"       {call_stack[:200]}{'...' if len(call_stack) > 200 else ''}\n")
+
+    if args.output is not None:
+        with open(args.output, "w") as OUTPUT:
+            json.dump([{'call_stack': stack, 'defect_ids': ids} for stack, ids in groups], OUTPUT, indent=2)
+        print(f"- Wrote {len(groups)} call stack groups to: '{args.output}'")
+    return 0
+
+
+def cmd_report(args: argparse.Namespace) -> int:
+    """
+    'report': Write the XLSX report (Summary, Details and optionally, Call Stacks) from a stored corpus.
+    """
+    from MDCBR.corpus.corpus_files import open_corpus
+    from MDCBR.reporting.excel_reports import ExcelWorkbook
+
+    filename = args.name or os.path.splitext(os.path.basename(args.corpus))[0]
+    os.makedirs(REPORT_DIR, exist_ok=True)
+
+    start_processing = time.perf_counter()
+    corpus = open_corpus(args.corpus)
+    xlsx = ExcelWorkbook(workbook_name=report_file(filename, ExcelWorkbook.EXTENSION))
+    aggregate = xlsx.build_report(corpus)
+    if args.stacks:
+        from MDCBR.elf.elf_analysis import ELFAnalysis
+        xlsx.build_stack_groups_sheet(
+            ELFAnalysis(data_struct=corpus.iter_analysis_items()).perform_stack_trace_assessment())
+    xlsx.save()
+    print(f"- XLSX processing complete. ({time.perf_counter() - start_processing:0.3f} secs)")
+
+    print_results(aggregate)
+    return 0
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """
+    'watch': Keep the parsed defects in memory and poll Jira for the issues updated since the previous poll. The
+    corpus (and snapshot) and the XLSX report are regenerated only when the results change.
+    """
+    from MDCBR.corpus.binary_snapshot import SnapshotWriter
+    from MDCBR.debug.dump import issue_list_to_jsonl
+    from MDCBR.elf.elf_log_sections import ELFLogSections
+    from MDCBR.md.md_download import AdaptiveDownloadController
+    from MDCBR.md.md_jira import configure_connection_pool, connect_to_jira
+    from MDCBR.pipeline.watch_daemon import DefectWatcher
+    from MDCBR.reporting.excel_reports import ExcelWorkbook
+
+    filename = f"{PROJECT}_issues_{args.start}_to_{args.stop or 'now'}"
+    log = setup_logging(log_filename=report_file(filename, 'log'),
+                        logging_level=logging.DEBUG if args.debug else logging.INFO)
+    log.info("----------------- START (watch) -----------------")
+
+    def write_outputs(defects: typing.Any, aggregate: typing.Any) -> typing.NoReturn:
+        start_processing = time.perf_counter()
+        loaded = defects.prefetch_elf_logs(workers=args.downloads)
+        log.info(f"Downloaded and parsed {loaded} new/updated ELF attachments.")
+        issue_list_to_jsonl(defects, data_file=args.data_file, section=ELFLogSections.CALL_STACK_INFORMATION)
+        if args.snapshot is not None:
+            with SnapshotWriter(snapshot_file=args.snapshot) as snapshot_writer:
+                for defect in defects:
+                    snapshot_writer(defect)
+
+        xlsx = ExcelWorkbook(workbook_name=report_file(filename, ExcelWorkbook.EXTENSION))
+        xlsx.build_summary_sheet(aggregate)
+        xlsx.build_detailed_table(aggregate)
+        xlsx.save()
+        METRICS.write_report(report_file(filename, 'metrics.json'), issue_count=len(defects))
+
+        msg = (f"- {time.strftime('%Y-%m-%d %H:%M:%S')}: Results changed; reports updated: {aggregate.total_count} "
+               f"defects, {len(aggregate.exceptions)} exception types. ({time.perf_counter() - start_processing:0.3f} "
+               f"secs)")
+        log.info(msg)
+        print(msg)
+
+    jira_client = connect_to_jira(url=URL, user=args.user, password=args.pswd, logger=log)
+    configure_connection_pool(jira_client, pool_size=args.downloads)
+    download_controller = AdaptiveDownloadController(max_concurrency=args.downloads,
+                                                     sections=partial_sections(args))
+    watcher = DefectWatcher(client=jira_client, project=PROJECT, statuses=STATUS, start_date=args.start,
+                            stop_date=args.stop, on_change=write_outputs, poll_interval=args.interval,
+                            download_controller=download_controller, debug=args.debug,
+                            sections=compact_sections(args))
+
+    print(f"- Watching '{PROJECT}' (polling every {args.interval:0.0f} secs; Ctrl-C to stop)")
+    try:
+        watcher.run(max_polls=args.polls)
+    except KeyboardInterrupt:
+        print("\n- Stopped.")
+    finally:
+        download_controller.close()
+    log.info("----------------- STOP (watch) -----------------")
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    """
+    'serve': Load a stored corpus once, and answer JSON queries over HTTP until interrupted.
+    """
+    from MDCBR.api.corpus_api import CorpusQueryServer
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    with CorpusQueryServer(args.corpus, host=args.host, port=args.port) as server:
+        print(f"- Serving '{args.corpus}' ({server.index.aggregate.total_count} defects; loaded in "
+              f"{server.index.load_seconds:0.3f} secs) at {server.url}")
+        print("  Endpoints: / /tally /messages /stacks /defects/<id>  (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n- Stopped.")
+    return 0
+
+
+def cmd_trends(args: argparse.Namespace) -> int:
+    """
+    'trends': Display (and optionally write as CSV) a defect trend, read directly from the trend rollups.
+    """
+    import csv
+
+    from MDCBR.reporting.trend_rollups import TimeBuckets, TrendRollupStore
+
+    with TrendRollupStore(db_file=args.db) as store:
+        first, last = store.date_range()
+        if first is None:
+            print(f"- No defects in '{args.db}'.")
+            return 1
+        start, end = args.start or first, args.end or last
+        trend = store.trend(dimension=args.by, granularity=args.granularity, start=start, end=end)
+        buckets = TimeBuckets.bucket_range(start, end, args.granularity)
+
+        print(f"- {len(store)} defects ({first} to {last}); counts per {args.granularity} by {args.by}:\n")
+        values = list(trend)[:args.top]
+        if args.by == 'stack':
+            for value in values:
+                print(f"  {value}: {(store.call_stack(value) or '')[:100]}")
+            print()
+        print(f"{'Bucket':<12}" + ''.join(f"{value[:18]:>20}" for value in values))
+        for bucket in buckets:
+            print(f"{bucket:<12}" + ''.join(f"{trend[value].get(bucket, 0):>20}" for value in values))
+
+    if args.output is not None:
+        with open(args.output, "w", newline='') as OUTPUT:
+            writer = csv.writer(OUTPUT)
+            writer.writerow(['bucket', *trend])
+            for bucket in buckets:
+                writer.writerow([bucket, *[counts.get(bucket, 0) for counts in trend.values()]])
+        print(f"\n- Wrote {len(buckets)} x {len(trend)} trend table to: '{args.output}'")
+    return 0
+
+
+COMMANDS = {
+    'run': cmd_run,
+    'fetch': cmd_fetch,
+    'parse': cmd_parse,
+    'analyze': cmd_analyze,
+    'report': cmd_report,
+    'watch': cmd_watch,
+    'serve': cmd_serve,
+    'trends': cmd_trends,
+}
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    args = CommandLineOptions(argv).get_args()
+    return COMMANDS[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""
+Offline ingestion of ELF logs (directory, or tar/zip archives): no Jira access required.
+
+Kept for compatibility: 'ingest.py PATH [options]' is the same as 'cbr.py parse PATH [options]', followed by
+'cbr.py report <corpus> --stacks' (XLSX report, including the call stack groups). See cbr.py for the options.
+"""
+import sys
+import typing
+
+import cbr
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = cbr.CommandLineOptions(['parse'] + argv).get_args()
+    status = cbr.cmd_parse(args)
+    if status != 0:
+        return status
+
+    report_argv = ['report', args.data_file, '--stacks'] + (['--debug'] if args.debug else [])
+    return cbr.cmd_report(cbr.CommandLineOptions(report_argv).get_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import http.server
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from MDCBR.elf.elf_log_sections import ELFLogSections
+from MDCBR.md.md_download import fetch_attachment_sections, find_sections_end
+
+
+def build_elf_log(section_sizes: dict) -> bytes:
+    """
+    Build an ELF log with the given sections, each padded with lines up to (about) the given number of bytes.
+    """
+    content = b''
+    for section, size in section_sizes.items():
+        content += f"{section}:\r\n".encode('utf8')
+        line = f"  {section.lower()} data line\r\n".encode('utf8')
+        content += line * max(1, size // len(line))
+    return content
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the log set on the server; honours 'Range: bytes=start-stop' (206/416) unless the server ignores ranges.
+    """
+
+    def do_GET(self) -> None:
+        content = self.server.content
+        self.server.requests.append(self.headers.get('Range'))
+        range_header = self.headers.get('Range')
+        if range_header is None or self.server.ignore_ranges:
+            self._send(200, content)
+            return
+
+        start, _, stop = range_header.split('=', 1)[1].partition('-')
+        start, stop = int(start), min(int(stop), len(content) - 1)
+        if start >= len(content):
+            self._send(416, b'', {'Content-Range': f'bytes */{len(content)}'})
+            return
+        self._send(206, content[start:stop + 1], {'Content-Range': f'bytes {start}-{stop}/{len(content)}'})
+
+    def _send(self, status: int, body: bytes, headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class Response:
+    """
+    The parts of a requests.Response used by fetch_attachment_sections().
+    """
+
+    def __init__(self, status_code: int, content: bytes, headers: dict) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class Session:
+    """
+    Minimal HTTP session (urllib): session.get(url, headers=..., timeout=...), as used by the attachment downloads.
+    """
+
+    def get(self, url: str, headers: dict = None, timeout: float = None) -> Response:
+        request = urllib.request.Request(url, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as reply:
+                return Response(reply.status, reply.read(), dict(reply.headers))
+        except urllib.error.HTTPError as error:
+            return Response(error.code, error.read(), dict(error.headers))
+
+
+class Attachment:
+    def __init__(self, url: str) -> None:
+        self.session = Session()
+        self.url = url
+        self.filename = 'CBR-1.el'
+
+
+class TestPartialDownload(unittest.TestCase):
+    RANGE_SIZE = 1024
+    REQUIRED = (ELFLogSections.EXCEPTION, ELFLogSections.CALL_STACK_INFORMATION)
+
+    def setUp(self) -> None:
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.requests = []
+        self.server.ignore_ranges = False
+        self.server.content = b''
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.attachment = Attachment(f'http://127.0.0.1:{self.server.server_port}/CBR-1.el')
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch(self, sections: tuple = REQUIRED) -> bytes:
+        return fetch_attachment_sections(self.attachment, sections, timeout=5, range_size=self.RANGE_SIZE)
+
+    def test_sections_in_first_range(self) -> None:
+        self.server.content = build_elf_log({
+            ELFLogSections.APPLICATION: 100, ELFLogSections.EXCEPTION: 100,
+            ELFLogSections.CALL_STACK_INFORMATION: 300, ELFLogSections.MODULES: 20000,
+            ELFLogSections.PROCESSES_INFORMATION: 5000})
+
+        content = self.fetch()
+
+        self.assertEqual(self.server.requests, [f'bytes=0-{self.RANGE_SIZE - 1}'])
+        expected_end = self.server.content.index(f'{ELFLogSections.MODULES}:'.encode('utf8'))
+        self.assertEqual(content, self.server.content[:expected_end])
+
+    def test_sections_need_more_ranges(self) -> None:
+        self.server.content = build_elf_log({
+            ELFLogSections.APPLICATION: 100, ELFLogSections.EXCEPTION: 100,
+            ELFLogSections.CALL_STACK_INFORMATION: 3000, ELFLogSections.MODULES: 20000,
+            ELFLogSections.PROCESSES_INFORMATION: 5000})
+
+        content = self.fetch()
+
+        # Ranges double in size: 0-1023, 1024-3071, ...
+        self.assertGreater(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[:2], [f'bytes=0-{self.RANGE_SIZE - 1}',
+                                                    f'bytes={self.RANGE_SIZE}-{3 * self.RANGE_SIZE - 1}'])
+        expected_end = self.server.content.index(f'{ELFLogSections.MODULES}:'.encode('utf8'))
+        self.assertEqual(content, self.server.content[:expected_end])
+        self.assertLess(len(content), len(self.server.content))
+
+    def test_missing_section_downloads_full_log(self) -> None:
+        self.server.content = build_elf_log({
+            ELFLogSections.APPLICATION: 100, ELFLogSections.EXCEPTION: 100,
+            ELFLogSections.MODULES: 5000, ELFLogSections.PROCESSES_INFORMATION: 2000})
+
+        content = self.fetch()
+
+        self.assertEqual(content, self.server.content)
+        self.assertTrue(all(request is not None for request in self.server.requests))
+
+    def test_range_ignored_uses_full_response(self) -> None:
+        self.server.ignore_ranges = True
+        self.server.content = build_elf_log({
+            ELFLogSections.APPLICATION: 100, ELFLogSections.EXCEPTION: 100,
+            ELFLogSections.CALL_STACK_INFORMATION: 3000, ELFLogSections.MODULES: 20000})
+
+        content = self.fetch()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(content, self.server.content)
+
+    def test_find_sections_end(self) -> None:
+        content = build_elf_log({ELFLogSections.EXCEPTION: 50, ELFLogSections.CALL_STACK_INFORMATION: 50,
+                                 ELFLogSections.MODULES: 50})
+        self.assertEqual(find_sections_end(content, self.REQUIRED),
+                         content.index(f'{ELFLogSections.MODULES}:'.encode('utf8')))
+        self.assertIsNone(find_sections_end(content[:content.index(b'Modules')], self.REQUIRED))
+
+
+if __name__ == '__main__':
+    unittest.main()